@@ -1,8 +1,42 @@
-from collections import deque
-import tkinter as tk
-from tkinter import ttk, messagebox
+import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import contextlib
+from itertools import islice, repeat
+import heapq
+import json
+import math
+import os
+import struct
+import sys
+import time
 
-# Definindo o grafo com cidades e conexões (ignora custos neste caso)
+import numpy as np
+
+# Formatos de arquivo de grafo aceitos por ler_grafo_arquivo
+FORMATOS_GRAFO = ('arestas', 'adjacencia')
+
+# Tamanho aproximado (em bytes) de cada bloco de linhas lido do arquivo de grafo
+TAMANHO_BLOCO_LEITURA = 1 << 24
+
+# Orçamento de memória (em bytes) das árvores de BFS guardadas pelo ServicoRotas
+# e número máximo de nós para a interface pré-calcular as rotas de todos os pares
+ORCAMENTO_MEMORIA_ROTAS = 256 * 2 ** 20
+LIMITE_TODOS_PARES = 2000
+
+# Modo em lote: consultas lidas e respondidas por bloco, e algoritmos aceitos
+TAMANHO_BLOCO_CONSULTAS = 100000
+ALGORITMOS_LOTE = ('bfs', 'custo_uniforme', 'a_estrela')
+
+# Cache binário do grafo: assinatura, tamanho do cabeçalho JSON (uint32
+# little-endian), cabeçalho JSON e arrays alinhados em 64 bytes, lidos com
+# np.memmap sem cópia
+ASSINATURA_CACHE = b'GRAFOCSR'
+VERSAO_CACHE = 1
+ALINHAMENTO_CACHE = 64
+ARRAYS_GRAFO = ('offsets', 'vizinhos', 'nomes', 'inicio_nomes', 'ordem_nomes', 'coordenadas', 'pesos')
+
+# Definindo o grafo com cidades e conexões (os custos ficam em road_costs)
 graph = {
     'Arad': ['Zerind', 'Sibiu', 'Timisoara'],
     'Zerind': ['Arad', 'Oradea'],
@@ -26,26 +60,138 @@ graph = {
     'Neamt': ['Iasi']
 }
 
+# Distâncias rodoviárias (km) de cada conexão, nos dois sentidos
+road_costs = {
+    ('Arad', 'Zerind'): 75,
+    ('Arad', 'Sibiu'): 140,
+    ('Arad', 'Timisoara'): 118,
+    ('Zerind', 'Oradea'): 71,
+    ('Oradea', 'Sibiu'): 151,
+    ('Sibiu', 'Fagaras'): 99,
+    ('Sibiu', 'Rimnicu Vilcea'): 80,
+    ('Timisoara', 'Lugoj'): 111,
+    ('Lugoj', 'Mehadia'): 70,
+    ('Mehadia', 'Dobreta'): 75,
+    ('Dobreta', 'Craiova'): 120,
+    ('Craiova', 'Rimnicu Vilcea'): 146,
+    ('Craiova', 'Pitesti'): 138,
+    ('Rimnicu Vilcea', 'Pitesti'): 97,
+    ('Fagaras', 'Bucharest'): 211,
+    ('Pitesti', 'Bucharest'): 101,
+    ('Bucharest', 'Giurgiu'): 90,
+    ('Bucharest', 'Urziceni'): 85,
+    ('Urziceni', 'Hirsova'): 98,
+    ('Urziceni', 'Vaslui'): 142,
+    ('Hirsova', 'Eforie'): 86,
+    ('Vaslui', 'Iasi'): 92,
+    ('Iasi', 'Neamt'): 87,
+}
+
+# Reconstrói o caminho seguindo os ponteiros de pai de `node` até a origem
+def reconstruir_caminho(parents, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parents[node]
+    path.reverse()
+    return path
+
+# Nós expandidos: a BFS expande na mesma ordem em que descobre, então são
+# as primeiras `expanded` chaves do dicionário de pais
+def nos_expandidos(parents, expanded):
+    return set(islice(parents, expanded))
+
 # Função que implementa a Busca em Largura (BFS)
+# A fila guarda só os nós; cada nó guarda o pai que o descobriu e é marcado
+# ao entrar na fila, então nunca aparece duas vezes nela. Memória O(nós).
+# Sobre um GrafoCSR, usa a versão vetorizada (bfs_csr).
 def bfs(graph, start, goal):
-    queue = deque([[start]])
-    visited = set()
+    if isinstance(graph, GrafoCSR):
+        return bfs_nomes_csr(graph, start, goal)
+    if start == goal:
+        return [start], set()
+
+    parents = {start: None}
+    queue = deque([start])
+    expanded = 0
 
     while queue:
-        path = queue.popleft()
-        city = path[-1]
+        city = queue.popleft()
+        expanded += 1
 
-        if city == goal:
-            return path, visited
+        for neighbor in graph[city]:
+            if neighbor not in parents:
+                parents[neighbor] = city
+                if neighbor == goal:
+                    return reconstruir_caminho(parents, goal), nos_expandidos(parents, expanded)
+                queue.append(neighbor)
+
+    return None, nos_expandidos(parents, expanded)
 
-        if city not in visited:
-            visited.add(city)
+# Expande um nível inteiro da fronteira de um dos lados da busca bidirecional.
+# Retorna o nó de encontro com o outro lado (ou None) e quantos nós expandiu.
+def expandir_nivel(graph, queue, parents, other_parents):
+    for expanded in range(1, len(queue) + 1):
+        city = queue.popleft()
+        for neighbor in graph[city]:
+            if neighbor not in parents:
+                parents[neighbor] = city
+                if neighbor in other_parents:
+                    return neighbor, expanded
+                queue.append(neighbor)
+    return None, expanded
 
-            for neighbor in graph[city]:
-                new_path = list(path)
-                new_path.append(neighbor)
-                queue.append(new_path)
+# bfs_csr com nomes de nós, no formato de retorno de bfs
+def bfs_nomes_csr(grafo, start, goal):
+    inicio = grafo.id_de(start)
+    if inicio is None:
+        raise KeyError(start)
+    path, expandidos = bfs_csr(grafo, inicio, grafo.id_de(goal))
+    if path is not None:
+        path = [grafo.nome(no) for no in path]
+    return path, {grafo.nome(no) for no in expandidos}
+
+# Busca em Largura bidirecional: expande, nível a nível, a menor das fronteiras
+# (a partir da origem e a partir do destino) até que se encontrem no meio.
+# Como um nível é expandido por completo antes de testar o outro lado, o
+# primeiro encontro dá um caminho mínimo. `reverse_graph` lista os
+# predecessores de cada nó; se omitido, o grafo é tratado como não dirigido.
+# Sobre um GrafoCSR, usa a versão vetorizada (bfs_bidirecional_csr), com o
+# transposto do grafo como `reverse_graph` padrão, o que vale para grafos
+# dirigidos ou não. Retorna (caminho, visitados), como bfs.
+def bfs_bidirecional(graph, start, goal, reverse_graph=None):
+    if isinstance(graph, GrafoCSR):
+        return bfs_bidirecional_nomes_csr(graph, start, goal, reverse_graph)
+    if start == goal:
+        return [start], set()
+    if reverse_graph is None:
+        reverse_graph = graph
+
+    parents_start = {start: None}
+    parents_goal = {goal: None}
+    queue_start = deque([start])
+    queue_goal = deque([goal])
+    expanded_start = expanded_goal = 0
+
+    while queue_start and queue_goal:
+        if len(queue_start) <= len(queue_goal):
+            meeting, expanded = expandir_nivel(graph, queue_start, parents_start, parents_goal)
+            expanded_start += expanded
+        else:
+            meeting, expanded = expandir_nivel(reverse_graph, queue_goal, parents_goal, parents_start)
+            expanded_goal += expanded
 
+        if meeting is not None:
+            # Os pais do lado do destino apontam para o destino: o trecho
+            # a partir do encontro é o caminho reconstruído invertido
+            path = reconstruir_caminho(parents_start, meeting)
+            path.extend(reversed(reconstruir_caminho(parents_goal, meeting)[:-1]))
+            visited = nos_expandidos(parents_start, expanded_start)
+            visited |= nos_expandidos(parents_goal, expanded_goal)
+            return path, visited
+
+    visited = nos_expandidos(parents_start, expanded_start)
+    visited |= nos_expandidos(parents_goal, expanded_goal)
     return None, visited
 
 # Coordenadas das cidades no mapa
@@ -72,82 +218,1129 @@ city_coords = {
     'Zerind': (127, 113)
 }
 
-# Função para buscar o caminho e desenhar o mapa
-def buscar_caminho():
-    start_city = origem_var.get()
-    goal_city = destino_var.get()
-    if start_city == goal_city:
-        messagebox.showinfo("Resultado", "A cidade de origem e destino são iguais.")
-        desenhar_mapa([], set())
-        return
+# Representação compacta do grafo (CSR - compressed sparse row): os nós são
+# inteiros de 0 a n-1, e os vizinhos do nó i ficam em
+# vizinhos[offsets[i]:offsets[i + 1]], na ordem em que foram lidos. Os nomes
+# ficam concatenados em UTF-8 (nome i em nomes[inicio_nomes[i]:inicio_nomes[i + 1]]),
+# e ordem_nomes lista os ids em ordem alfabética dos nomes, para a busca
+# binária de id_de. pesos, opcional, guarda o custo de cada aresta, alinhado
+# com vizinhos. Todos os arrays podem ser mapeados do cache binário.
+class GrafoCSR:
+    def __init__(self, offsets, vizinhos, nomes, inicio_nomes, ordem_nomes, coordenadas=None,
+                 pesos=None):
+        self.offsets = offsets
+        self.vizinhos = vizinhos
+        self.nomes = nomes
+        self.inicio_nomes = inicio_nomes
+        self.ordem_nomes = ordem_nomes
+        self.coordenadas = coordenadas
+        self.pesos = pesos
+        self.ids = None  # Tabela nome -> id, presente quando o grafo é montado em memória
+        # Calculados na primeira busca com custos (ver pesos_arestas e escala_heuristica)
+        self.pesos_calculados = None
+        self.escala = None
+        # Calculado na primeira busca bidirecional (ver transposto)
+        self.grafo_transposto = None
+
+    # Monta o grafo a partir de um dicionário de listas de adjacência
+    # (como `graph`) e, opcionalmente, de um dicionário de coordenadas e de
+    # um dicionário de custos por par de cidades (como road_costs, em qualquer
+    # um dos sentidos)
+    @classmethod
+    def de_dicionario(cls, graph, coords=None, custos=None):
+        # Ids na ordem das chaves; vizinhos que não são chaves vêm depois
+        ids = {cidade: i for i, cidade in enumerate(graph)}
+        for vizinhos in graph.values():
+            for vizinho in vizinhos:
+                ids.setdefault(vizinho, len(ids))
+        origens = [ids[cidade] for cidade, vizinhos in graph.items() for _ in vizinhos]
+        destinos = [ids[vizinho] for vizinhos in graph.values() for vizinho in vizinhos]
+        pesos = None
+        if custos is not None:
+            pesos = np.array([custos[(cidade, vizinho)] if (cidade, vizinho) in custos
+                              else custos[(vizinho, cidade)]
+                              for cidade, vizinhos in graph.items() for vizinho in vizinhos],
+                             dtype=np.float64)
+        return montar_grafo_csr(ids, np.array(origens, dtype=np.int64),
+                                np.array(destinos, dtype=np.int64), coords, pesos)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def num_arestas(self):
+        return len(self.vizinhos)
+
+    def nome(self, no):
+        return self.nomes[self.inicio_nomes[no]:self.inicio_nomes[no + 1]].tobytes().decode('utf-8')
+
+    # Id de um nome (ou None): pela tabela, se houver, ou por busca binária em ordem_nomes
+    def id_de(self, nome):
+        if self.ids is not None:
+            return self.ids.get(nome)
+        chave = nome.encode('utf-8')
+        baixo, alto = 0, len(self)
+        while baixo < alto:
+            meio = (baixo + alto) // 2
+            no = int(self.ordem_nomes[meio])
+            atual = self.nomes[self.inicio_nomes[no]:self.inicio_nomes[no + 1]].tobytes()
+            if atual < chave:
+                baixo = meio + 1
+            elif atual > chave:
+                alto = meio
+            else:
+                return no
+        return None
+
+    def vizinhos_de(self, no):
+        return self.vizinhos[self.offsets[no]:self.offsets[no + 1]]
+
+    # Origem e destino de cada aresta, na ordem dos arrays
+    def arestas(self):
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets)), self.vizinhos
+
+    # Grafo com as arestas invertidas (predecessores), para a busca
+    # bidirecional. Montado uma vez e guardado; o transposto dele é este grafo.
+    def transposto(self):
+        if self.grafo_transposto is None:
+            origens, destinos = self.arestas()
+            offsets, vizinhos, pesos = construir_csr(destinos, origens, len(self), self.pesos)
+            grafo = GrafoCSR(offsets, vizinhos, self.nomes, self.inicio_nomes,
+                             self.ordem_nomes, self.coordenadas, pesos)
+            grafo.ids = self.ids
+            grafo.grafo_transposto = self
+            self.grafo_transposto = grafo
+        return self.grafo_transposto
+
+    # Se todos os nós têm coordenadas (necessárias para a heurística do A*)
+    def tem_coordenadas(self):
+        return self.coordenadas is not None and not np.isnan(self.coordenadas).any()
+
+    # Custo de cada aresta: os pesos do grafo ou, sem eles, o comprimento
+    # euclidiano da aresta (se houver coordenadas) ou 1
+    def pesos_arestas(self):
+        if self.pesos is not None:
+            return self.pesos
+        if self.pesos_calculados is None:
+            if self.tem_coordenadas():
+                origens, destinos = self.arestas()
+                diferencas = self.coordenadas[origens] - self.coordenadas[destinos]
+                self.pesos_calculados = np.hypot(diferencas[:, 0], diferencas[:, 1])
+            else:
+                self.pesos_calculados = np.ones(self.num_arestas())
+        return self.pesos_calculados
+
+    # Fator que torna a distância euclidiana entre coordenadas uma heurística
+    # consistente: o menor custo por unidade de distância entre as arestas.
+    # Assim a estimativa nunca passa do custo de uma aresta, nem, somando
+    # pelo caminho, do custo real até o destino (é admissível).
+    def escala_heuristica(self):
+        if self.escala is None:
+            origens, destinos = self.arestas()
+            diferencas = self.coordenadas[origens] - self.coordenadas[destinos]
+            distancias = np.hypot(diferencas[:, 0], diferencas[:, 1])
+            positivas = distancias > 0
+            razoes = self.pesos_arestas()[positivas] / distancias[positivas]
+            # Margem para arredondamentos de ponto flutuante
+            self.escala = float(razoes.min()) * (1 - 1e-9) if len(razoes) else 0.0
+        return self.escala
+
+    # Menor custo de uma aresta de `origem` para `destino` (ids)
+    def custo_aresta(self, origem, destino):
+        inicio, fim = self.offsets[origem], self.offsets[origem + 1]
+        return float(self.pesos_arestas()[inicio:fim][self.vizinhos[inicio:fim] == destino].min())
+
+    # Interface de dicionário (nome -> lista de nomes vizinhos), para que as
+    # funções escritas para `graph` funcionem sem alterações
+    def __getitem__(self, nome):
+        no = self.id_de(nome)
+        if no is None:
+            raise KeyError(nome)
+        return [self.nome(vizinho) for vizinho in self.vizinhos_de(no)]
+
+    def __contains__(self, nome):
+        return self.id_de(nome) is not None
+
+    def __iter__(self):
+        return (self.nome(no) for no in range(len(self)))
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        return ((nome, self[nome]) for nome in self)
+
+# Ordena as arestas pela origem (ordenação estável, preservando a ordem de
+# leitura dos vizinhos) e retorna os arrays (offsets, vizinhos, pesos), com
+# os pesos (opcionais) na mesma ordem dos vizinhos
+def construir_csr(origens, destinos, num_nos, pesos=None):
+    tipo = np.int32 if num_nos < 2 ** 31 else np.int64
+    ordem = np.argsort(origens, kind='stable')
+    vizinhos = np.asarray(destinos)[ordem].astype(tipo)
+    offsets = np.zeros(num_nos + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origens, minlength=num_nos), out=offsets[1:])
+    if pesos is not None:
+        pesos = np.asarray(pesos, dtype=np.float64)[ordem]
+    return offsets, vizinhos, pesos
+
+# Concatena os nomes (bytes UTF-8) e retorna os arrays (nomes, inicio_nomes)
+def tabela_nomes(codificados):
+    nomes = np.frombuffer(b''.join(codificados), dtype=np.uint8)
+    inicio_nomes = np.zeros(len(codificados) + 1, dtype=np.int64)
+    np.cumsum([len(nome) for nome in codificados], out=inicio_nomes[1:])
+    return nomes, inicio_nomes
+
+# Numera os nomes (array de bytes) em ordem alfabética e retorna (únicos,
+# código de cada nome). Cada nome é comparado como uma sequência de inteiros
+# big-endian de 8 bytes, que têm a mesma ordem dos bytes e são ordenados bem
+# mais rápido do que strings.
+def numerar_nomes(nomes):
+    if len(nomes) == 0:
+        return nomes, np.empty(0, dtype=np.int64)
+    largura = -(-nomes.dtype.itemsize // 8) * 8
+    completos = np.zeros(len(nomes), dtype=f'S{largura}')
+    completos[:] = nomes
+    palavras = completos.view('>u8').reshape(len(nomes), largura // 8)
+    if palavras.shape[1] == 1:
+        _, primeiros, codigos = np.unique(palavras[:, 0], return_index=True, return_inverse=True)
+        return nomes[primeiros], codigos.ravel()
+
+    ordem = np.lexsort(palavras.T[::-1])
+    ordenadas = palavras[ordem]
+    novos = np.ones(len(nomes), dtype=bool)
+    novos[1:] = (ordenadas[1:] != ordenadas[:-1]).any(axis=1)
+    codigos = np.empty(len(nomes), dtype=np.int64)
+    codigos[ordem] = np.cumsum(novos) - 1
+    return nomes[ordem[novos]], codigos
+
+# Monta o GrafoCSR a partir da tabela nome -> id (ids na ordem de inserção)
+# e dos arrays de origem e destino de cada aresta
+def montar_grafo_csr(ids, origens, destinos, coords=None, pesos=None):
+    num_nos = len(ids)
+    offsets, vizinhos, pesos = construir_csr(origens, destinos, num_nos, pesos)
+
+    codificados = [nome.encode('utf-8') for nome in ids]
+    nomes, inicio_nomes = tabela_nomes(codificados)
+    ordem_nomes = np.array(sorted(range(num_nos), key=codificados.__getitem__), dtype=vizinhos.dtype)
+
+    coordenadas = None
+    if coords:
+        # Nós sem coordenadas recebem NaN (desenhar_mapa os distribui em círculo)
+        coordenadas = np.full((num_nos, 2), np.nan)
+        for nome, (x, y) in coords.items():
+            if nome in ids:
+                coordenadas[ids[nome]] = (x, y)
+
+    grafo = GrafoCSR(offsets, vizinhos, nomes, inicio_nomes, ordem_nomes, coordenadas, pesos)
+    grafo.ids = ids
+    return grafo
+
+# Separa um bloco de linhas (bytes) de um arquivo de grafo em arrays de
+# nomes: os nós que iniciam cada linha e a origem e o destino de cada aresta,
+# mais o texto do peso de cada aresta (ou None). Uma linha do formato
+# 'arestas' é uma linha de adjacência com exatamente um vizinho, então os
+# dois formatos são separados da mesma forma: o bloco inteiro é dividido de
+# uma vez e as origens são repetidas pelo número de vizinhos de cada linha.
+# Só blocos com comentários, linhas vazias ou linhas inválidas são filtrados
+# linha a linha.
+def separar_bloco_grafo(linhas, formato, separador, primeira_linha, ponderado=False):
+    # Separadores por linha no formato 'arestas': origem, destino e, se houver, peso
+    esperados = (2 if ponderado else 1) if formato == 'arestas' else None
+    texto = b''.join(linhas).replace(b'\r\n', b'\n')
+    if not texto.endswith(b'\n'):
+        texto += b'\n'
+    contagens = np.fromiter(map(bytes.count, linhas, repeat(separador)), dtype=np.int64, count=len(linhas))
+    filtrar = (texto.startswith((b'#', b'\n')) or b'\n#' in texto or b'\n\n' in texto
+               or (esperados is not None and (contagens != esperados).any()))
+    if filtrar:
+        validas = []
+        for numero_linha, linha in enumerate(linhas, primeira_linha):
+            if linha.startswith(b'#') or linha.isspace():
+                continue
+            if esperados is not None and linha.count(separador) != esperados:
+                print(f"Aviso: Linha {numero_linha} não tem exatamente {esperados + 1} campos: {linha!r}")
+                continue
+            validas.append(linha.rstrip(b'\r\n') + b'\n')
+        if not validas:
+            return None
+        return separar_bloco_grafo(validas, formato, separador, primeira_linha, ponderado)
+
+    campos = np.array(texto[:-1].replace(b'\n', separador).split(separador), dtype=np.bytes_)
+    if ponderado:
+        campos = campos.reshape(-1, 3)
+        return campos[:, 0], campos[:, 0], campos[:, 1], campos[:, 2]
+    # Posição do primeiro campo (o nó de origem) de cada linha
+    inicios = np.cumsum(contagens + 1) - (contagens + 1)
+    nos = campos[inicios]
+    return nos, np.repeat(nos, contagens), np.delete(campos, inicios), None
+
+# Lê um arquivo de grafo em blocos de linhas, sem guardar o texto. Formatos:
+# 'arestas' (uma aresta "origem destino" por linha) ou 'adjacencia'
+# ("origem vizinho1 vizinho2 ..."). Linhas vazias ou iniciadas por '#' são
+# ignoradas. Os nomes são numerados em ordem alfabética (dos bytes UTF-8) por
+# uma única ordenação vetorizada no final, sem dicionário, e as arestas
+# guardam a ordem do arquivo. Com ponderado (só no formato 'arestas'), cada
+# linha tem um terceiro campo com o custo (não negativo) da aresta. Com
+# nao_dirigido, cada aresta também é incluída no sentido inverso. O arquivo
+# opcional de coordenadas tem linhas "nome x y". Retorna o GrafoCSR ou None
+# em caso de erro.
+def ler_grafo_arquivo(nome_arquivo, formato='arestas', separador='\t', nao_dirigido=False,
+                      nome_coordenadas=None, ponderado=False, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    if formato not in FORMATOS_GRAFO:
+        raise ValueError(f"Formato de grafo desconhecido: {formato}")
+    if ponderado and formato != 'arestas':
+        raise ValueError("Pesos só são aceitos no formato 'arestas'")
+    separador = separador.encode('utf-8')
+    nos, origens, destinos, pesos = [], [], [], []
+    try:
+        with open(nome_arquivo, 'rb') as arquivo:
+            numero_linha = 1
+            while linhas := arquivo.readlines(tamanho_bloco):
+                bloco = separar_bloco_grafo(linhas, formato, separador, numero_linha, ponderado)
+                if bloco is not None:
+                    nos.append(bloco[0])
+                    origens.append(bloco[1])
+                    destinos.append(bloco[2])
+                    if ponderado:
+                        pesos.append(bloco[3].astype(np.float64))
+                        if (pesos[-1] < 0).any():
+                            print(f"Erro: Pesos negativos no bloco iniciado na linha {numero_linha}")
+                            return None
+                numero_linha += len(linhas)
+    except OSError as e:
+        print(f"Erro ao ler o grafo '{nome_arquivo}': {e}")
+        return None
+    except ValueError as e:
+        print(f"Erro: Peso inválido no bloco iniciado na linha {numero_linha}: {e}")
+        return None
+
+    coords = None
+    if nome_coordenadas is not None:
+        coords = ler_coordenadas_arquivo(nome_coordenadas, separador.decode('utf-8'))
+        if coords is None:
+            return None
+
+    vazio = [np.empty(0, dtype=np.bytes_)]
+    nos = np.concatenate(nos + vazio)
+    origens = np.concatenate(origens + vazio)
+    destinos = np.concatenate(destinos + vazio)
+    num_arestas = len(origens)
+    unicos, codigos = numerar_nomes(np.concatenate([origens, destinos, nos]))
+    del nos
+    origens, destinos = codigos[:num_arestas], codigos[num_arestas:2 * num_arestas]
+    pesos = np.concatenate(pesos + [np.empty(0)]) if ponderado else None
+    if nao_dirigido:
+        # Cada aresta seguida da sua inversa, como se estivessem no arquivo
+        origens, destinos = (np.column_stack([origens, destinos]).ravel(),
+                             np.column_stack([destinos, origens]).ravel())
+        if pesos is not None:
+            pesos = np.repeat(pesos, 2)
+
+    num_nos = len(unicos)
+    offsets, vizinhos, pesos = construir_csr(origens, destinos, num_nos, pesos)
+    nomes, inicio_nomes = tabela_nomes(unicos.tolist())
+    ordem_nomes = np.arange(num_nos, dtype=vizinhos.dtype)  # Os ids já estão em ordem alfabética
+
+    coordenadas = None
+    if coords:
+        # Nós sem coordenadas recebem NaN (desenhar_mapa os distribui em círculo)
+        coordenadas = np.full((num_nos, 2), np.nan)
+        chaves = np.array([nome.encode('utf-8') for nome in coords], dtype=np.bytes_)
+        posicoes = np.searchsorted(unicos, chaves)
+        encontrados = posicoes < num_nos
+        encontrados[encontrados] = unicos[posicoes[encontrados]] == chaves[encontrados]
+        coordenadas[posicoes[encontrados]] = np.array(list(coords.values()))[encontrados]
+
+    grafo = GrafoCSR(offsets, vizinhos, nomes, inicio_nomes, ordem_nomes, coordenadas, pesos)
+    print(f"Grafo carregado: {len(grafo)} nós, {grafo.num_arestas()} arestas")
+    return grafo
+
+# Lê um arquivo de coordenadas com linhas "nome x y"
+def ler_coordenadas_arquivo(nome_arquivo, separador='\t'):
+    coords = {}
+    try:
+        with open(nome_arquivo, encoding='utf-8') as arquivo:
+            for numero_linha, linha in enumerate(arquivo, 1):
+                linha = linha.rstrip('\r\n')
+                if not linha.strip() or linha.startswith('#'):
+                    continue
+                campos = [campo.strip() for campo in linha.split(separador)]
+                try:
+                    coords[campos[0]] = (float(campos[1]), float(campos[2]))
+                except (IndexError, ValueError):
+                    print(f"Aviso: Linha {numero_linha} de coordenadas inválida: {linha!r}")
+    except OSError as e:
+        print(f"Erro ao ler as coordenadas '{nome_arquivo}': {e}")
+        return None
+    return coords
+
+# Caminho padrão do cache de um arquivo de grafo
+def caminho_cache(nome_arquivo):
+    return os.path.splitext(nome_arquivo)[0] + '.grafocache'
+
+def _alinhar(posicao):
+    return -(-posicao // ALINHAMENTO_CACHE) * ALINHAMENTO_CACHE
+
+# Grava o grafo no cache, em um temporário renomeado ao final (um cache
+# incompleto nunca é lido). `metadados` identifica a origem e os parâmetros
+# de leitura, para cache_atualizado.
+def salvar_grafo_binario(grafo, nome_cache, metadados=None):
+    arrays = {nome: getattr(grafo, nome) for nome in ARRAYS_GRAFO if getattr(grafo, nome) is not None}
+    cabecalho = dict(metadados or {})
+    cabecalho['versao'] = VERSAO_CACHE
+    cabecalho['arrays'] = {}
+    deslocamento = 0
+    for nome, dados in arrays.items():
+        cabecalho['arrays'][nome] = {
+            'tipo': dados.dtype.str,
+            'forma': list(dados.shape),
+            'deslocamento': deslocamento,
+        }
+        deslocamento = _alinhar(deslocamento + dados.nbytes)
+
+    texto = json.dumps(cabecalho).encode('utf-8')
+    inicio = _alinhar(len(ASSINATURA_CACHE) + 4 + len(texto))
+    temporario = nome_cache + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(ASSINATURA_CACHE)
+        arquivo.write(struct.pack('<I', len(texto)))
+        arquivo.write(texto)
+        for nome, dados in arrays.items():
+            arquivo.seek(inicio + cabecalho['arrays'][nome]['deslocamento'])
+            np.ascontiguousarray(dados).tofile(arquivo)
+    os.replace(temporario, nome_cache)
+
+def _ler_cabecalho_cache(nome_cache):
+    with open(nome_cache, 'rb') as arquivo:
+        if arquivo.read(len(ASSINATURA_CACHE)) != ASSINATURA_CACHE:
+            raise ValueError(f"'{nome_cache}' não está no formato binário de grafo")
+        (tamanho,) = struct.unpack('<I', arquivo.read(4))
+        cabecalho = json.loads(arquivo.read(tamanho).decode('utf-8'))
+    if cabecalho.get('versao') != VERSAO_CACHE:
+        raise ValueError(f"Versão do cache '{nome_cache}' não suportada: {cabecalho.get('versao')}")
+    return cabecalho, _alinhar(len(ASSINATURA_CACHE) + 4 + tamanho)
+
+# Abre o grafo do cache, com os arrays mapeados em memória (somente leitura)
+def ler_grafo_binario(nome_cache):
+    cabecalho, inicio = _ler_cabecalho_cache(nome_cache)
+    arrays = {}
+    for nome, info in cabecalho['arrays'].items():
+        forma = tuple(info['forma'])
+        if 0 in forma:
+            # Não é possível mapear uma região vazia
+            arrays[nome] = np.empty(forma, dtype=info['tipo'])
+        else:
+            arrays[nome] = np.memmap(nome_cache, dtype=info['tipo'], mode='r',
+                                     offset=inicio + info['deslocamento'], shape=forma)
+    return GrafoCSR(**arrays)
+
+# O cache vale se foi gravado a partir do mesmo arquivo (tamanho e data de
+# modificação) com os mesmos parâmetros de leitura
+def cache_atualizado(nome_cache, metadados):
+    if not os.path.exists(nome_cache):
+        return False
+    try:
+        cabecalho, _ = _ler_cabecalho_cache(nome_cache)
+    except (OSError, ValueError):
+        return False
+    return all(cabecalho.get(chave) == valor for chave, valor in metadados.items())
+
+# Carrega um grafo de arquivo, usando o cache binário quando ele está
+# atualizado e gravando-o caso contrário. Retorna o GrafoCSR ou None.
+def carregar_grafo(nome_arquivo, formato='arestas', separador='\t', nao_dirigido=False,
+                   nome_coordenadas=None, ponderado=False, nome_cache=None):
+    if nome_cache is None:
+        nome_cache = caminho_cache(nome_arquivo)
+    try:
+        metadados = {'parametros': [formato, separador, nao_dirigido, ponderado]}
+        for chave, nome in (('origem', nome_arquivo), ('origem_coordenadas', nome_coordenadas)):
+            if nome is not None:
+                estado = os.stat(nome)
+                metadados[chave] = [estado.st_size, estado.st_mtime_ns]
+    except OSError as e:
+        print(f"Erro ao ler o grafo '{nome_arquivo}': {e}")
+        return None
+
+    if cache_atualizado(nome_cache, metadados):
+        try:
+            return ler_grafo_binario(nome_cache)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao carregar cache: {e}")
+
+    grafo = ler_grafo_arquivo(nome_arquivo, formato, separador, nao_dirigido, nome_coordenadas, ponderado)
+    if grafo is None:
+        return None
+    try:
+        salvar_grafo_binario(grafo, nome_cache, metadados)
+    except OSError as e:
+        print(f"Erro ao gravar cache '{nome_cache}': {e}")
+    return grafo
 
-    path, visited = bfs(graph, start_city, goal_city)
+# Expande um nível inteiro da fronteira de uma vez, com NumPy. Os nós novos
+# ficam na ordem em que a fila da BFS os descobriria, e o pai de cada um é o
+# primeiro nó da fronteira que o alcança.
+def expandir_fronteira_csr(grafo, fronteira, parents):
+    inicios = grafo.offsets[fronteira]
+    graus = grafo.offsets[fronteira + 1] - inicios
+    # Posição de cada vizinho da fronteira em grafo.vizinhos
+    posicoes = np.arange(graus.sum()) + np.repeat(inicios - (np.cumsum(graus) - graus), graus)
+    candidatos = grafo.vizinhos[posicoes]
+    descobridores = np.repeat(fronteira, graus)
+    novos = parents[candidatos] < 0
+    candidatos, descobridores = candidatos[novos], descobridores[novos]
+    _, primeiros = np.unique(candidatos, return_index=True)
+    primeiros.sort()
+    nova_fronteira = candidatos[primeiros]
+    parents[nova_fronteira] = descobridores[primeiros]
+    return nova_fronteira
 
-    if path:
-        resultado = f"Caminho encontrado de {start_city} para {goal_city}: {' -> '.join(path)}"
-        desenhar_mapa(path, visited)
+# Busca em Largura sobre um GrafoCSR, nível a nível, com os pais em um array
+# de inteiros (-1: não descoberto). Recebe e retorna ids: (caminho, array com
+# os nós expandidos), os mesmos caminho e expandidos da bfs sequencial.
+# Um destino None (nó inexistente) expande tudo o que é alcançável.
+def bfs_csr(grafo, start, goal):
+    if start == goal:
+        return [start], np.empty(0, dtype=np.int64)
+
+    parents = np.full(len(grafo), -1, dtype=np.int64)
+    parents[start] = start
+    niveis = []
+    fronteira = np.array([start])
+
+    while len(fronteira):
+        nova_fronteira = expandir_fronteira_csr(grafo, fronteira, parents)
+        if goal is not None and parents[goal] >= 0:
+            # A fila sequencial para ao expandir o nó que descobre o destino
+            posicao = np.flatnonzero(fronteira == parents[goal])[0]
+            niveis.append(fronteira[:posicao + 1])
+            path = [goal]
+            while path[-1] != start:
+                path.append(int(parents[path[-1]]))
+            path.reverse()
+            return path, np.concatenate(niveis)
+        niveis.append(fronteira)
+        fronteira = nova_fronteira
+
+    return None, np.concatenate(niveis)
+
+# Busca em Largura bidirecional sobre um GrafoCSR, nível a nível como
+# bfs_csr, com os pais de cada lado em um array de inteiros; o lado do
+# destino expande `transposto` (os predecessores). Dá o mesmo encontro da
+# versão sequencial: o primeiro nó do nível, na ordem da fila, que o outro
+# lado já alcançou. Recebe e retorna ids: (caminho, array com os nós
+# expandidos).
+def bfs_bidirecional_csr(grafo, transposto, start, goal):
+    if start == goal:
+        return [start], np.empty(0, dtype=np.int64)
+
+    parents_start = np.full(len(grafo), -1, dtype=np.int64)
+    parents_goal = np.full(len(grafo), -1, dtype=np.int64)
+    parents_start[start] = start
+    parents_goal[goal] = goal
+    fronteira_start = np.array([start])
+    fronteira_goal = np.array([goal])
+    niveis = []
+
+    while len(fronteira_start) and len(fronteira_goal):
+        lado_start = len(fronteira_start) <= len(fronteira_goal)
+        if lado_start:
+            fronteira, parents, outros = fronteira_start, parents_start, parents_goal
+            fronteira_start = expandir_fronteira_csr(grafo, fronteira, parents)
+            nova_fronteira = fronteira_start
+        else:
+            fronteira, parents, outros = fronteira_goal, parents_goal, parents_start
+            fronteira_goal = expandir_fronteira_csr(transposto, fronteira, parents)
+            nova_fronteira = fronteira_goal
+
+        encontros = nova_fronteira[outros[nova_fronteira] >= 0]
+        if len(encontros):
+            # A fila sequencial para ao expandir o nó que descobre o encontro
+            meeting = int(encontros[0])
+            posicao = np.flatnonzero(fronteira == parents[meeting])[0]
+            niveis.append(fronteira[:posicao + 1])
+            path = [meeting]
+            while path[-1] != start:
+                path.append(int(parents_start[path[-1]]))
+            path.reverse()
+            # Os pais do lado do destino apontam para o destino
+            while path[-1] != goal:
+                path.append(int(parents_goal[path[-1]]))
+            return path, np.concatenate(niveis)
+        niveis.append(fronteira)
+
+    return None, np.concatenate(niveis)
+
+# bfs_bidirecional_csr com nomes de nós, no formato de retorno de bfs
+def bfs_bidirecional_nomes_csr(grafo, start, goal, reverse_graph=None):
+    inicio = grafo.id_de(start)
+    if inicio is None:
+        raise KeyError(start)
+    fim = grafo.id_de(goal)
+    if fim is None:
+        # Destino inexistente: como na fila sequencial, a busca a partir
+        # da origem expande tudo o que é alcançável
+        _, expandidos = bfs_csr(grafo, inicio, None)
+        return None, {grafo.nome(no) for no in expandidos}
+    if reverse_graph is None:
+        reverse_graph = grafo.transposto()
+    path, expandidos = bfs_bidirecional_csr(grafo, reverse_graph, inicio, fim)
+    if path is not None:
+        path = [grafo.nome(no) for no in path]
+    return path, {grafo.nome(no) for no in expandidos}
+
+# Árvore de BFS completa a partir de `start`: (parents, ordem), com o pai de
+# cada nó (-1 se inalcançável; a origem é pai de si mesma) e os nós
+# alcançados na ordem em que a BFS os expande. Os pais são os mesmos que
+# bfs_csr encontra, então a árvore responde por qualquer destino.
+def arvore_bfs_csr(grafo, start):
+    parents = np.full(len(grafo), -1, dtype=grafo.vizinhos.dtype)
+    parents[start] = start
+    niveis = []
+    fronteira = np.array([start], dtype=grafo.vizinhos.dtype)
+    while len(fronteira):
+        niveis.append(fronteira)
+        fronteira = expandir_fronteira_csr(grafo, fronteira, parents)
+    return parents, np.concatenate(niveis)
+
+# Caminho de `start` até `goal` em uma árvore de arvore_bfs_csr, em
+# O(tamanho do caminho), ou None se o destino é inalcançável
+def caminho_na_arvore(parents, start, goal):
+    if parents[goal] < 0:
+        return None
+    path = [goal]
+    while path[-1] != start:
+        path.append(int(parents[path[-1]]))
+    path.reverse()
+    return path
+
+# Serviço de rotas: calcula a árvore de BFS de cada origem uma única vez e
+# responde qualquer destino a partir dela, com os mesmos caminho e nós
+# expandidos de bfs. As árvores ficam em um cache LRU (menos recentemente
+# usado) limitado por um orçamento de memória em bytes; uma árvore maior que
+# o orçamento é usada e descartada. Com todos_pares, as árvores de todas as
+# origens são pré-calculadas em duas matrizes n x n (pais e ordem de
+# expansão), se couberem no orçamento, o que só é viável em grafos pequenos.
+class ServicoRotas:
+    def __init__(self, grafo, orcamento_memoria=ORCAMENTO_MEMORIA_ROTAS, todos_pares=False):
+        self.grafo = grafo
+        self.orcamento_memoria = orcamento_memoria
+        self.arvores = OrderedDict()
+        self.memoria_usada = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self.matriz_pais = None
+        self.matriz_ordem = None
+        self.alcancados = None
+        if todos_pares:
+            self.pre_calcular_todos_pares()
+
+    # Pré-calcula as árvores de todas as origens: a linha i de matriz_pais é
+    # a árvore da origem i, e matriz_ordem[i, :alcancados[i]] a sua ordem de
+    # expansão. Os caminhos são reconstruídos pela matriz de pais (e não por
+    # uma tabela de próximo salto) para reproduzir exatamente os de bfs.
+    def pre_calcular_todos_pares(self):
+        num_nos = len(self.grafo)
+        tipo = self.grafo.vizinhos.dtype
+        necessario = 2 * num_nos * num_nos * tipo.itemsize
+        if necessario > self.orcamento_memoria:
+            print(f"Aviso: As tabelas de todos os pares ocupariam {necessario} bytes, "
+                  f"acima do orçamento de {self.orcamento_memoria}; usando o cache de árvores")
+            return False
+        self.matriz_pais = np.empty((num_nos, num_nos), dtype=tipo)
+        self.matriz_ordem = np.full((num_nos, num_nos), -1, dtype=tipo)
+        self.alcancados = np.empty(num_nos, dtype=np.int64)
+        for origem in range(num_nos):
+            parents, ordem = arvore_bfs_csr(self.grafo, origem)
+            self.matriz_pais[origem] = parents
+            self.matriz_ordem[origem, :len(ordem)] = ordem
+            self.alcancados[origem] = len(ordem)
+        self.limpar()
+        self.memoria_usada = necessario
+        return True
+
+    # Árvore (parents, ordem) de uma origem: das tabelas de todos os pares,
+    # do cache ou calculada agora
+    def arvore(self, origem):
+        if self.matriz_pais is not None:
+            self.acertos += 1
+            return self.matriz_pais[origem], self.matriz_ordem[origem, :self.alcancados[origem]]
+        arvore = self.arvores.get(origem)
+        if arvore is not None:
+            self.arvores.move_to_end(origem)
+            self.acertos += 1
+            return arvore
+
+        self.falhas += 1
+        arvore = arvore_bfs_csr(self.grafo, origem)
+        tamanho = arvore[0].nbytes + arvore[1].nbytes
+        if tamanho <= self.orcamento_memoria:
+            while self.memoria_usada + tamanho > self.orcamento_memoria:
+                _, (parents, ordem) = self.arvores.popitem(last=False)
+                self.memoria_usada -= parents.nbytes + ordem.nbytes
+                self.remocoes += 1
+            self.arvores[origem] = arvore
+            self.memoria_usada += tamanho
+        return arvore
+
+    # Caminho (ids) de origem a destino, ou None
+    def rota(self, origem, destino):
+        parents, _ = self.arvore(origem)
+        return caminho_na_arvore(parents, origem, destino)
+
+    # Caminho e nós expandidos (ids), como bfs_csr: a BFS teria parado ao
+    # expandir o pai do destino, então os expandidos são os nós da ordem de
+    # expansão até ele (ou todos os alcançados, se não houver caminho)
+    def rota_com_expandidos(self, origem, destino):
+        if origem == destino:
+            return [origem], np.empty(0, dtype=np.int64)
+        parents, ordem = self.arvore(origem)
+        path = caminho_na_arvore(parents, origem, destino) if destino is not None else None
+        if path is None:
+            return None, ordem
+        posicao = np.flatnonzero(ordem == path[-2])[0]
+        return path, ordem[:posicao + 1]
+
+    # Caminhos (ids) de vários pares (origem, destino), na ordem recebida.
+    # Os pares são agrupados por origem, então cada árvore é obtida uma vez.
+    def rotas_lote(self, pares):
+        por_origem = {}
+        for indice, (origem, destino) in enumerate(pares):
+            por_origem.setdefault(origem, []).append((indice, destino))
+        caminhos = [None] * len(pares)
+        for origem, consultas in por_origem.items():
+            parents, _ = self.arvore(origem)
+            for indice, destino in consultas:
+                caminhos[indice] = caminho_na_arvore(parents, origem, destino)
+        return caminhos
+
+    # Mesmo contrato de bfs, com nomes: (caminho, visitados)
+    def buscar(self, start, goal):
+        inicio = self.grafo.id_de(start)
+        if inicio is None:
+            raise KeyError(start)
+        path, expandidos = self.rota_com_expandidos(inicio, self.grafo.id_de(goal))
+        if path is not None:
+            path = [self.grafo.nome(no) for no in path]
+        return path, {self.grafo.nome(no) for no in expandidos}
+
+    # Descarta as árvores do cache (os contadores são mantidos)
+    def limpar(self):
+        self.arvores.clear()
+        self.memoria_usada = 0
+
+    # Acertos, falhas, remoções, árvores guardadas, memória usada e taxa de acerto (%)
+    def estatisticas(self):
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'arvores': len(self.arvores),
+            'memoria_usada': self.memoria_usada,
+            'taxa_acerto': (self.acertos / consultas) * 100 if consultas else 0.0,
+        }
+
+# Busca de custo uniforme (sem heurística) ou A* (com heurística) sobre um
+# GrafoCSR, com um heap de prioridades. Um nó pode entrar no heap mais de uma
+# vez, se um caminho mais barato até ele for encontrado depois; as entradas
+# antigas são descartadas ao sair (o nó já está fechado). O A* ordena o heap
+# por custo + estimativa, com a distância euclidiana até o destino,
+# multiplicada por escala_heuristica, como estimativa; sem coordenadas para
+# todos os nós, equivale à busca de custo uniforme. Como a estimativa é
+# consistente, o primeiro caminho que retira o destino do heap é o de menor
+# custo. Recebe e retorna ids: (caminho, custo, lista dos nós expandidos).
+def busca_custo_csr(grafo, start, goal, usar_heuristica=False):
+    if start == goal:
+        return [start], 0.0, []
+
+    pesos = grafo.pesos_arestas()
+    heuristica = usar_heuristica and goal is not None and grafo.tem_coordenadas()
+    if heuristica:
+        escala = grafo.escala_heuristica()
+        alvo = grafo.coordenadas[goal]
+
+    # Dicionários: só os nós alcançados ocupam memória
+    custos = {start: 0.0}
+    parents = {start: None}
+    fechados = set()
+    expandidos = []
+    fila = [(0.0, start)]
+
+    while fila:
+        _, no = heapq.heappop(fila)
+        if no in fechados:
+            continue
+        if no == goal:
+            return reconstruir_caminho(parents, goal), custos[goal], expandidos
+        fechados.add(no)
+        expandidos.append(no)
+
+        inicio, fim = grafo.offsets[no], grafo.offsets[no + 1]
+        vizinhos = grafo.vizinhos[inicio:fim]
+        novos_custos = custos[no] + pesos[inicio:fim]
+        prioridades = novos_custos
+        if heuristica:
+            diferencas = grafo.coordenadas[vizinhos] - alvo
+            prioridades = novos_custos + escala * np.hypot(diferencas[:, 0], diferencas[:, 1])
+
+        for vizinho, custo, prioridade in zip(vizinhos.tolist(), novos_custos.tolist(), prioridades.tolist()):
+            if custo < custos.get(vizinho, math.inf):
+                custos[vizinho] = custo
+                parents[vizinho] = no
+                heapq.heappush(fila, (prioridade, vizinho))
+
+    return None, math.inf, expandidos
+
+# busca_custo_csr com nomes de nós, no formato de retorno de bfs. Um
+# dicionário de adjacência é convertido para GrafoCSR (com custo 1 por aresta).
+def busca_custo_nomes(graph, start, goal, usar_heuristica):
+    if not isinstance(graph, GrafoCSR):
+        graph = GrafoCSR.de_dicionario(graph)
+    inicio = graph.id_de(start)
+    if inicio is None:
+        raise KeyError(start)
+    path, _, expandidos = busca_custo_csr(graph, inicio, graph.id_de(goal), usar_heuristica)
+    if path is not None:
+        path = [graph.nome(no) for no in path]
+    return path, {graph.nome(no) for no in expandidos}
+
+# Busca de custo uniforme: caminho de menor custo, expandindo em ordem de custo
+def busca_custo_uniforme(graph, start, goal):
+    return busca_custo_nomes(graph, start, goal, usar_heuristica=False)
+
+# A*: caminho de menor custo, guiado pela distância em linha reta até o destino
+def busca_a_estrela(graph, start, goal):
+    return busca_custo_nomes(graph, start, goal, usar_heuristica=True)
+
+# Custo de um caminho (lista de nomes) no grafo
+def custo_caminho(grafo, path):
+    ids = [grafo.id_de(cidade) for cidade in path]
+    return sum(grafo.custo_aresta(origem, destino) for origem, destino in zip(ids, ids[1:]))
+
+# Algoritmos disponíveis na interface
+algoritmos = {
+    'Busca em Largura': bfs,
+    'Busca em Largura Bidirecional': bfs_bidirecional,
+    'Busca de Custo Uniforme': busca_custo_uniforme,
+    'A*': busca_a_estrela,
+}
+
+# Executa cada algoritmo em cada par (origem, destino) do grafo e retorna,
+# por algoritmo, o total de nós expandidos, o custo total dos caminhos
+# encontrados e o tempo total, para comparar a exploração de cada um
+def comparar_algoritmos(grafo, pares, nomes_algoritmos=None):
+    resultados = {}
+    for nome in nomes_algoritmos or algoritmos:
+        busca = algoritmos[nome]
+        expandidos, custo, inicio = 0, 0.0, time.perf_counter()
+        for start, goal in pares:
+            path, visited = busca(grafo, start, goal)
+            expandidos += len(visited)
+            if path is not None:
+                custo += custo_caminho(grafo, path)
+        resultados[nome] = {
+            'expandidos': expandidos,
+            'custo': custo,
+            'tempo': time.perf_counter() - inicio,
+        }
+    return resultados
+
+# Posições de desenho dos nós: as coordenadas do grafo ou, para os nós sem
+# coordenadas, pontos em um círculo no centro da área de desenho
+def posicoes_desenho(grafo, largura=1087, altura=682):
+    num_nos = len(grafo)
+    if grafo.coordenadas is not None:
+        posicoes = np.array(grafo.coordenadas, dtype=np.float64)
     else:
-        resultado = f"Não foi possível encontrar um caminho de {start_city} para {goal_city}"
-        desenhar_mapa([], visited)
-    resultado_var.set(resultado)
-
-# Função para desenhar o mapa com o caminho encontrado
-def desenhar_mapa(path, visited):
-    canvas.delete("all")
-
-    for cidade, vizinhos in graph.items():
-        x1, y1 = city_coords[cidade]
-        for vizinho in vizinhos:
-            x2, y2 = city_coords[vizinho]
-            canvas.create_line(x1, y1, x2, y2, fill="gray", width=2)
+        posicoes = np.full((num_nos, 2), np.nan)
+    sem_coordenadas = np.flatnonzero(np.isnan(posicoes).any(axis=1))
+    angulos = 2 * np.pi * np.arange(len(sem_coordenadas)) / max(len(sem_coordenadas), 1)
+    raio = 0.45 * min(largura, altura)
+    posicoes[sem_coordenadas, 0] = largura / 2 + raio * np.cos(angulos)
+    posicoes[sem_coordenadas, 1] = altura / 2 + raio * np.sin(angulos)
+    return posicoes.tolist()
+
+# Interface gráfica. O tkinter só é importado aqui: o restante do módulo (o
+# núcleo de busca e o modo em lote) funciona sem display e sem o custo de
+# iniciar o Tk.
+class InterfaceBusca:
+    def __init__(self, grafo):
+        import tkinter as tk
+        from tkinter import ttk, messagebox
+
+        self.grafo = grafo
+        self.messagebox = messagebox
+        self.posicoes = posicoes_desenho(grafo)
+        # Grafos pequenos como o mapa da Romênia cabem nas tabelas de todos os pares
+        self.servico_rotas = ServicoRotas(grafo, todos_pares=len(grafo) <= LIMITE_TODOS_PARES)
+
+        self.root = tk.Tk()
+        self.root.title("Busca em Largura - BFS")
+
+        cidades = list(grafo)
+
+        frame = ttk.Frame(self.root, padding=20)
+        frame.grid(row=0, column=0, sticky="nw")
+
+        ttk.Label(frame, text="Cidade de Origem:").grid(column=0, row=0, sticky=tk.W)
+        self.origem_var = tk.StringVar(value=cidades[0])
+        origem_menu = ttk.Combobox(frame, textvariable=self.origem_var, values=cidades, state="readonly")
+        origem_menu.grid(column=1, row=0)
+
+        ttk.Label(frame, text="Cidade de Destino:").grid(column=0, row=1, sticky=tk.W)
+        self.destino_var = tk.StringVar(value=cidades[min(1, len(cidades) - 1)])
+        destino_menu = ttk.Combobox(frame, textvariable=self.destino_var, values=cidades, state="readonly")
+        destino_menu.grid(column=1, row=1)
+
+        ttk.Label(frame, text="Algoritmo:").grid(column=0, row=2, sticky=tk.W)
+        self.algoritmo_var = tk.StringVar(value=next(iter(algoritmos)))
+        algoritmo_menu = ttk.Combobox(frame, textvariable=self.algoritmo_var, values=list(algoritmos), state="readonly")
+        algoritmo_menu.grid(column=1, row=2)
+
+        buscar_btn = ttk.Button(frame, text="Buscar Caminho", command=self.buscar_caminho)
+        buscar_btn.grid(column=0, row=3, columnspan=2, pady=12)
+
+        self.resultado_var = tk.StringVar()
+        resultado_label = ttk.Label(frame, textvariable=self.resultado_var, wraplength=400)
+        resultado_label.grid(column=0, row=4, columnspan=2, pady=12)
 
-    if path and len(path) > 1:
-        for i in range(len(path)-1):
-            x1, y1 = city_coords[path[i]]
-            x2, y2 = city_coords[path[i+1]]
-            canvas.create_line(x1, y1, x2, y2, fill="red", width=4)
-
-    for cidade, (x, y) in city_coords.items():
-        if path and cidade in path:
-            cor = "red"
-        elif cidade in visited: 
-            cor = "orange" 
+        self.canvas = tk.Canvas(self.root, width=1087, height=682, bg="white")
+        self.canvas.grid(row=0, column=1, padx=10, pady=12)
+
+        # Desenhar o mapa inicial
+        self.desenhar_mapa([], set())
+
+    def executar(self):
+        self.root.mainloop()
+
+    # Função para buscar o caminho e desenhar o mapa
+    def buscar_caminho(self):
+        start_city = self.origem_var.get()
+        goal_city = self.destino_var.get()
+        if start_city == goal_city:
+            self.messagebox.showinfo("Resultado", "A cidade de origem e destino são iguais.")
+            self.desenhar_mapa([], set())
+            return
+
+        nome_algoritmo = self.algoritmo_var.get()
+        if nome_algoritmo == 'Busca em Largura':
+            # Árvores de BFS por origem, reaproveitadas entre os cliques
+            path, visited = self.servico_rotas.buscar(start_city, goal_city)
         else:
-            cor = "blue"
+            path, visited = algoritmos[nome_algoritmo](self.grafo, start_city, goal_city)
+
+        if path:
+            resultado = (f"Caminho encontrado de {start_city} para {goal_city}: {' -> '.join(path)}\n"
+                         f"Custo: {custo_caminho(self.grafo, path):g} | Nós expandidos: {len(visited)}")
+            self.desenhar_mapa(path, visited)
+        else:
+            resultado = (f"Não foi possível encontrar um caminho de {start_city} para {goal_city}\n"
+                         f"Nós expandidos: {len(visited)}")
+            self.desenhar_mapa([], visited)
+        self.resultado_var.set(resultado)
+
+    # Função para desenhar o mapa com o caminho encontrado
+    def desenhar_mapa(self, path, visited):
+        canvas = self.canvas
+        posicoes = self.posicoes
+        canvas.delete("all")
+
+        origens, destinos = self.grafo.arestas()
+        for origem, destino in zip(origens.tolist(), destinos.tolist()):
+            x1, y1 = posicoes[origem]
+            x2, y2 = posicoes[destino]
+            canvas.create_line(x1, y1, x2, y2, fill="gray", width=2)
+
+        if path and len(path) > 1:
+            for i in range(len(path)-1):
+                x1, y1 = posicoes[self.grafo.id_de(path[i])]
+                x2, y2 = posicoes[self.grafo.id_de(path[i+1])]
+                canvas.create_line(x1, y1, x2, y2, fill="red", width=4)
+
+        no_caminho = set(path or [])
+        for no, (x, y) in enumerate(posicoes):
+            cidade = self.grafo.nome(no)
+            if cidade in no_caminho:
+                cor = "red"
+            elif cidade in visited: 
+                cor = "orange" 
+            else:
+                cor = "blue"
+
+            canvas.create_oval(x-7, y-7, x+7, y+7, fill=cor)
+            canvas.create_text(x, y-15, text=cidade, font=("Arial", 12), fill="black")
 
-        canvas.create_oval(x-7, y-7, x+7, y+7, fill=cor)
-        canvas.create_text(x, y-15, text=cidade, font=("Arial", 12), fill="black")
+# Abre o grafo descrito pelos parâmetros de linha de comando: o mapa da
+# Romênia (arquivo None) ou um arquivo de grafo, pelo cache binário quando
+# possível. Retorna o GrafoCSR ou None.
+def abrir_grafo(arquivo, formato='arestas', separador='\t', nao_dirigido=False,
+                coordenadas=None, ponderado=False):
+    if arquivo is None:
+        return GrafoCSR.de_dicionario(graph, city_coords, road_costs)
+    return carregar_grafo(arquivo, formato, separador, nao_dirigido, coordenadas, ponderado)
 
-# Interface gráfica
-root = tk.Tk()
-root.title("Busca em Largura - BFS")
+# Estado de cada processo do modo em lote: o grafo (aberto do cache binário,
+# cujas páginas mapeadas são compartilhadas pelo sistema operacional entre os
+# processos), o serviço de rotas e o algoritmo
+_grafo_lote = None
+_servico_lote = None
+_algoritmo_lote = None
 
-cidades = list(graph.keys())
+def _inicializar_trabalhador(parametros_grafo, algoritmo, orcamento_memoria):
+    global _grafo_lote, _servico_lote, _algoritmo_lote
+    # A saída padrão é dos resultados: avisos da leitura do grafo vão para stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        _grafo_lote = abrir_grafo(*parametros_grafo)
+    _servico_lote = ServicoRotas(_grafo_lote, orcamento_memoria)
+    _algoritmo_lote = algoritmo
 
-frame = ttk.Frame(root, padding=20)
-frame.grid(row=0, column=0, sticky="nw")
+# Responde uma tarefa do modo em lote: uma lista de grupos
+# (origem, [(linha, destino), ...]) com nomes. Cada origem tem a sua árvore
+# (ou a sua busca) obtida uma vez para todos os destinos do grupo. Retorna
+# pares (linha, resultado em JSON).
+def _responder_grupos(grupos):
+    grafo = _grafo_lote
+    respostas = []
+    for origem, consultas in grupos:
+        inicio = grafo.id_de(origem)
+        if _algoritmo_lote == 'bfs' and inicio is not None:
+            parents, _ = _servico_lote.arvore(inicio)
+        for linha, destino in consultas:
+            resultado = {'linha': linha, 'origem': origem, 'destino': destino}
+            fim = grafo.id_de(destino)
+            if inicio is None or fim is None:
+                resultado['erro'] = f"Nó desconhecido: {origem if inicio is None else destino}"
+            elif _algoritmo_lote == 'bfs':
+                path = caminho_na_arvore(parents, inicio, fim)
+                resultado['caminho'] = None if path is None else [grafo.nome(no) for no in path]
+            else:
+                path, custo, _ = busca_custo_csr(grafo, inicio, fim, _algoritmo_lote == 'a_estrela')
+                resultado['caminho'] = None if path is None else [grafo.nome(no) for no in path]
+                resultado['custo'] = None if path is None else custo
+            respostas.append((linha, json.dumps(resultado, ensure_ascii=False)))
+    return respostas
 
-ttk.Label(frame, text="Cidade de Origem:").grid(column=0, row=0, sticky=tk.W)
-origem_var = tk.StringVar(value=cidades[0])
-origem_menu = ttk.Combobox(frame, textvariable=origem_var, values=cidades, state="readonly")
-origem_menu.grid(column=1, row=0)
+# Lê as consultas "origem destino" em blocos de até tamanho_bloco linhas,
+# com o número de cada linha. Linhas vazias ou iniciadas por '#' são
+# ignoradas; linhas sem exatamente dois campos geram um aviso (em stderr).
+def ler_blocos_consultas(arquivo, separador='\t', tamanho_bloco=TAMANHO_BLOCO_CONSULTAS):
+    bloco = []
+    for numero_linha, linha in enumerate(arquivo, 1):
+        linha = linha.rstrip('\r\n')
+        if not linha.strip() or linha.startswith('#'):
+            continue
+        campos = linha.split(separador)
+        if len(campos) != 2:
+            print(f"Aviso: Linha {numero_linha} não tem exatamente dois nós: {linha!r}", file=sys.stderr)
+            continue
+        bloco.append((numero_linha, campos[0], campos[1]))
+        if len(bloco) == tamanho_bloco:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
 
-ttk.Label(frame, text="Cidade de Destino:").grid(column=0, row=1, sticky=tk.W)
-destino_var = tk.StringVar(value=cidades[1])
-destino_menu = ttk.Combobox(frame, textvariable=destino_var, values=cidades, state="readonly")
-destino_menu.grid(column=1, row=1)
+# Agrupa um bloco de consultas por origem e divide os grupos em até
+# num_tarefas tarefas com números parecidos de consultas (grupos inteiros,
+# para que cada árvore seja calculada por um único processo)
+def dividir_em_tarefas(bloco, num_tarefas):
+    grupos = {}
+    for linha, origem, destino in bloco:
+        grupos.setdefault(origem, []).append((linha, destino))
+    tarefas = [[] for _ in range(num_tarefas)]
+    cargas = [(0, i) for i in range(num_tarefas)]
+    # Maiores grupos primeiro, cada um para a tarefa com menos consultas
+    for origem, consultas in sorted(grupos.items(), key=lambda item: -len(item[1])):
+        carga, i = heapq.heappop(cargas)
+        tarefas[i].append((origem, consultas))
+        heapq.heappush(cargas, (carga + len(consultas), i))
+    return [tarefa for tarefa in tarefas if tarefa]
 
-buscar_btn = ttk.Button(frame, text="Buscar Caminho", command=buscar_caminho)
-buscar_btn.grid(column=0, row=2, columnspan=2, pady=12)
+# Modo em lote, sem interface: responde as consultas de `entrada` e escreve
+# um resultado JSON por linha em `saida`, na ordem das consultas, à medida
+# que cada bloco é concluído. Com num_processos > 1, os grupos de cada bloco
+# são distribuídos entre processos, cada um com o grafo e o seu próprio
+# cache de árvores. Retorna o número de consultas respondidas.
+def executar_lote(parametros_grafo, entrada, saida, algoritmo='bfs', num_processos=1,
+                  separador='\t', tamanho_bloco=TAMANHO_BLOCO_CONSULTAS,
+                  orcamento_memoria=ORCAMENTO_MEMORIA_ROTAS):
+    if algoritmo not in ALGORITMOS_LOTE:
+        raise ValueError(f"Algoritmo desconhecido: {algoritmo}")
+    argumentos = (parametros_grafo, algoritmo, orcamento_memoria)
+    executor = None
+    if num_processos > 1:
+        executor = ProcessPoolExecutor(max_workers=num_processos, initializer=_inicializar_trabalhador,
+                                       initargs=argumentos)
+    else:
+        _inicializar_trabalhador(*argumentos)
+
+    respondidas = 0
+    try:
+        for bloco in ler_blocos_consultas(entrada, separador, tamanho_bloco):
+            # Várias tarefas por processo equilibram origens de custos diferentes
+            tarefas = dividir_em_tarefas(bloco, 4 * num_processos if executor else 1)
+            if executor is None:
+                respostas = [_responder_grupos(tarefa) for tarefa in tarefas]
+            else:
+                respostas = executor.map(_responder_grupos, tarefas)
+            resultados = sorted(resposta for parte in respostas for resposta in parte)
+            saida.write(''.join(texto + '\n' for _, texto in resultados))
+            saida.flush()
+            respondidas += len(resultados)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return respondidas
 
-resultado_var = tk.StringVar()
-resultado_label = ttk.Label(frame, textvariable=resultado_var, wraplength=400)
-resultado_label.grid(column=0, row=3, columnspan=2, pady=12)
+def main():
+    parser = argparse.ArgumentParser(description="Busca em Largura em um mapa")
+    parser.add_argument('arquivo_grafo', nargs='?', help="Arquivo de grafo (padrão: mapa da Romênia)")
+    parser.add_argument('--formato', choices=FORMATOS_GRAFO, default='arestas')
+    parser.add_argument('--separador', default='\t')
+    parser.add_argument('--nao-dirigido', action='store_true')
+    parser.add_argument('--ponderado', action='store_true', help="Arestas com um terceiro campo de custo")
+    parser.add_argument('--coordenadas', help="Arquivo com linhas 'nome x y'")
+    parser.add_argument('--lote', nargs='?', const='-', metavar='ARQUIVO_CONSULTAS',
+                        help="Modo em lote, sem interface: lê pares 'origem destino' do arquivo "
+                             "(ou da entrada padrão, se omitido) e escreve JSON lines")
+    parser.add_argument('--saida', default='-', help="Arquivo de resultados do modo em lote (padrão: saída padrão)")
+    parser.add_argument('--algoritmo', choices=ALGORITMOS_LOTE, default='bfs',
+                        help="Algoritmo do modo em lote")
+    parser.add_argument('--processos', type=int, default=1, help="Número de processos do modo em lote")
+    parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO_CONSULTAS,
+                        help="Consultas lidas e respondidas por bloco no modo em lote")
+    args = parser.parse_args()
+
+    parametros_grafo = (args.arquivo_grafo, args.formato, args.separador, args.nao_dirigido,
+                        args.coordenadas, args.ponderado)
+    if args.lote is None:
+        grafo = abrir_grafo(*parametros_grafo)
+        if grafo is None:
+            sys.exit(1)
+        InterfaceBusca(grafo).executar()
+        return
 
-canvas = tk.Canvas(root, width=1087, height=682, bg="white")
-canvas.grid(row=0, column=1, padx=10, pady=12)
+    # Lê o grafo uma vez antes dos processos, para que o cache binário já
+    # exista e cada processo só precise mapeá-lo
+    with contextlib.redirect_stdout(sys.stderr):
+        grafo = abrir_grafo(*parametros_grafo)
+    if grafo is None:
+        sys.exit(1)
+    del grafo
 
-# Desenhar o mapa inicial
-desenhar_mapa([], set())
+    entrada = sys.stdin if args.lote == '-' else open(args.lote, encoding='utf-8')
+    saida = sys.stdout if args.saida == '-' else open(args.saida, 'w', encoding='utf-8')
+    try:
+        inicio = time.perf_counter()
+        respondidas = executar_lote(parametros_grafo, entrada, saida, args.algoritmo,
+                                    args.processos, args.separador, args.tamanho_bloco)
+        print(f"{respondidas} consultas respondidas em {time.perf_counter() - inicio:.2f} s",
+              file=sys.stderr)
+    finally:
+        if entrada is not sys.stdin:
+            entrada.close()
+        if saida is not sys.stdout:
+            saida.close()
 
-root.mainloop()
+if __name__ == "__main__":
+    main()
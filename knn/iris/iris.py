@@ -1,7 +1,453 @@
 
 import csv
+import hashlib
+import heapq
+import json
 import math
+import multiprocessing
+import os
 import random
+import struct
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Número máximo de elementos (consultas x treino x características) processados
+# por bloco na predição em lote, limitando o uso de memória
+ELEMENTOS_POR_BLOCO = 2 ** 22
+
+# Número de amostras por bloco na leitura em fluxo dos arquivos CSV
+TAMANHO_BLOCO_LEITURA = 10000
+
+# Formato binário de cache dos datasets: assinatura, tamanho do cabeçalho JSON
+# (uint32 little-endian), cabeçalho JSON e arrays alinhados em 64 bytes
+ASSINATURA_CACHE = b'KNNCACHE'
+VERSAO_CACHE = 2
+ALINHAMENTO_CACHE = 64
+
+# Treino incremental: o índice de busca é reconstruído quando as amostras
+# adicionadas depois da sua construção (varridas linearmente) passam desta
+# fração das indexadas, e o armazenamento é compactado quando as amostras
+# marcadas como removidas passam desta fração do total
+FRACAO_RECONSTRUCAO_INDICE = 0.25
+FRACAO_COMPACTACAO = 0.5
+
+# Métodos de redução do conjunto de treino (ver reduzir_prototipos): edição de
+# Wilson, condensação de Hart ou as duas, nessa ordem
+METODOS_REDUCAO = ('edicao', 'condensacao', 'edicao_condensacao')
+
+
+def realocar(array, usados, capacidade):
+    """
+    Copia as primeiras linhas de um array para um novo array com mais capacidade.
+    
+    Args:
+        array: np.ndarray de origem
+        usados (int): Número de linhas a copiar
+        capacidade (int): Número de linhas do novo array
+        
+    Returns:
+        np.ndarray: Novo array (capacidade x demais dimensões), do mesmo tipo
+    """
+    novo = np.empty((capacidade,) + array.shape[1:], dtype=array.dtype)
+    novo[:usados] = array[:usados]
+    return novo
+
+
+def selecionar_vizinhos(distancias, k):
+    """
+    Seleciona, em cada linha, os índices das k menores distâncias, em ordem.
+    
+    O resultado é o mesmo de uma ordenação estável completa seguida de um
+    corte em k (empates resolvidos pelo menor índice), sem ordenar a linha
+    inteira: np.partition dá a k-ésima distância de cada linha, entram todas
+    as amostras abaixo dela e, entre as iguais a ela, as de menor índice, e
+    só esses k candidatos são ordenados.
+    
+    Args:
+        distancias: np.ndarray (consultas x amostras)
+        k (int): Número de vizinhos
+        
+    Returns:
+        np.ndarray: Índices dos vizinhos (consultas x k), do mais próximo ao mais distante
+    """
+    num_linhas, num_amostras = distancias.shape
+    k = min(k, num_amostras)
+    if k == 0 or num_linhas == 0:
+        return np.empty((num_linhas, k), dtype=np.intp)
+    if k == num_amostras:
+        return np.argsort(distancias, axis=1, kind='stable')
+    
+    limites = np.partition(distancias, k - 1, axis=1)[:, k - 1:k]
+    abaixo = distancias < limites
+    iguais = distancias == limites
+    faltam = k - abaixo.sum(axis=1)
+    mascara = abaixo | (iguais & (np.cumsum(iguais, axis=1) <= faltam[:, np.newaxis]))
+    candidatos = np.nonzero(mascara)[1].reshape(num_linhas, k)
+    # Os candidatos estão em ordem de índice; a ordenação estável mantém o desempate
+    ordem = np.argsort(np.take_along_axis(distancias, candidatos, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidatos, ordem, axis=1)
+
+
+class ArvoreVizinhos(ABC):
+    """
+    Base das árvores de busca exata dos k vizinhos mais próximos.
+    
+    Os pontos são reordenados de forma que cada nó corresponda a um intervalo
+    contíguo. As subclasses definem o resumo guardado em cada nó e o limite
+    inferior de distância de uma consulta até qualquer ponto do nó, usado
+    para podar a busca.
+    """
+    
+    def __init__(self, matriz, tamanho_folha=16):
+        """
+        Constrói a árvore sobre os pontos de treino.
+        
+        Args:
+            matriz: np.ndarray (amostras x características) com os pontos
+            tamanho_folha (int): Número máximo de pontos em uma folha
+        """
+        self.tamanho_folha = tamanho_folha
+        self.indices = np.arange(len(matriz))
+        self.pontos = matriz
+        self.nos = []  # (inicio, fim, filho_esquerdo, filho_direito)
+        self.resumos = []
+        if len(matriz) > 0:
+            self._construir(0, len(matriz))
+        # Pontos reordenados para que as folhas sejam fatias contíguas
+        self.pontos = np.ascontiguousarray(matriz[self.indices])
+    
+    def _construir(self, inicio, fim):
+        """
+        Constrói recursivamente o nó que cobre indices[inicio:fim].
+        
+        Returns:
+            int: Posição do nó criado em self.nos
+        """
+        pontos = self.pontos[self.indices[inicio:fim]]
+        no = len(self.nos)
+        self.nos.append(None)
+        self.resumos.append(self._resumir(pontos))
+        
+        if fim - inicio <= self.tamanho_folha:
+            self.nos[no] = (inicio, fim, None, None)
+            return no
+        
+        # Divide pela mediana da característica de maior amplitude
+        dimensao = int(np.argmax(pontos.max(axis=0) - pontos.min(axis=0)))
+        meio = (fim - inicio) // 2
+        ordem = np.argpartition(pontos[:, dimensao], meio, kind='introselect')
+        self.indices[inicio:fim] = self.indices[inicio:fim][ordem]
+        
+        esquerdo = self._construir(inicio, inicio + meio)
+        direito = self._construir(inicio + meio, fim)
+        self.nos[no] = (inicio, fim, esquerdo, direito)
+        return no
+    
+    @abstractmethod
+    def _resumir(self, pontos):
+        """
+        Calcula o resumo de um nó a partir dos seus pontos.
+        
+        Args:
+            pontos: np.ndarray (pontos do nó x características)
+            
+        Returns:
+            O resumo guardado em self.resumos para o nó
+        """
+    
+    @abstractmethod
+    def _limite_inferior(self, no, consulta):
+        """
+        Limite inferior da distância euclidiana da consulta a qualquer ponto do nó.
+        
+        Args:
+            no (int): Posição do nó em self.nos
+            consulta: np.ndarray com as características da consulta
+            
+        Returns:
+            float: Limite que nunca excede a distância real ao ponto mais próximo
+        """
+    
+    def buscar(self, consulta, k):
+        """
+        Busca exata dos k vizinhos mais próximos de uma consulta.
+        
+        Os vizinhos são ordenados por (distância, índice), o mesmo critério da
+        ordenação estável da varredura linear, então o resultado é idêntico.
+        
+        Args:
+            consulta: np.ndarray com as características da consulta
+            k (int): Número de vizinhos
+            
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        if not self.nos:
+            return []
+        # Heap de máximo com os k melhores: o topo é o pior candidato atual
+        melhores = []
+        pilha = [(self._limite_inferior(0, consulta), 0)]
+        while pilha:
+            limite, no = pilha.pop()
+            # Com empate no limite ainda pode haver um índice menor a considerar
+            if len(melhores) == k and limite > -melhores[0][0]:
+                continue
+            inicio, fim, esquerdo, direito = self.nos[no]
+            
+            if esquerdo is None:
+                distancias = np.sqrt(((self.pontos[inicio:fim] - consulta) ** 2).sum(axis=1))
+                for distancia, indice in zip(distancias.tolist(), self.indices[inicio:fim].tolist()):
+                    if len(melhores) < k:
+                        heapq.heappush(melhores, (-distancia, -indice))
+                    elif (distancia, indice) < (-melhores[0][0], -melhores[0][1]):
+                        heapq.heapreplace(melhores, (-distancia, -indice))
+                continue
+            
+            # Empilha o filho mais distante primeiro para visitar o mais próximo antes
+            filhos = [(self._limite_inferior(esquerdo, consulta), esquerdo),
+                      (self._limite_inferior(direito, consulta), direito)]
+            filhos.sort(reverse=True)
+            pilha.extend(filhos)
+        
+        return sorted((-distancia, -indice) for distancia, indice in melhores)
+
+
+class ArvoreKD(ArvoreVizinhos):
+    """
+    Árvore KD: cada nó guarda a caixa delimitadora (mínimo e máximo de cada
+    característica) dos seus pontos. Indicada para dados numéricos de baixa
+    dimensão, como as 4 características do Iris.
+    """
+    
+    def _resumir(self, pontos):
+        return pontos.min(axis=0), pontos.max(axis=0)
+    
+    def _limite_inferior(self, no, consulta):
+        minimos, maximos = self.resumos[no]
+        excesso = np.maximum(minimos - consulta, 0) + np.maximum(consulta - maximos, 0)
+        return math.sqrt((excesso ** 2).sum())
+
+
+class ArvoreBola(ArvoreVizinhos):
+    """
+    Árvore de bolas (ball tree): cada nó guarda o centro e o raio de uma
+    hiperesfera que contém seus pontos. Degrada menos que a árvore KD
+    conforme o número de dimensões cresce.
+    """
+    
+    def _resumir(self, pontos):
+        centro = pontos.mean(axis=0)
+        raio = float(np.sqrt(((pontos - centro) ** 2).sum(axis=1)).max())
+        # Folga para que arredondamentos nunca tornem o limite inferior otimista
+        return centro, raio * (1 + 1e-9) + 1e-12
+    
+    def _limite_inferior(self, no, consulta):
+        centro, raio = self.resumos[no]
+        return max(0.0, math.sqrt(((consulta - centro) ** 2).sum()) - raio)
+
+
+class IndiceLSH:
+    """
+    Índice aproximado por LSH com projeções aleatórias (E2LSH), para a
+    distância euclidiana.
+    
+    Cada tabela concatena num_hashes funções h(x) = floor((a·x + b) / largura),
+    com a gaussiano e b uniforme em [0, largura): pontos próximos tendem a cair
+    no mesmo balde. A consulta calcula a distância exata apenas para os
+    candidatos dos baldes visitados. Com num_sondas > 0 (multi-probe), visita
+    também, em cada tabela, os baldes vizinhos cujas fronteiras estão mais
+    perto da consulta. Se houver menos de k candidatos, a consulta recorre à
+    varredura completa.
+    """
+    
+    def __init__(self, matriz, num_tabelas=8, num_hashes=4, num_sondas=0,
+                 largura_balde=None, semente=0):
+        """
+        Constrói as tabelas de hash sobre os pontos de treino.
+        
+        Args:
+            matriz: np.ndarray (amostras x características) com os pontos
+            num_tabelas (int): Número de tabelas de hash independentes
+            num_hashes (int): Funções de hash concatenadas em cada tabela
+            num_sondas (int): Baldes vizinhos extras visitados por tabela
+            largura_balde (float): Largura dos baldes (padrão: estimada dos dados)
+            semente (int): Semente do gerador aleatório, para reprodutibilidade
+        """
+        gerador = np.random.default_rng(semente)
+        self.pontos = matriz
+        self.num_sondas = num_sondas
+        if largura_balde is None:
+            largura_balde = self._estimar_largura(gerador)
+        self.largura = largura_balde
+        self.projecoes = gerador.normal(size=(num_tabelas, matriz.shape[1], num_hashes))
+        self.deslocamentos = gerador.uniform(0, self.largura, size=(num_tabelas, num_hashes))
+        
+        self.tabelas = []
+        for t in range(num_tabelas):
+            chaves = np.floor((matriz @ self.projecoes[t] + self.deslocamentos[t]) / self.largura)
+            tabela = {}
+            for i, chave in enumerate(map(tuple, chaves.astype(np.int64).tolist())):
+                tabela.setdefault(chave, []).append(i)
+            self.tabelas.append(tabela)
+    
+    def _estimar_largura(self, gerador, tamanho_amostra=500):
+        """
+        Estima a largura dos baldes como 4x a mediana da distância ao vizinho
+        mais próximo em uma amostra dos pontos.
+        """
+        if len(self.pontos) == 0:
+            return 1.0
+        amostra = self.pontos[gerador.choice(len(self.pontos), min(tamanho_amostra, len(self.pontos)), replace=False)]
+        distancias = np.sqrt(((amostra[:, np.newaxis, :] - amostra[np.newaxis, :, :]) ** 2).sum(axis=2))
+        distancias[distancias == 0] = np.inf  # Ignora o próprio ponto e duplicatas
+        mais_proximos = distancias.min(axis=1)
+        mais_proximos = mais_proximos[np.isfinite(mais_proximos)]
+        return 4 * float(np.median(mais_proximos)) if len(mais_proximos) else 1.0
+    
+    def _sondas(self, valores):
+        """
+        Gera as chaves visitadas em uma tabela: a do balde da consulta e, com
+        multi-probe, as dos baldes vizinhos mais próximos (uma coordenada +-1).
+        """
+        chave = np.floor(valores).astype(np.int64)
+        yield tuple(chave.tolist())
+        if self.num_sondas == 0:
+            return
+        fracao = valores - chave
+        # Distância da consulta à fronteira inferior e à superior de cada coordenada
+        distancias_fronteira = np.concatenate((fracao, 1 - fracao))
+        for posicao in np.argsort(distancias_fronteira)[:self.num_sondas]:
+            vizinha = chave.copy()
+            j = posicao % len(chave)
+            vizinha[j] += -1 if posicao < len(chave) else 1
+            yield tuple(vizinha.tolist())
+    
+    def buscar(self, consulta, k):
+        """
+        Busca aproximada dos k vizinhos mais próximos de uma consulta.
+        
+        Args:
+            consulta: np.ndarray com as características da consulta
+            k (int): Número de vizinhos
+            
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        candidatos = set()
+        for t, tabela in enumerate(self.tabelas):
+            valores = (consulta @ self.projecoes[t] + self.deslocamentos[t]) / self.largura
+            for chave in self._sondas(valores):
+                candidatos.update(tabela.get(chave, ()))
+        if len(candidatos) < k:
+            candidatos = range(len(self.pontos))
+        
+        # Índices em ordem crescente + ordenação estável = critério (distância, índice)
+        indices = np.fromiter(candidatos, dtype=np.intp, count=len(candidatos))
+        indices.sort()
+        distancias = np.sqrt(((self.pontos[indices] - consulta) ** 2).sum(axis=1))
+        ordem = np.argsort(distancias, kind='stable')[:k]
+        return list(zip(distancias[ordem].tolist(), indices[ordem].tolist()))
+
+
+# Estruturas de busca disponíveis para o parâmetro 'indice' do classificador
+INDICES_VIZINHOS = {
+    'kdtree': ArvoreKD,
+    'balltree': ArvoreBola,
+    'lsh': IndiceLSH,
+}
+
+
+class CachePredicoes:
+    """
+    Cache LRU (menos recentemente usado) de predições, com tamanho limitado.
+    
+    A chave é a representação binária do vetor de características, então
+    instâncias idênticas compartilham a mesma entrada. Cada entrada guarda
+    também a distância do k-ésimo vizinho da consulta (raio), que permite
+    descartar só as predições afetadas quando o treino muda. Conta acertos,
+    falhas e remoções para acompanhar a eficácia do cache.
+    """
+    
+    def __init__(self, tamanho_maximo):
+        """
+        Inicializa o cache vazio.
+        
+        Args:
+            tamanho_maximo (int): Número máximo de predições guardadas
+        """
+        self.tamanho_maximo = tamanho_maximo
+        self.entradas = OrderedDict()
+        self.raios = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+    
+    def obter(self, chave):
+        """
+        Busca uma predição no cache, marcando-a como usada recentemente.
+        
+        Returns:
+            str: Predição guardada ou None se a chave não estiver no cache
+        """
+        predicao = self.entradas.get(chave)
+        if predicao is None:
+            self.falhas += 1
+            return None
+        self.entradas.move_to_end(chave)
+        self.acertos += 1
+        return predicao
+    
+    def guardar(self, chave, predicao, raio=math.inf):
+        """
+        Guarda uma predição, removendo a menos usada se o cache estiver cheio.
+        
+        Args:
+            chave (bytes): Representação binária da consulta
+            predicao (str): Classe predita
+            raio (float): Distância do k-ésimo vizinho da consulta (infinita
+                se houver menos de k amostras de treino)
+        """
+        self.entradas[chave] = predicao
+        self.raios[chave] = raio
+        self.entradas.move_to_end(chave)
+        if len(self.entradas) > self.tamanho_maximo:
+            antiga, _ = self.entradas.popitem(last=False)
+            del self.raios[antiga]
+            self.remocoes += 1
+    
+    def descartar(self, chaves):
+        """
+        Descarta as predições das chaves informadas (as ausentes são ignoradas).
+        """
+        for chave in chaves:
+            if self.entradas.pop(chave, None) is not None:
+                del self.raios[chave]
+    
+    def limpar(self):
+        """
+        Descarta todas as predições (os contadores são mantidos).
+        """
+        self.entradas.clear()
+        self.raios.clear()
+    
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Acertos, falhas, remoções, entradas atuais e taxa de acerto (%)
+        """
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'entradas': len(self.entradas),
+            'taxa_acerto': (self.acertos / consultas) * 100 if consultas else 0.0,
+        }
 
 
 class KNNClassificador:
@@ -10,15 +456,46 @@ class KNNClassificador:
     para classificação do dataset Iris.
     """
     
-    def __init__(self, k=3):
+    def __init__(self, k=3, indice=None, num_fragmentos=1, parametros_indice=None,
+                 tamanho_cache=0):
         """
         Inicializa o classificador KNN.
         
         Args:
             k (int): Número de vizinhos a considerar para classificação
+            indice (str): Estrutura de busca construída em treinar: None
+                (varredura linear), 'kdtree' ou 'balltree' (exatas) ou 'lsh'
+                (aproximada)
+            parametros_indice (dict): Parâmetros repassados à estrutura de
+                busca (ex.: num_tabelas e num_sondas do LSH)
+            num_fragmentos (int): Número de fragmentos em que o conjunto de
+                treino é dividido, cada um guardado e buscado em seu próprio
+                processo; o processo principal fica só com os rótulos
+            tamanho_cache (int): Número máximo de predições guardadas no cache
+                LRU (0 desativa o cache)
         """
+        if indice is not None and indice not in INDICES_VIZINHOS:
+            raise ValueError(f"Índice desconhecido: {indice}")
         self.k = k
+        self.indice = indice
+        self.parametros_indice = parametros_indice or {}
+        self.num_fragmentos = num_fragmentos
         self.dados_treino = []
+        self.matriz_treino = None
+        self.rotulos_treino = []
+        self.estrutura = None
+        self.fragmentos = []  # (processo, conexao) de cada fragmento
+        self.inicios_fragmentos = []
+        self.fim_fragmentos = 0  # Linhas guardadas nos fragmentos, com as removidas
+        # Armazenamento incremental (ver adicionar_amostras e remover_amostras)
+        self.buffer_treino = None
+        self.ids_treino = None
+        self.removidas = None
+        self.num_removidas = 0
+        self.proximo_id = 0
+        self.tamanho_indexado = 0
+        self.removidas_indexadas = 0
+        self.cache = CachePredicoes(tamanho_cache) if tamanho_cache > 0 else None
     
     def distancia_euclidiana(self, ponto1, ponto2):
         """
@@ -40,14 +517,25 @@ class KNNClassificador:
         """
         Encontra os k vizinhos mais próximos de uma instância de teste.
         
+        Amostras removidas (ver remover_amostras) são ignoradas.
+        
         Args:
             instancia_teste: Lista com as características da instância a classificar
             
         Returns:
             list: Lista com os k vizinhos mais próximos
         """
+        if self.fragmentos:
+            indices = self.obter_indices_vizinhos_lote([instancia_teste])[0]
+            return [self.dados_treino[j] for j in indices]
+        if self.estrutura is not None:
+            consulta = np.array(instancia_teste[:-1], dtype=np.float64)
+            return [self.dados_treino[j] for _, j in self._buscar_estrutura(consulta, self.k)]
+        
         distancias = []
         for instancia_treino in self.dados_treino:
+            if instancia_treino is None:
+                continue
             # Calcula distância apenas com as características (exclui o rótulo)
             dist = self.distancia_euclidiana(instancia_teste[:-1], instancia_treino[:-1])
             distancias.append((instancia_treino, dist))
@@ -71,9 +559,24 @@ class KNNClassificador:
         Returns:
             str: Classe predita (mais votada entre os vizinhos)
         """
+        # Último elemento de cada vizinho é o rótulo da classe
+        return self.votar(vizinho[-1] for vizinho in vizinhos)
+    
+    def votar(self, rotulos):
+        """
+        Escolhe a classe mais votada entre os rótulos dos vizinhos.
+        
+        Em caso de empate vence a classe que aparece primeiro na lista, ou
+        seja, a do vizinho mais próximo entre as empatadas.
+        
+        Args:
+            rotulos: Rótulos dos vizinhos, do mais próximo ao mais distante
+            
+        Returns:
+            str: Classe mais votada
+        """
         votos_classe = {}
-        for vizinho in vizinhos:
-            rotulo = vizinho[-1]  # Último elemento é o rótulo da classe
+        for rotulo in rotulos:
             if rotulo in votos_classe:
                 votos_classe[rotulo] += 1
             else:
@@ -90,60 +593,659 @@ class KNNClassificador:
         Args:
             dados_treino: Lista com os dados de treinamento
         """
-        self.dados_treino = dados_treino
+        # Guarda as características em um único array contíguo para a predição em lote
+        self.treinar_matriz(
+            np.array([instancia[:-1] for instancia in dados_treino], dtype=np.float64),
+            [instancia[-1] for instancia in dados_treino],
+        )
+        # Cópia da lista: adicionar_amostras e remover_amostras a modificam
+        self.dados_treino = list(dados_treino)
+    
+    def treinar_matriz(self, matriz, rotulos):
+        """
+        Treina o classificador diretamente com arrays de características e rótulos.
+        
+        A matriz é usada como recebida, sem cópia, o que permite treinar com os
+        arrays mapeados em memória por carregar_dataset_iris_binario. Como não
+        há linhas originais, obter_vizinhos não está disponível nesse modo e
+        predizer usa a busca em lote.
+        
+        Args:
+            matriz: np.ndarray (amostras x características)
+            rotulos: Sequência com o rótulo de cada amostra
+        """
+        self.dados_treino = []
+        if self.cache is not None:
+            # Predições anteriores podem não valer para o novo conjunto de treino
+            self.cache.limpar()
+        self.proximo_id = len(rotulos)
+        self._definir_treino(matriz, rotulos, np.arange(len(rotulos)))
+    
+    def _definir_treino(self, matriz, rotulos, ids):
+        """
+        Substitui o armazenamento de treino, refazendo o índice de busca ou os fragmentos.
+        
+        Com fragmentos, as linhas ficam apenas nos processos que os guardam: o
+        processo principal não mantém referência à matriz, só aos rótulos,
+        identificadores e marcas de remoção.
+        """
+        self.encerrar()
+        self.buffer_treino = None  # A matriz recebida só é copiada na primeira inserção
+        self.rotulos_treino = rotulos
+        self.ids_treino = ids
+        self.removidas = np.zeros(len(ids), dtype=bool)
+        self.num_removidas = 0
+        if self.num_fragmentos > 1:
+            # Cada fragmento constrói o próprio índice, se houver
+            self.matriz_treino = None
+            self.estrutura = None
+            self._iniciar_fragmentos(matriz)
+        else:
+            self.matriz_treino = matriz
+            self._construir_indice()
+    
+    def _construir_indice(self):
+        """
+        Constrói o índice de busca sobre todas as linhas atuais da matriz de treino.
+        """
+        self.estrutura = None
+        if self.indice is not None:
+            self.estrutura = INDICES_VIZINHOS[self.indice](self.matriz_treino, **self.parametros_indice)
+        self.tamanho_indexado = len(self.matriz_treino)
+        self.removidas_indexadas = self.num_removidas
+    
+    def num_amostras_treino(self):
+        """
+        Returns:
+            int: Número de amostras de treino, sem contar as removidas
+        """
+        return self._num_armazenadas() - self.num_removidas
+    
+    def _num_armazenadas(self):
+        """
+        Returns:
+            int: Número de linhas no armazenamento de treino (na matriz ou nos
+                fragmentos), contando as marcadas como removidas
+        """
+        if self.matriz_treino is None:
+            return self.fim_fragmentos
+        return len(self.matriz_treino)
+    
+    def adicionar_amostras(self, amostras, rotulos=None):
+        """
+        Adiciona amostras ao conjunto de treino sem treinar de novo.
+        
+        As linhas são acrescentadas ao fim do armazenamento de treino, cuja
+        capacidade dobra quando se esgota (O(1) amortizado por amostra); a
+        matriz recebida em treinar_matriz só é copiada na primeira inserção.
+        O índice de busca não é refeito a cada inserção: as amostras novas são
+        varridas linearmente junto com ele até passarem de
+        FRACAO_RECONSTRUCAO_INDICE das indexadas. Com fragmentos, as linhas
+        vão para o último, o que os mantém contíguos. Do cache saem só as
+        predições que as amostras novas podem mudar.
+        
+        Args:
+            amostras: Lista de instâncias no formato de treinar (rótulo na
+                última posição) ou, com rotulos, matriz de características no
+                formato de treinar_matriz
+            rotulos: Sequência com o rótulo de cada linha da matriz
+            
+        Returns:
+            list: Identificadores das amostras, usados em remover_amostras
+        """
+        if self.ids_treino is None:
+            if rotulos is None:
+                self.treinar(amostras)
+            else:
+                self.treinar_matriz(amostras, rotulos)
+            return self.ids_treino.tolist()
+        if len(amostras) == 0:
+            return []
+        
+        linhas = self.converter_consultas(amostras)
+        if rotulos is None:
+            rotulos = [instancia[-1] for instancia in amostras]
+            if len(self.dados_treino) == len(self.rotulos_treino):
+                self.dados_treino.extend(amostras)
+        else:
+            # Sem as linhas originais, o classificador passa ao modo de treinar_matriz
+            self.dados_treino = []
+        self._atualizar_cache(linhas, removidas=False)
+        
+        inicio = self._num_armazenadas()
+        self._acrescentar(linhas)
+        ids = np.arange(self.proximo_id, self.proximo_id + len(linhas))
+        self.proximo_id += len(linhas)
+        self.ids_treino[inicio:inicio + len(linhas)] = ids
+        if not isinstance(self.rotulos_treino, list):
+            self.rotulos_treino = list(self.rotulos_treino)
+        self.rotulos_treino.extend(rotulos)
+        if self.fragmentos:
+            self.fragmentos[-1][1].send(('adicionar', linhas))
+        return ids.tolist()
+    
+    def _acrescentar(self, linhas):
+        """
+        Acrescenta linhas ao fim da matriz de treino, refazendo o índice de
+        busca quando as linhas fora dele passam de FRACAO_RECONSTRUCAO_INDICE.
+        Com fragmentos, só reserva as posições: as linhas vão para o último.
+        """
+        inicio = self._num_armazenadas()
+        fim = inicio + len(linhas)
+        self._reservar(fim)
+        self.removidas[inicio:fim] = False
+        if self.matriz_treino is None:
+            self.fim_fragmentos = fim
+            return
+        self.buffer_treino[inicio:fim] = linhas
+        self.matriz_treino = self.buffer_treino[:fim]
+        if (self.estrutura is not None
+                and fim - self.tamanho_indexado > FRACAO_RECONSTRUCAO_INDICE * self.tamanho_indexado):
+            self._construir_indice()
+    
+    def _reservar(self, total):
+        """
+        Garante espaço para total linhas no armazenamento, dobrando a capacidade.
+        """
+        if total <= len(self.ids_treino) and (self.matriz_treino is None or self.buffer_treino is not None):
+            return
+        usados = self._num_armazenadas()
+        capacidade = max(total, 2 * usados, 16)
+        if self.matriz_treino is not None:
+            self.buffer_treino = realocar(self.matriz_treino, usados, capacidade)
+            self.matriz_treino = self.buffer_treino[:usados]
+        self.ids_treino = realocar(self.ids_treino, usados, capacidade)
+        self.removidas = realocar(self.removidas, usados, capacidade)
+    
+    def remover_amostras(self, ids):
+        """
+        Remove amostras do conjunto de treino sem treinar de novo.
+        
+        As amostras são apenas marcadas como removidas (O(1) por amostra) e
+        passam a ser ignoradas pelas buscas, inclusive nos fragmentos; quando
+        as marcadas passam de FRACAO_COMPACTACAO do armazenamento, compactar
+        as descarta de uma vez, o que mantém o custo amortizado constante. Do
+        cache saem só as predições de que as amostras removidas podem ter
+        participado.
+        
+        Args:
+            ids: Identificadores devolvidos por adicionar_amostras (as amostras
+                de treinar recebem 0, 1, 2, ... na ordem do treino)
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        total = self._num_armazenadas()
+        # Os identificadores crescem com a posição no armazenamento
+        posicoes = np.searchsorted(self.ids_treino[:total], ids)
+        encontradas = posicoes < total
+        encontradas[encontradas] = self.ids_treino[posicoes[encontradas]] == ids[encontradas]
+        encontradas[encontradas] = ~self.removidas[posicoes[encontradas]]
+        if not encontradas.all():
+            raise ValueError(f"Amostras inexistentes ou já removidas: {ids[~encontradas].tolist()}")
+        
+        if self.cache is not None and self.cache.entradas:
+            self._atualizar_cache(self._linhas_treino(posicoes), removidas=True)
+        self._marcar_removidas(posicoes)
+        if self.dados_treino:
+            for posicao in posicoes.tolist():
+                self.dados_treino[posicao] = None
+        for conexao, locais in self._posicoes_por_fragmento(posicoes):
+            conexao.send(('remover', locais))
+        if self.num_removidas > FRACAO_COMPACTACAO * total:
+            self.compactar()
+    
+    def _posicoes_por_fragmento(self, posicoes):
+        """
+        Divide posições globais (em ordem crescente) entre os fragmentos.
+        
+        Returns:
+            list: Pares (conexao, posicoes_locais) dos fragmentos com alguma posição
+        """
+        fragmento_de = np.searchsorted(self.inicios_fragmentos, posicoes, side='right') - 1
+        pares = []
+        for f, (_, conexao) in enumerate(self.fragmentos):
+            locais = posicoes[fragmento_de == f] - self.inicios_fragmentos[f]
+            if len(locais):
+                pares.append((conexao, locais))
+        return pares
+    
+    def _linhas_treino(self, posicoes):
+        """
+        Obtém as linhas de treino nas posições informadas (em ordem crescente),
+        pedindo-as aos fragmentos quando a matriz não está neste processo.
+        
+        Returns:
+            np.ndarray: Linhas (posições x características)
+        """
+        if self.matriz_treino is not None:
+            return self.matriz_treino[posicoes]
+        pares = self._posicoes_por_fragmento(posicoes)
+        for conexao, locais in pares:
+            conexao.send(('linhas', locais))
+        return np.concatenate([conexao.recv() for conexao, _ in pares])
+    
+    def _marcar_removidas(self, posicoes):
+        """
+        Marca as linhas nas posições informadas como removidas.
+        """
+        self.removidas[posicoes] = True
+        self.num_removidas += len(posicoes)
+        self.removidas_indexadas += int((posicoes < self.tamanho_indexado).sum())
+    
+    def compactar(self):
+        """
+        Descarta do armazenamento as amostras marcadas como removidas.
+        
+        A ordem das amostras restantes é preservada, então o desempate pelo
+        menor índice continua o mesmo de um treino só com elas; o índice de
+        busca é refeito já incluindo as amostras adicionadas. Com fragmentos,
+        cada um compacta as próprias linhas, e só os inícios são recalculados.
+        """
+        total = self._num_armazenadas()
+        manter = ~self.removidas[:total]
+        self.dados_treino = [instancia for instancia in self.dados_treino if instancia is not None]
+        rotulos = [rotulo for rotulo, mantido in zip(self.rotulos_treino, manter.tolist()) if mantido]
+        ids = self.ids_treino[:total][manter]
+        if not self.fragmentos:
+            self._definir_treino(self.matriz_treino[manter], rotulos, ids)
+            return
+        
+        for _, conexao in self.fragmentos:
+            conexao.send(('compactar',))
+        tamanhos = [conexao.recv() for _, conexao in self.fragmentos]
+        self.inicios_fragmentos = np.cumsum([0] + tamanhos[:-1]).tolist()
+        self.fim_fragmentos = sum(tamanhos)
+        self.rotulos_treino = rotulos
+        self.ids_treino = ids
+        self.removidas = np.zeros(len(ids), dtype=bool)
+        self.num_removidas = 0
+    
+    def _atualizar_cache(self, linhas, removidas):
+        """
+        Descarta do cache as predições que a inserção ou a remoção das linhas pode mudar.
+        
+        Uma amostra nova só muda a predição de uma consulta se ficar
+        estritamente mais perto que o k-ésimo vizinho guardado (no empate vence
+        a amostra mais antiga); uma removida, se estava a essa distância ou menos.
+        """
+        if self.cache is None or not self.cache.entradas or not len(linhas):
+            return
+        chaves = list(self.cache.entradas)
+        consultas = np.frombuffer(b''.join(chaves), dtype=np.float64).reshape(len(chaves), -1)
+        raios = np.array([self.cache.raios[chave] for chave in chaves], dtype=np.float64)
+        
+        mais_proximas = np.empty(len(chaves), dtype=np.float64)
+        tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, linhas.size))
+        for inicio in range(0, len(chaves), tamanho_bloco):
+            bloco = consultas[inicio:inicio + tamanho_bloco]
+            mais_proximas[inicio:inicio + len(bloco)] = self.calcular_distancias(bloco, linhas).min(axis=1)
+        afetadas = mais_proximas <= raios if removidas else mais_proximas < raios
+        self.cache.descartar([chave for chave, afetada in zip(chaves, afetadas.tolist()) if afetada])
     
     def predizer(self, instancia_teste):
         """
         Faz a predição para uma instância de teste.
         
-        Args:
-            instancia_teste: Instância a ser classificada
+        Args:
+            instancia_teste: Instância a ser classificada
+            
+        Returns:
+            str: Classe predita
+        """
+        if self.cache is not None:
+            # A busca em lote fornece o raio que o cache guarda com a predição
+            return self._predizer_lote_com_cache(self.converter_consultas([instancia_teste]))[0]
+        
+        if not self.dados_treino:
+            # Treinado com treinar_matriz: não há linhas para devolver como vizinhos
+            return self.predizer_lote([instancia_teste])[0]
+        vizinhos = self.obter_vizinhos(instancia_teste)
+        return self.predizer_classificacao(vizinhos)
+    
+    def converter_consultas(self, matriz):
+        """
+        Converte instâncias de consulta para um array NumPy de características.
+        
+        Args:
+            matriz: Lista de instâncias no formato de predizer (rótulo na última
+                posição, ignorado) ou np.ndarray contendo apenas as características
+            
+        Returns:
+            np.ndarray: Matriz (consultas x características) em float64
+        """
+        if isinstance(matriz, np.ndarray):
+            return np.ascontiguousarray(matriz, dtype=np.float64)
+        return np.array([instancia[:-1] for instancia in matriz], dtype=np.float64)
+    
+    def calcular_distancias(self, consultas, referencias):
+        """
+        Calcula as distâncias euclidianas entre cada consulta e cada referência,
+        com a mesma aritmética de distancia_euclidiana.
+        
+        Args:
+            consultas: np.ndarray (consultas x características) em float64
+            referencias: np.ndarray (referências x características)
+            
+        Returns:
+            np.ndarray: Distâncias (consultas x referências)
+        """
+        diferencas = consultas[:, np.newaxis, :] - referencias[np.newaxis, :, :]
+        return np.sqrt((diferencas ** 2).sum(axis=2))
+    
+    def obter_distancias_vizinhos_lote(self, matriz, k=None):
+        """
+        Encontra os k vizinhos mais próximos de várias consultas e suas distâncias.
+        
+        Sem índice, as distâncias são calculadas em blocos de consultas, de forma
+        vetorizada, com a mesma aritmética de distancia_euclidiana. A ordenação
+        é estável, então empates são resolvidos pelo menor índice de treino,
+        exatamente como em obter_vizinhos. Com índice, cada consulta é
+        respondida pela estrutura de busca, e com fragmentos, pelos processos
+        que os guardam; todos seguem o mesmo critério. Amostras removidas (ver
+        remover_amostras) nunca são devolvidas.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            k (int): Número de vizinhos (padrão: self.k)
+            
+        Returns:
+            tuple: (distancias, indices), ambos (consultas x k), do vizinho mais
+                próximo ao mais distante
+        """
+        if k is None:
+            k = self.k
+        consultas = self.converter_consultas(matriz)
+        if self.fragmentos:
+            return self._buscar_fragmentos(consultas, k)
+        
+        if self.estrutura is not None:
+            forma = (len(consultas), min(k, self.num_amostras_treino()))
+            distancias = np.empty(forma, dtype=np.float64)
+            indices = np.empty(forma, dtype=np.intp)
+            for i, consulta in enumerate(consultas):
+                resultado = self._buscar_estrutura(consulta, k)
+                distancias[i] = [distancia for distancia, _ in resultado]
+                indices[i] = [j for _, j in resultado]
+            return distancias, indices
+        
+        return self._buscar_linear(consultas, k)
+    
+    def _buscar_estrutura(self, consulta, k):
+        """
+        Consulta o índice de busca, varrendo também as amostras adicionadas
+        depois da sua construção e descartando as removidas.
+        
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        # Vizinhos extras compensam as amostras removidas que o índice ainda contém
+        vizinhos = [(distancia, j) for distancia, j in self.estrutura.buscar(consulta, k + self.removidas_indexadas)
+                    if not self.removidas[j]]
+        inicio = self.tamanho_indexado
+        if len(self.matriz_treino) > inicio:
+            distancias = np.sqrt(((self.matriz_treino[inicio:] - consulta) ** 2).sum(axis=1))
+            vizinhos.extend((distancia, inicio + j) for j, distancia in enumerate(distancias.tolist())
+                            if not self.removidas[inicio + j])
+            vizinhos.sort()
+        return vizinhos[:k]
+    
+    def _buscar_linear(self, consultas, k):
+        """
+        Varredura linear exata e vetorizada, em blocos de consultas.
+        
+        Returns:
+            tuple: (distancias, indices), ambos (consultas x k)
+        """
+        num_treino, num_caracteristicas = self.matriz_treino.shape
+        forma = (len(consultas), min(k, num_treino - self.num_removidas))
+        distancias = np.empty(forma, dtype=np.float64)
+        indices = np.empty(forma, dtype=np.intp)
+        removidas = np.flatnonzero(self.removidas[:num_treino]) if self.num_removidas else None
+        
+        tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_treino * num_caracteristicas))
+        for inicio in range(0, len(consultas), tamanho_bloco):
+            bloco = consultas[inicio:inicio + tamanho_bloco]
+            distancias_bloco = self.calcular_distancias(bloco, self.matriz_treino)
+            if removidas is not None:
+                # Amostras removidas ficam mais distantes que todas as outras
+                distancias_bloco[:, removidas] = np.inf
+            ordem = selecionar_vizinhos(distancias_bloco, forma[1])
+            distancias[inicio:inicio + len(bloco)] = np.take_along_axis(distancias_bloco, ordem, axis=1)
+            indices[inicio:inicio + len(bloco)] = ordem
+        return distancias, indices
+    
+    def obter_indices_vizinhos_lote(self, matriz, k=None):
+        """
+        Encontra os índices dos k vizinhos mais próximos de várias consultas.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            k (int): Número de vizinhos (padrão: self.k)
+            
+        Returns:
+            np.ndarray: Índices dos vizinhos (consultas x k), do mais próximo ao mais distante
+        """
+        return self.obter_distancias_vizinhos_lote(matriz, k)[1]
+    
+    def medir_recall(self, matriz, k=None):
+        """
+        Mede a fração dos k vizinhos exatos que a busca configurada encontra.
+        
+        Serve para avaliar o modo aproximado (indice='lsh') comparando-o com a
+        varredura linear exata; para as buscas exatas o resultado é 1.0.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            k (int): Número de vizinhos (padrão: self.k)
+            
+        Returns:
+            float: Recall médio, de 0.0 a 1.0
+        """
+        if k is None:
+            k = self.k
+        consultas = self.converter_consultas(matriz)
+        encontrados = self.obter_indices_vizinhos_lote(consultas, k)
+        if self.fragmentos:
+            exatos = self._buscar_fragmentos(consultas, k, exata=True)[1]
+        else:
+            exatos = self._buscar_linear(consultas, k)[1]
+        acertos = sum(len(set(a) & set(e)) for a, e in zip(encontrados.tolist(), exatos.tolist()))
+        return acertos / exatos.size if exatos.size else 1.0
+    
+    def _iniciar_fragmentos(self, matriz):
+        """
+        Divide a matriz de treino em fragmentos contíguos e inicia um processo
+        para cada um. O fragmento é enviado uma única vez, na criação do
+        processo; com a matriz mapeada de carregar_dataset_iris_binario, este
+        processo só lê cada fragmento para enviá-lo, sem guardá-lo.
+        """
+        contexto = multiprocessing.get_context()
+        deslocamento = 0
+        self.inicios_fragmentos = []
+        for fragmento in np.array_split(matriz, self.num_fragmentos):
+            conexao, conexao_trabalhador = contexto.Pipe()
+            processo = contexto.Process(
+                target=_servir_fragmento,
+                args=(conexao_trabalhador, fragmento, self.indice, self.parametros_indice),
+                daemon=True,
+            )
+            processo.start()
+            conexao_trabalhador.close()
+            self.fragmentos.append((processo, conexao))
+            self.inicios_fragmentos.append(deslocamento)
+            deslocamento += len(fragmento)
+        self.fim_fragmentos = deslocamento
+    
+    def _buscar_fragmentos(self, consultas, k, exata=False):
+        """
+        Consulta todos os fragmentos em paralelo e junta os k melhores de cada um.
+        
+        Cada fragmento devolve seus k vizinhos em ordem de (distância, índice
+        local), que vira global somando o início do fragmento; a junção
+        reordena os candidatos pelo mesmo critério, então o resultado é
+        idêntico ao da busca em um único processo. Com exata, os fragmentos
+        usam a varredura linear em vez do seu índice (ver medir_recall).
+        """
+        for _, conexao in self.fragmentos:
+            conexao.send(('buscar', consultas, k, exata))
+        respostas = [conexao.recv() for _, conexao in self.fragmentos]
+        
+        distancias = np.concatenate([resposta[0] for resposta in respostas], axis=1)
+        indices = np.concatenate([resposta[1] + inicio for resposta, inicio
+                                  in zip(respostas, self.inicios_fragmentos)], axis=1)
+        ordem = np.lexsort((indices, distancias), axis=1)[:, :k]
+        return (np.take_along_axis(distancias, ordem, axis=1),
+                np.take_along_axis(indices, ordem, axis=1))
+    
+    def encerrar(self):
+        """
+        Encerra os processos dos fragmentos de treino, se houver.
+        
+        As linhas de treino só existem nos fragmentos, então depois de
+        encerrá-los o classificador precisa ser treinado de novo.
+        """
+        for processo, conexao in self.fragmentos:
+            conexao.send(None)
+            conexao.close()
+            processo.join()
+        self.fragmentos = []
+    
+    def predizer_lote(self, matriz):
+        """
+        Faz a predição para várias instâncias de uma só vez.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            
+        Returns:
+            list: Classes preditas, na mesma ordem das consultas
+        """
+        if self.cache is not None:
+            return self._predizer_lote_com_cache(self.converter_consultas(matriz))
+        
+        predicoes = []
+        for linha in self.obter_indices_vizinhos_lote(matriz):
+            predicoes.append(self.votar(self.rotulos_treino[j] for j in linha))
+        return predicoes
+    
+    def _predizer_lote_com_cache(self, consultas):
+        """
+        Predição em lote consultando o cache: só as consultas ausentes dele
+        (e sem repetição dentro do lote) passam pela busca de vizinhos.
+        """
+        predicoes = [None] * len(consultas)
+        pendentes = {}  # chave -> posições das consultas com essa chave
+        for i, consulta in enumerate(consultas):
+            chave = consulta.tobytes()
+            if chave in pendentes:
+                pendentes[chave].append(i)
+                continue
+            predicoes[i] = self.cache.obter(chave)
+            if predicoes[i] is None:
+                pendentes[chave] = [i]
+        
+        if pendentes:
+            posicoes = [lista[0] for lista in pendentes.values()]
+            distancias, indices = self.obter_distancias_vizinhos_lote(consultas[posicoes])
+            for (chave, lista), linha, distancias_linha in zip(pendentes.items(), indices, distancias):
+                predicao = self.votar(self.rotulos_treino[j] for j in linha)
+                raio = float(distancias_linha[-1]) if len(linha) == self.k else math.inf
+                self.cache.guardar(chave, predicao, raio)
+                for i in lista:
+                    predicoes[i] = predicao
+        return predicoes
+    
+    def predizer_blocos(self, blocos):
+        """
+        Faz a predição de um fluxo de blocos de instâncias, um bloco por vez.
+        
+        Combinada com a leitura em blocos, permite classificar arquivos maiores
+        que a memória disponível.
+        
+        Args:
+            blocos: Iterável de blocos de consultas (ver converter_consultas)
+            
+        Yields:
+            list: Classes preditas de cada bloco
+        """
+        for bloco in blocos:
+            yield self.predizer_lote(bloco)
+
+
+def ler_dataset_iris_em_blocos(nome_arquivo, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    """
+    Lê o dataset Iris de um arquivo CSV em blocos, sem carregá-lo inteiro.
+    
+    Cada linha passa pelas mesmas conversões e validações (com os mesmos
+    avisos) de carregar_dataset_iris, então a memória usada depende apenas
+    do tamanho do bloco.
+    
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV
+        tamanho_bloco (int): Número máximo de amostras por bloco
+        
+    Yields:
+        list: Bloco de amostras com características numéricas e rótulos
+    """
+    with open(nome_arquivo, 'r') as arquivo:
+        leitor_csv = csv.reader(arquivo)
+        cabecalho = next(leitor_csv, None)  # Pula a linha de cabeçalho
+        if cabecalho is None:
+            return
+        print(f"Cabeçalho encontrado: {cabecalho}")
+        
+        bloco = []
+        linha_num = 1  # Começa em 1 pois já lemos o cabeçalho
+        for linha in leitor_csv:
+            linha_num += 1
+            # Pula linhas vazias
+            if not linha or len(linha) == 0:
+                continue
             
-        Returns:
-            str: Classe predita
-        """
-        vizinhos = self.obter_vizinhos(instancia_teste)
-        return self.predizer_classificacao(vizinhos)
+            # Verifica se a linha tem o número correto de colunas
+            if len(linha) < 5:
+                print(f"Aviso: Linha {linha_num} tem menos de 5 colunas: {linha}")
+                continue
+            
+            try:
+                # Converte características numéricas para float e mantém espécie como string
+                amostra = [float(x.strip()) for x in linha[:-1]] + [linha[-1].strip()]
+            except ValueError as e:
+                print(f"Erro na linha {linha_num}: {e}")
+                print(f"Conteúdo da linha: {linha}")
+                continue
+            
+            bloco.append(amostra)
+            if len(bloco) == tamanho_bloco:
+                yield bloco
+                bloco = []
+        
+        if bloco:
+            yield bloco
 
 
-def carregar_dataset_iris(nome_arquivo):
+def carregar_dataset_iris(nome_arquivo, usar_cache=False):
     """
     Carrega o dataset Iris de um arquivo CSV.
     
     Args:
         nome_arquivo (str): Caminho para o arquivo CSV
+        usar_cache (bool): Se deve ler do cache binário mapeado em memória
+            (ver carregar_dataset_iris_binario), que só é recompilado quando
+            o CSV muda; se o cache não puder ser usado, o CSV é lido
         
     Returns:
         list: Dataset carregado com características numéricas e rótulos
     """
+    if usar_cache:
+        matriz, rotulos, classes = carregar_dataset_iris_binario(nome_arquivo)
+        if matriz is not None:
+            return [linha + [classes[codigo]] for linha, codigo in zip(matriz.tolist(), rotulos.tolist())]
+        print("Cache binário indisponível, lendo o CSV")
+    
     dataset = []
     try:
-        with open(nome_arquivo, 'r') as arquivo:
-            leitor_csv = csv.reader(arquivo)
-            cabecalho = next(leitor_csv)  # Pula a linha de cabeçalho
-            print(f"Cabeçalho encontrado: {cabecalho}")
-            
-            linha_num = 1  # Começa em 1 pois já lemos o cabeçalho
-            for linha in leitor_csv:
-                linha_num += 1
-                # Pula linhas vazias
-                if not linha or len(linha) == 0:
-                    continue
-                
-                # Verifica se a linha tem o número correto de colunas
-                if len(linha) < 5:
-                    print(f"Aviso: Linha {linha_num} tem menos de 5 colunas: {linha}")
-                    continue
-                
-                try:
-                    # Converte características numéricas para float e mantém espécie como string
-                    amostra = [float(x.strip()) for x in linha[:-1]] + [linha[-1].strip()]
-                    dataset.append(amostra)
-                except ValueError as e:
-                    print(f"Erro na linha {linha_num}: {e}")
-                    print(f"Conteúdo da linha: {linha}")
-                    continue
-                    
+        for bloco in ler_dataset_iris_em_blocos(nome_arquivo):
+            dataset.extend(bloco)
     except FileNotFoundError:
         print(f"Erro: Arquivo '{nome_arquivo}' não encontrado!")
         return None
@@ -159,6 +1261,220 @@ def carregar_dataset_iris(nome_arquivo):
     return dataset
 
 
+def caminho_cache(nome_arquivo):
+    """
+    Retorna o caminho padrão do cache binário de um CSV (extensão .knncache).
+    """
+    return os.path.splitext(nome_arquivo)[0] + '.knncache'
+
+
+def _hash_arquivo(nome_arquivo):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos.
+    """
+    sha = hashlib.sha256()
+    with open(nome_arquivo, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _alinhar(posicao):
+    """
+    Arredonda uma posição do arquivo para o próximo múltiplo do alinhamento.
+    """
+    return -(-posicao // ALINHAMENTO_CACHE) * ALINHAMENTO_CACHE
+
+
+def escrever_cache(nome_cache, nome_origem, metadados, arrays):
+    """
+    Grava arrays no formato binário de cache, precedidos por um cabeçalho JSON.
+    
+    O arquivo é escrito em um temporário e renomeado ao final, então um cache
+    incompleto nunca é lido.
+    
+    Args:
+        nome_cache (str): Caminho do arquivo de cache
+        nome_origem (str): CSV de origem, registrado para verificar a validade
+        metadados (dict): Informações adicionais guardadas no cabeçalho
+        arrays (dict): Nome -> np.ndarray a gravar
+    """
+    estado = os.stat(nome_origem)
+    cabecalho = dict(metadados)
+    cabecalho['versao'] = VERSAO_CACHE
+    cabecalho['origem'] = {
+        'tamanho': estado.st_size,
+        'mtime_ns': estado.st_mtime_ns,
+        'sha256': _hash_arquivo(nome_origem),
+    }
+    cabecalho['arrays'] = {}
+    deslocamento = 0
+    for nome, array in arrays.items():
+        cabecalho['arrays'][nome] = {
+            'tipo': array.dtype.str,
+            'forma': list(array.shape),
+            'deslocamento': deslocamento,
+        }
+        deslocamento = _alinhar(deslocamento + array.nbytes)
+    
+    texto = json.dumps(cabecalho).encode('utf-8')
+    inicio = _alinhar(len(ASSINATURA_CACHE) + 4 + len(texto))
+    temporario = nome_cache + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(ASSINATURA_CACHE)
+        arquivo.write(struct.pack('<I', len(texto)))
+        arquivo.write(texto)
+        for nome, array in arrays.items():
+            arquivo.seek(inicio + cabecalho['arrays'][nome]['deslocamento'])
+            np.ascontiguousarray(array).tofile(arquivo)
+    os.replace(temporario, nome_cache)
+
+
+def _ler_cabecalho_cache(nome_cache):
+    """
+    Lê o cabeçalho JSON de um cache binário.
+    
+    Returns:
+        tuple: (cabecalho, inicio), onde inicio é a posição da área de dados
+        
+    Raises:
+        ValueError: Se o arquivo não for um cache desta versão do formato
+    """
+    with open(nome_cache, 'rb') as arquivo:
+        if arquivo.read(len(ASSINATURA_CACHE)) != ASSINATURA_CACHE:
+            raise ValueError(f"'{nome_cache}' não é um cache binário de dataset")
+        (tamanho,) = struct.unpack('<I', arquivo.read(4))
+        cabecalho = json.loads(arquivo.read(tamanho).decode('utf-8'))
+    if cabecalho.get('versao') != VERSAO_CACHE:
+        raise ValueError(f"Versão do cache '{nome_cache}' não suportada: {cabecalho.get('versao')}")
+    return cabecalho, _alinhar(len(ASSINATURA_CACHE) + 4 + tamanho)
+
+
+def ler_cache(nome_cache):
+    """
+    Abre um cache binário, mapeando seus arrays em memória sem cópias.
+    
+    Args:
+        nome_cache (str): Caminho do arquivo de cache
+        
+    Returns:
+        tuple: (cabecalho, arrays), com arrays np.memmap somente leitura
+    """
+    cabecalho, inicio = _ler_cabecalho_cache(nome_cache)
+    arrays = {}
+    for nome, info in cabecalho['arrays'].items():
+        forma = tuple(info['forma'])
+        if 0 in forma:
+            # Não é possível mapear uma região vazia
+            arrays[nome] = np.empty(forma, dtype=info['tipo'])
+        else:
+            arrays[nome] = np.memmap(nome_cache, dtype=info['tipo'], mode='r',
+                                     offset=inicio + info['deslocamento'], shape=forma)
+    return cabecalho, arrays
+
+
+def cache_atualizado(nome_arquivo, nome_cache, verificar_hash=False):
+    """
+    Verifica se o cache binário corresponde ao CSV de origem atual.
+    
+    Por padrão compara tamanho e data de modificação do CSV; com
+    verificar_hash, compara o SHA-256 do conteúdo, o que é mais lento mas
+    não se engana com cópias ou arquivos apenas tocados. Se o CSV não
+    existir mais, um cache existente é considerado válido.
+    
+    Args:
+        nome_arquivo (str): CSV de origem
+        nome_cache (str): Arquivo de cache
+        verificar_hash (bool): Se deve comparar o conteúdo em vez da data
+        
+    Returns:
+        bool: True se o cache pode ser usado
+    """
+    if not os.path.exists(nome_cache):
+        return False
+    try:
+        cabecalho, _ = _ler_cabecalho_cache(nome_cache)
+    except (OSError, ValueError):
+        return False
+    if not os.path.exists(nome_arquivo):
+        return True
+    
+    origem = cabecalho['origem']
+    if verificar_hash:
+        return origem['sha256'] == _hash_arquivo(nome_arquivo)
+    estado = os.stat(nome_arquivo)
+    return origem['tamanho'] == estado.st_size and origem['mtime_ns'] == estado.st_mtime_ns
+
+
+def compilar_dataset_iris(nome_arquivo, nome_cache=None):
+    """
+    Converte o CSV do Iris para o formato binário de cache.
+    
+    As características são gravadas como uma matriz float64, com os mesmos
+    valores lidos do CSV, e as espécies como códigos inteiros, com a lista de
+    classes no cabeçalho JSON.
+    
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV
+        nome_cache (str): Caminho do cache (padrão: caminho_cache(nome_arquivo))
+        
+    Returns:
+        str: Caminho do cache gravado ou None em caso de erro
+    """
+    if nome_cache is None:
+        nome_cache = caminho_cache(nome_arquivo)
+    dataset = carregar_dataset_iris(nome_arquivo)
+    if dataset is None:
+        return None
+    
+    classes = sorted({amostra[-1] for amostra in dataset})
+    codigo_classe = {classe: i for i, classe in enumerate(classes)}
+    matriz = np.array([amostra[:-1] for amostra in dataset], dtype=np.float64)
+    rotulos = np.array([codigo_classe[amostra[-1]] for amostra in dataset], dtype=np.int32)
+    
+    try:
+        escrever_cache(nome_cache, nome_arquivo, {'classes': classes},
+                       {'matriz': matriz, 'rotulos': rotulos})
+    except OSError as e:
+        print(f"Erro ao gravar cache '{nome_cache}': {e}")
+        return None
+    print(f"Cache binário gravado em '{nome_cache}'")
+    return nome_cache
+
+
+def carregar_dataset_iris_binario(nome_arquivo, nome_cache=None, verificar_hash=False):
+    """
+    Carrega o dataset Iris do cache binário, mapeado em memória.
+    
+    O CSV só é lido (e o cache recompilado) quando o cache não existe ou está
+    desatualizado em relação a ele (ver cache_atualizado).
+    
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV de origem
+        nome_cache (str): Caminho do cache (padrão: caminho_cache(nome_arquivo))
+        verificar_hash (bool): Se deve validar o cache pelo conteúdo do CSV
+        
+    Returns:
+        tuple: (matriz, rotulos, classes) ou (None, None, None) em caso de erro;
+            rotulos contém o índice de cada espécie em classes
+    """
+    if nome_cache is None:
+        nome_cache = caminho_cache(nome_arquivo)
+    if not cache_atualizado(nome_arquivo, nome_cache, verificar_hash):
+        print(f"Cache '{nome_cache}' ausente ou desatualizado, compilando a partir do CSV...")
+        if compilar_dataset_iris(nome_arquivo, nome_cache) is None:
+            return None, None, None
+    
+    try:
+        cabecalho, arrays = ler_cache(nome_cache)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao carregar cache: {e}")
+        return None, None, None
+    
+    print(f"Carregadas {len(arrays['matriz'])} amostras do cache binário")
+    return arrays['matriz'], arrays['rotulos'], cabecalho['classes']
+
+
 def dividir_dataset(dataset, proporcao_treino=0.8, embaralhar=True):
     """
     Divide o dataset em conjuntos de treino e teste.
@@ -183,27 +1499,442 @@ def dividir_dataset(dataset, proporcao_treino=0.8, embaralhar=True):
     return dados_treino, dados_teste
 
 
-def avaliar_modelo(classificador, dados_teste):
+def dividir_matriz(matriz, rotulos, proporcao_treino=0.8, embaralhar=True):
     """
-    Avalia o desempenho do modelo nos dados de teste.
+    Divide uma matriz de características e os seus rótulos em treino e teste.
+    
+    O embaralhamento consome a mesma sequência aleatória de dividir_dataset,
+    então as mesmas amostras vão para cada conjunto, na mesma ordem. Sem
+    embaralhar, os conjuntos são fatias da matriz (sem cópia, mesmo mapeada
+    em memória); embaralhados, as linhas de cada um são reunidas em um novo
+    array, sem passar por listas.
+    
+    Args:
+        matriz: np.ndarray (amostras x características)
+        rotulos: np.ndarray com o rótulo de cada amostra
+        proporcao_treino (float): Proporção dos dados para treino (0.0 a 1.0)
+        embaralhar (bool): Se deve embaralhar os dados antes de dividir
+        
+    Returns:
+        tuple: (matriz_treino, rotulos_treino, matriz_teste, rotulos_teste)
+    """
+    tamanho_treino = int(len(rotulos) * proporcao_treino)
+    if not embaralhar:
+        return matriz[:tamanho_treino], rotulos[:tamanho_treino], matriz[tamanho_treino:], rotulos[tamanho_treino:]
+    
+    posicoes = list(range(len(rotulos)))
+    random.shuffle(posicoes)
+    treino = np.array(posicoes[:tamanho_treino], dtype=np.intp)
+    teste = np.array(posicoes[tamanho_treino:], dtype=np.intp)
+    return matriz[treino], rotulos[treino], matriz[teste], rotulos[teste]
+
+
+def dividir_dataset_em_blocos(blocos, proporcao_treino=0.8, embaralhar=True):
+    """
+    Divide um fluxo de blocos em treino e teste, um bloco por vez.
+    
+    Cada bloco é dividido com dividir_dataset, então a proporção vale dentro
+    de cada bloco e o embaralhamento não mistura amostras de blocos diferentes.
+    
+    Args:
+        blocos: Iterável de blocos (listas de amostras)
+        proporcao_treino (float): Proporção dos dados para treino (0.0 a 1.0)
+        embaralhar (bool): Se deve embaralhar cada bloco antes de dividir
+        
+    Yields:
+        tuple: (dados_treino, dados_teste) de cada bloco
+    """
+    for bloco in blocos:
+        yield dividir_dataset(bloco, proporcao_treino, embaralhar)
+
+
+def _servir_fragmento(conexao, matriz, indice, parametros_indice):
+    """
+    Laço do processo que guarda um fragmento do conjunto de treino.
+    
+    Recebe blocos de consultas pela conexão e responde com os k vizinhos mais
+    próximos dentro do fragmento, com os índices locais (o processo principal
+    soma o início do fragmento). Recebe também as linhas adicionadas ao fim do
+    fragmento e as posições (locais) das amostras removidas, sem responder;
+    responde aos pedidos de linhas e, ao compactar, com o novo tamanho. A
+    comunicação é feita apenas por mensagens, como seria com um nó remoto.
+    
+    Args:
+        conexao: Extremidade do Pipe usada para receber consultas e responder
+        matriz: np.ndarray com as características do fragmento
+        indice (str): Estrutura de busca do fragmento (ver KNNClassificador)
+        parametros_indice (dict): Parâmetros da estrutura de busca
+    """
+    # Os rótulos ficam no processo principal: o fragmento só busca vizinhos
+    classificador = KNNClassificador(indice=indice, parametros_indice=parametros_indice)
+    classificador.treinar_matriz(matriz, [None] * len(matriz))
+    
+    while True:
+        mensagem = conexao.recv()
+        if mensagem is None:  # Sinal de encerramento
+            break
+        tipo, *argumentos = mensagem
+        if tipo == 'adicionar':
+            classificador._acrescentar(argumentos[0])
+        elif tipo == 'remover':
+            # Sem compactar: as posições precisam continuar valendo no processo principal
+            classificador._marcar_removidas(argumentos[0])
+        elif tipo == 'linhas':
+            conexao.send(classificador.matriz_treino[argumentos[0]])
+        elif tipo == 'compactar':
+            classificador.compactar()
+            conexao.send(classificador.num_amostras_treino())
+        else:
+            consultas, k, exata = argumentos
+            if exata:
+                conexao.send(classificador._buscar_linear(consultas, k))
+            else:
+                conexao.send(classificador.obter_distancias_vizinhos_lote(consultas, k))
+    conexao.close()
+
+
+# Estado de cada processo trabalhador da avaliação paralela
+_trabalhador = {}
+
+
+def _inicializar_trabalhador(nome_memoria, forma, tipo, k):
+    """
+    Prepara um processo trabalhador, mapeando a matriz de treino compartilhada.
+    
+    A matriz não é copiada: o classificador do trabalhador usa diretamente a
+    memória compartilhada criada pelo processo principal, somente para leitura.
+    """
+    memoria = shared_memory.SharedMemory(name=nome_memoria)
+    classificador = KNNClassificador(k=k)
+    classificador.matriz_treino = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+    classificador.matriz_treino.flags.writeable = False
+    _trabalhador['memoria'] = memoria
+    _trabalhador['classificador'] = classificador
+
+
+def _buscar_vizinhos_fragmento(consultas):
+    """Busca os vizinhos de um fragmento das consultas em um processo trabalhador."""
+    return _trabalhador['classificador'].obter_indices_vizinhos_lote(consultas)
+
+
+def _executar_em_paralelo(classificador, matriz, funcao, tarefas, num_processos):
+    """
+    Executa uma função sobre cada tarefa em processos trabalhadores que
+    mapeiam a matriz em memória compartilhada (ver _inicializar_trabalhador).
+    
+    Args:
+        classificador: Classificador cujos parâmetros os trabalhadores copiam
+        matriz: np.ndarray colocado uma única vez em memória compartilhada
+        funcao: Função de módulo executada nos trabalhadores
+        tarefas: Lista com o argumento de cada chamada
+        num_processos (int): Número de processos trabalhadores
+        
+    Returns:
+        list: Resultados, na mesma ordem das tarefas
+    """
+    memoria = shared_memory.SharedMemory(create=True, size=max(1, matriz.nbytes))
+    try:
+        compartilhada = np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=memoria.buf)
+        compartilhada[:] = matriz
+        
+        argumentos = (memoria.name, matriz.shape, matriz.dtype.str, classificador.k)
+        with ProcessPoolExecutor(max_workers=num_processos,
+                                 initializer=_inicializar_trabalhador,
+                                 initargs=argumentos) as executor:
+            # map preserva a ordem das tarefas, tornando a junção determinística
+            resultados = list(executor.map(funcao, tarefas))
+        del compartilhada
+    finally:
+        memoria.close()
+        memoria.unlink()
+    return resultados
+
+
+def predizer_paralelo(classificador, dados_teste, num_processos):
+    """
+    Faz a predição dos dados de teste distribuindo-os entre vários processos.
+    
+    A matriz de treino é colocada uma única vez em memória compartilhada e
+    mapeada por todos os trabalhadores. Cada trabalhador recebe um fragmento
+    contíguo das consultas e devolve os índices dos vizinhos; a votação é feita
+    no processo principal, na ordem original, então o resultado é idêntico ao
+    de predizer_lote. Os trabalhadores sempre usam a varredura linear, sobre
+    a matriz compactada (sem amostras removidas). Com fragmentos de treino a
+    busca já é dividida entre os processos deles, e a predição usa
+    predizer_lote.
     
     Args:
         classificador: Classificador KNN treinado
         dados_teste: Dados de teste
+        num_processos (int): Número de processos trabalhadores
+        
+    Returns:
+        list: Classes preditas, na mesma ordem dos dados de teste
+    """
+    if classificador.fragmentos:
+        return classificador.predizer_lote(dados_teste)
+    if classificador.num_removidas:
+        classificador.compactar()
+    consultas = classificador.converter_consultas(dados_teste)
+    fragmentos = np.array_split(consultas, num_processos)
+    resultados = _executar_em_paralelo(classificador, classificador.matriz_treino,
+                                       _buscar_vizinhos_fragmento, fragmentos, num_processos)
+    
+    predicoes = []
+    for indices in resultados:
+        for linha in indices:
+            predicoes.append(classificador.votar(classificador.rotulos_treino[j] for j in linha))
+    return predicoes
+
+
+def _vizinhos_sem_a_propria(classificador, matriz, inicio, fim, k):
+    """
+    Encontra os k vizinhos de cada linha de matriz[inicio:fim] entre todas as
+    linhas da matriz, deixando a própria linha de fora.
+    
+    Returns:
+        np.ndarray: Índices dos vizinhos (linhas x k), do mais próximo ao mais distante
+    """
+    num_linhas, num_colunas = matriz.shape
+    k = min(k, num_linhas - 1)
+    indices = np.empty((fim - inicio, k), dtype=np.intp)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_linhas * num_colunas))
+    for bloco_inicio in range(inicio, fim, tamanho_bloco):
+        bloco_fim = min(bloco_inicio + tamanho_bloco, fim)
+        distancias = classificador.calcular_distancias(matriz[bloco_inicio:bloco_fim], matriz)
+        # A própria linha fica mais distante que todas as outras
+        linhas = np.arange(bloco_fim - bloco_inicio)
+        distancias[linhas, bloco_inicio + linhas] = np.inf
+        indices[bloco_inicio - inicio:bloco_fim - inicio] = selecionar_vizinhos(distancias, k)
+    return indices
+
+
+def _vizinhos_sem_a_propria_fragmento(tarefa):
+    """Vizinhos de um intervalo (inicio, fim, k) das linhas de treino em um processo trabalhador."""
+    inicio, fim, k = tarefa
+    classificador = _trabalhador['classificador']
+    return _vizinhos_sem_a_propria(classificador, classificador.matriz_treino, inicio, fim, k)
+
+
+def editar_amostras(classificador, matriz, rotulos, k, num_processos=1):
+    """
+    Edição de Wilson: marca as amostras que a votação dos seus k vizinhos
+    (deixando a própria de fora) classifica corretamente.
+    
+    Descarta o ruído e as amostras no meio da classe oposta, suavizando as
+    fronteiras. Os vizinhos de todas as amostras são calculados em blocos e,
+    com num_processos > 1, divididos entre processos que compartilham a matriz.
+    
+    Args:
+        classificador: Classificador KNN (usado para as distâncias e a votação)
+        matriz: np.ndarray (amostras x características) em float64
+        rotulos: Sequência com o rótulo de cada amostra
+        k (int): Número de vizinhos da votação
+        num_processos (int): Número de processos (1 = sequencial)
+        
+    Returns:
+        np.ndarray: Máscara booleana das amostras mantidas
+    """
+    num_amostras = len(matriz)
+    if num_amostras < 2:
+        return np.ones(num_amostras, dtype=bool)
+    if num_processos > 1:
+        intervalos = [(int(parte[0]), int(parte[-1]) + 1, k)
+                      for parte in np.array_split(np.arange(num_amostras), num_processos) if len(parte)]
+        indices = np.concatenate(_executar_em_paralelo(classificador, matriz, _vizinhos_sem_a_propria_fragmento,
+                                                       intervalos, num_processos))
+    else:
+        indices = _vizinhos_sem_a_propria(classificador, matriz, 0, num_amostras, k)
+    return np.array([classificador.votar(rotulos[j] for j in linha) == rotulo
+                     for linha, rotulo in zip(indices.tolist(), rotulos)], dtype=bool)
+
+
+def _votar_codigos(codigos_vizinhos, num_classes):
+    """
+    Mesma votação de votar, vetorizada sobre linhas de códigos de classe.
+    
+    Args:
+        codigos_vizinhos: np.ndarray (linhas x k) com o código da classe de
+            cada vizinho, do mais próximo ao mais distante (-1 = sem vizinho)
+        num_classes (int): Número de classes
+        
+    Returns:
+        np.ndarray: Código da classe mais votada de cada linha (-1 sem vizinhos)
+    """
+    k = codigos_vizinhos.shape[1]
+    iguais = codigos_vizinhos[:, :, np.newaxis] == np.arange(num_classes)
+    votos = iguais.sum(axis=1)
+    primeiras = np.where(votos > 0, iguais.argmax(axis=1), k)
+    # Mais votos primeiro e, no empate, a classe que aparece antes na lista
+    vencedoras = (primeiras - votos * (k + 1)).argmin(axis=1)
+    return np.where(votos.max(axis=1) > 0, vencedoras, -1)
+
+
+def condensar_amostras(classificador, matriz, rotulos, k=1):
+    """
+    Condensação de Hart: marca um subconjunto com o qual o k-NN classifica
+    corretamente todas as amostras descartadas.
+    
+    Percorre as amostras em ordem e guarda cada uma que a votação dos k
+    vizinhos entre as já guardadas classifica errado, repetindo as passadas
+    até nenhuma ser guardada; sobram em geral as amostras próximas das
+    fronteiras. Com o mesmo k do classificador, o conjunto guardado é
+    consistente com a regra que ele aplica (a condensação clássica usa o
+    1-NN e pode deixar uma classe com menos de k protótipos, que nunca vence
+    a votação). Cada amostra guardada muda a classificação das seguintes,
+    então o algoritmo é sequencial, mas os k protótipos guardados mais
+    próximos de cada amostra são mantidos e atualizados de forma vetorizada a
+    cada nova amostra guardada.
+    
+    Args:
+        classificador: Classificador KNN (usado para as distâncias)
+        matriz: np.ndarray (amostras x características) em float64
+        rotulos: Sequência com o rótulo de cada amostra
+        k (int): Número de vizinhos da votação
+        
+    Returns:
+        np.ndarray: Máscara booleana das amostras guardadas
+    """
+    num_amostras = len(matriz)
+    classes, codigos = np.unique(np.asarray(rotulos), return_inverse=True)
+    codigos = codigos.ravel()
+    # O índice num_amostras marca a falta de vizinho, sem classe
+    codigos_vizinhos = np.append(codigos, -1)
+    guardadas = np.zeros(num_amostras, dtype=bool)
+    # Os k protótipos guardados mais próximos de cada amostra, por (distância, índice)
+    distancias_proximas = np.full((num_amostras, k), np.inf)
+    indices_proximos = np.full((num_amostras, k), num_amostras)
+    classe_prevista = np.full(num_amostras, -1)
+    
+    posicao = 0
+    guardou_na_passada = False
+    while True:
+        erradas = np.flatnonzero((classe_prevista[posicao:] != codigos[posicao:]) & ~guardadas[posicao:])
+        if len(erradas) == 0:
+            if not guardou_na_passada:
+                break
+            # Nova passada: as amostras guardadas depois podem ter mudado as anteriores
+            posicao = 0
+            guardou_na_passada = False
+            continue
+        
+        i = posicao + int(erradas[0])
+        guardadas[i] = True
+        distancias = classificador.calcular_distancias(matriz[i:i + 1], matriz)[0]
+        # Só mudam as amostras em que a nova guardada entra entre os k mais próximos
+        afetadas = np.flatnonzero((distancias < distancias_proximas[:, -1])
+                                  | ((distancias == distancias_proximas[:, -1]) & (i < indices_proximos[:, -1])))
+        if len(afetadas):
+            candidatas = np.column_stack((distancias_proximas[afetadas], distancias[afetadas]))
+            indices = np.column_stack((indices_proximos[afetadas], np.full(len(afetadas), i)))
+            ordem = np.lexsort((indices, candidatas), axis=1)[:, :k]
+            distancias_proximas[afetadas] = np.take_along_axis(candidatas, ordem, axis=1)
+            indices_proximos[afetadas] = np.take_along_axis(indices, ordem, axis=1)
+            classe_prevista[afetadas] = _votar_codigos(codigos_vizinhos[indices_proximos[afetadas]], len(classes))
+        guardou_na_passada = True
+        posicao = i + 1
+    return guardadas
+
+
+def _acuracia(classificador, dados, rotulos=None):
+    """Acurácia (%) das predições em lote sobre dados rotulados (ou uma matriz e os seus rótulos)."""
+    predicoes = classificador.predizer_lote(dados)
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados]
+    return sum(predicao == rotulo for predicao, rotulo in zip(predicoes, rotulos)) / len(predicoes) * 100
+
+
+def reduzir_prototipos(classificador, metodo='edicao_condensacao', k=None, num_processos=1,
+                       dados_validacao=None, rotulos_validacao=None):
+    """
+    Reduz o conjunto de treino de um classificador treinado, preservando as
+    fronteiras de decisão.
+    
+    A edição de Wilson (editar_amostras) descarta o ruído, e a condensação de
+    Hart (condensar_amostras) descarta as amostras longe das fronteiras; as
+    duas juntas dão a maior redução. As amostras descartadas saem por
+    remover_amostras, então identificadores, índice de busca e cache
+    continuam válidos, e o armazenamento é compactado no final. Com
+    fragmentos, a matriz inteira é trazida dos fragmentos para este processo
+    durante a redução.
+    
+    Args:
+        classificador: Classificador KNN treinado (é modificado)
+        metodo (str): 'edicao', 'condensacao' ou 'edicao_condensacao'
+        k (int): Vizinhos da votação na edição e na condensação (padrão: classificador.k)
+        num_processos (int): Processos usados na edição (1 = sequencial)
+        dados_validacao: Dados fora do treino para medir a acurácia antes e depois
+        rotulos_validacao: Rótulo de cada linha de dados_validacao, quando
+            ele é uma matriz de características
+        
+    Returns:
+        dict: Amostras antes e depois, fator de redução, amostras descartadas
+        em cada etapa e, com dados_validacao, acurácia (%) antes e depois
+    """
+    if metodo not in METODOS_REDUCAO:
+        raise ValueError(f"Método de redução desconhecido: {metodo}")
+    if k is None:
+        k = classificador.k
+    relatorio = {'metodo': metodo}
+    if dados_validacao is not None:
+        relatorio['acuracia_antes'] = _acuracia(classificador, dados_validacao, rotulos_validacao)
+    
+    if classificador.num_removidas:
+        classificador.compactar()
+    total = classificador.num_amostras_treino()
+    matriz = classificador.converter_consultas(classificador._linhas_treino(np.arange(total)))
+    rotulos = list(classificador.rotulos_treino)
+    mantidas = np.ones(total, dtype=bool)
+    if metodo in ('edicao', 'edicao_condensacao'):
+        mantidas = editar_amostras(classificador, matriz, rotulos, k, num_processos)
+        relatorio['descartadas_edicao'] = int(total - mantidas.sum())
+    if metodo in ('condensacao', 'edicao_condensacao'):
+        restantes = np.flatnonzero(mantidas)
+        guardadas = condensar_amostras(classificador, matriz[restantes], [rotulos[j] for j in restantes], k)
+        mantidas[restantes[~guardadas]] = False
+        relatorio['descartadas_condensacao'] = int(len(restantes) - guardadas.sum())
+    
+    if not mantidas.any():
+        print("Aviso: a redução descartaria todas as amostras de treino; conjunto mantido")
+        mantidas[:] = True
+    if not mantidas.all():
+        classificador.remover_amostras(classificador.ids_treino[:total][~mantidas])
+        if classificador.num_removidas:
+            classificador.compactar()
+    
+    relatorio['amostras_antes'] = total
+    relatorio['amostras_depois'] = classificador.num_amostras_treino()
+    relatorio['fator_reducao'] = total / relatorio['amostras_depois']
+    if dados_validacao is not None:
+        relatorio['acuracia_depois'] = _acuracia(classificador, dados_validacao, rotulos_validacao)
+    return relatorio
+
+
+def avaliar_modelo(classificador, dados_teste, num_processos=1, rotulos=None):
+    """
+    Avalia o desempenho do modelo nos dados de teste.
+    
+    Args:
+        classificador: Classificador KNN treinado
+        dados_teste: Dados de teste ou, com rotulos, matriz de características
+        num_processos (int): Número de processos para a predição (1 = sequencial)
+        rotulos: Sequência com o rótulo de cada linha da matriz
         
     Returns:
         tuple: (acuracia, predicoes_corretas, total_testes)
     """
     predicoes_corretas = 0
-    predicoes = []
     
     print(f"Avaliando modelo com k={classificador.k}...")
     print("-" * 50)
     
-    for i, instancia_teste in enumerate(dados_teste):
-        predicao = classificador.predizer(instancia_teste)
-        rotulo_real = instancia_teste[-1]
-        predicoes.append(predicao)
+    if num_processos > 1:
+        predicoes = predizer_paralelo(classificador, dados_teste, num_processos)
+    else:
+        predicoes = classificador.predizer_lote(dados_teste)
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados_teste]
+    for i, (predicao, rotulo_real) in enumerate(zip(predicoes, rotulos)):
         
         print(f'Teste {i+1:2d}: Esperado: {rotulo_real:15s} | Predito: {predicao:15s}', end='')
         
@@ -216,6 +1947,140 @@ def avaliar_modelo(classificador, dados_teste):
     acuracia = (predicoes_corretas / len(dados_teste)) * 100
     return acuracia, predicoes_corretas, len(dados_teste)
 
+
+def avaliar_multiplos_k(classificador, dados_teste, valores_k, rotulos=None):
+    """
+    Avalia a acurácia para vários valores de k com uma única busca de vizinhos.
+    
+    Os vizinhos de cada instância são ordenados uma só vez, até o maior k.
+    Como a ordenação é estável, os k primeiros dessa lista são exatamente os
+    vizinhos que um classificador com aquele k encontraria.
+    
+    Args:
+        classificador: Classificador KNN treinado (seu k é ignorado)
+        dados_teste: Dados de teste ou, com rotulos, matriz de características
+        valores_k: Lista de valores de k a avaliar
+        rotulos: Sequência com o rótulo de cada linha da matriz
+        
+    Returns:
+        dict: Acurácia (%) para cada valor de k
+    """
+    indices = classificador.obter_indices_vizinhos_lote(dados_teste, max(valores_k))
+    corretas = {k_teste: 0 for k_teste in valores_k}
+    
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados_teste]
+    for linha, rotulo_real in zip(indices, rotulos):
+        rotulos_vizinhos = [classificador.rotulos_treino[j] for j in linha]
+        for k_teste in valores_k:
+            if classificador.votar(rotulos_vizinhos[:k_teste]) == rotulo_real:
+                corretas[k_teste] += 1
+    
+    return {k_teste: (corretas[k_teste] / len(dados_teste)) * 100 for k_teste in valores_k}
+
+
+def atribuir_dobras(rotulos, estrategia='kfold', num_dobras=5, embaralhar=True):
+    """
+    Atribui cada amostra a uma dobra da validação cruzada.
+    
+    Args:
+        rotulos: Sequência com o rótulo de cada amostra
+        estrategia (str): 'kfold' (dobras contíguas), 'estratificado' (mesma
+            proporção de classes em cada dobra) ou 'loo' (leave-one-out)
+        num_dobras (int): Número de dobras (ignorado em 'loo')
+        embaralhar (bool): Se deve embaralhar as amostras antes de dividir
+        
+    Returns:
+        np.ndarray: Número da dobra de cada amostra
+    """
+    total = len(rotulos)
+    posicoes = list(range(total))
+    if embaralhar:
+        random.shuffle(posicoes)
+    dobras = np.empty(total, dtype=np.intp)
+    
+    if estrategia == 'loo':
+        dobras[:] = np.arange(total)
+    elif estrategia == 'kfold':
+        for dobra, parte in enumerate(np.array_split(np.array(posicoes, dtype=np.intp), num_dobras)):
+            dobras[parte] = dobra
+    elif estrategia == 'estratificado':
+        # Distribui as amostras de cada classe em rodízio entre as dobras
+        por_classe = {}
+        for posicao in posicoes:
+            por_classe.setdefault(rotulos[posicao], []).append(posicao)
+        proxima = 0
+        for posicoes_classe in por_classe.values():
+            for posicao in posicoes_classe:
+                dobras[posicao] = proxima % num_dobras
+                proxima += 1
+    else:
+        raise ValueError(f"Estratégia de validação cruzada desconhecida: {estrategia}")
+    return dobras
+
+
+def validacao_cruzada(classificador, dataset, valores_k, estrategia='kfold',
+                      num_dobras=5, embaralhar=True, rotulos=None):
+    """
+    Validação cruzada de vários valores de k reaproveitando as distâncias.
+    
+    A matriz de distâncias entre todas as amostras é calculada uma única vez,
+    em blocos de linhas para limitar a memória. Como cada amostra é teste em
+    exatamente uma dobra, cada linha responde à sua dobra mascarando as
+    amostras da mesma dobra; os vizinhos são ordenados uma vez até o maior k
+    e todos os valores de k são avaliados sobre essa ordenação. O conjunto
+    de treino de cada dobra mantém a ordem do dataset, então os empates são
+    resolvidos como em um classificador treinado com ele. Quando um k passa
+    do número de amostras fora da dobra, a votação usa só essas amostras,
+    como faria esse classificador; as mascaradas nunca votam.
+    
+    Args:
+        classificador: Classificador KNN (usado para converter e votar, sem treino)
+        dataset: Dataset completo ou, com rotulos, matriz de características
+        valores_k: Lista de valores de k a avaliar
+        estrategia (str): 'kfold', 'estratificado' ou 'loo' (ver atribuir_dobras)
+        num_dobras (int): Número de dobras (ignorado em 'loo')
+        embaralhar (bool): Se deve embaralhar as amostras antes de dividir
+        rotulos: Sequência com o rótulo de cada linha da matriz
+        
+    Returns:
+        dict: Acurácia média (%) entre as dobras para cada valor de k
+    """
+    matriz = classificador.converter_consultas(dataset)
+    if rotulos is None:
+        rotulos = [amostra[-1] for amostra in dataset]
+    dobras = atribuir_dobras(rotulos, estrategia, num_dobras, embaralhar)
+    total_dobras = int(dobras.max()) + 1
+    k_maximo = max(valores_k)
+    
+    corretas = {k_teste: np.zeros(total_dobras) for k_teste in valores_k}
+    tamanhos = np.bincount(dobras, minlength=total_dobras)
+    # Amostras de treino de cada dobra: as de todas as outras
+    tamanhos_treino = len(rotulos) - tamanhos
+    if (tamanhos_treino[dobras] == 0).any():
+        raise ValueError("A validação cruzada precisa de pelo menos duas dobras com amostras")
+    
+    num_amostras, num_caracteristicas = matriz.shape
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_amostras * num_caracteristicas))
+    for inicio in range(0, num_amostras, tamanho_bloco):
+        bloco = matriz[inicio:inicio + tamanho_bloco]
+        diferencas = bloco[:, np.newaxis, :] - matriz[np.newaxis, :, :]
+        distancias = np.sqrt((diferencas ** 2).sum(axis=2))
+        # Amostras da mesma dobra não fazem parte do treino dessa linha
+        dobras_bloco = dobras[inicio:inicio + len(bloco)]
+        distancias[dobras_bloco[:, np.newaxis] == dobras[np.newaxis, :]] = np.inf
+        ordem = selecionar_vizinhos(distancias, k_maximo)
+        
+        for deslocamento, linha in enumerate(ordem):
+            i = inicio + deslocamento
+            vizinhos = [rotulos[j] for j in linha[:tamanhos_treino[dobras[i]]]]
+            for k_teste in valores_k:
+                if classificador.votar(vizinhos[:k_teste]) == rotulos[i]:
+                    corretas[k_teste][dobras[i]] += 1
+    
+    return {k_teste: float(np.mean(corretas[k_teste] / tamanhos)) * 100 for k_teste in valores_k}
+
+
 def main():
     """
     Função principal que executa o algoritmo KNN no dataset Iris.
@@ -227,43 +2092,71 @@ def main():
     # Configurações
     nome_arquivo = 'iris.csv'
     k = 3  # Número de vizinhos
+    indice = None  # Estrutura de busca: None (varredura linear), 'kdtree', 'balltree' ou 'lsh'
     proporcao_treino = 0.8  # 80% para treino, 20% para teste
+    num_dobras = 5  # Dobras da validação cruzada
+    tamanho_cache = 0  # Predições guardadas no cache LRU (0 = sem cache)
+    num_processos = 1  # Processos usados na avaliação (1 = sequencial)
+    num_fragmentos = 1  # Fragmentos do conjunto de treino, cada um em seu processo
+    usar_cache = True  # Lê o dataset do cache binário (.knncache), recompilado quando o CSV muda
+    metodo_reducao = None  # Redução do treino: None, 'edicao', 'condensacao' ou 'edicao_condensacao'
     
-    # Carrega o dataset
+    # Carrega o dataset como matriz de características e códigos de espécie
     print(f"Carregando dataset do arquivo: {nome_arquivo}")
-    dataset = carregar_dataset_iris(nome_arquivo)
+    matriz = None
+    if usar_cache:
+        # A matriz mapeada do cache vai direto para o classificador, sem passar por listas
+        matriz, codigos, classes = carregar_dataset_iris_binario(nome_arquivo)
+        if matriz is None:
+            print("Cache binário indisponível, lendo o CSV")
+    if matriz is None:
+        dataset = carregar_dataset_iris(nome_arquivo)
+        if dataset is None:
+            print("Não foi possível carregar o dataset. Encerrando programa.")
+            return
+        posicao_classe = {}
+        codigos = np.array([posicao_classe.setdefault(amostra[-1], len(posicao_classe)) for amostra in dataset],
+                           dtype=np.intp)
+        classes = list(posicao_classe)
+        matriz = np.array([amostra[:-1] for amostra in dataset], dtype=np.float64)
+    rotulos = np.array(classes, dtype=object)[codigos]
     
-    if dataset is None:
-        print("Não foi possível carregar o dataset. Encerrando programa.")
-        return
-    
-    print(f"Dataset carregado com sucesso! Total de amostras: {len(dataset)}")
+    print(f"Dataset carregado com sucesso! Total de amostras: {len(rotulos)}")
     
-    # Mostra algumas estatísticas do dataset
-    classes = {}
-    for amostra in dataset:
-        classe = amostra[-1]
-        classes[classe] = classes.get(classe, 0) + 1
+    # Mostra algumas estatísticas do dataset, na ordem em que as classes aparecem
+    presentes, primeiras, quantidades = np.unique(codigos, return_index=True, return_counts=True)
     
     print(f"Classes encontradas:")
-    for classe, quantidade in classes.items():
-        print(f"  - {classe}: {quantidade} amostras")
+    for posicao in np.argsort(primeiras):
+        print(f"  - {classes[presentes[posicao]]}: {quantidades[posicao]} amostras")
     
     # Divide o dataset em treino e teste
     print(f"\nDividindo dataset: {proporcao_treino*100:.0f}% treino, {(1-proporcao_treino)*100:.0f}% teste")
-    dados_treino, dados_teste = dividir_dataset(dataset, proporcao_treino, embaralhar=True)
+    matriz_treino, rotulos_treino, matriz_teste, rotulos_teste = dividir_matriz(
+        matriz, rotulos, proporcao_treino, embaralhar=True)
     
-    print(f"Conjunto de treino: {len(dados_treino)} amostras")
-    print(f"Conjunto de teste: {len(dados_teste)} amostras")
+    print(f"Conjunto de treino: {len(rotulos_treino)} amostras")
+    print(f"Conjunto de teste: {len(rotulos_teste)} amostras")
     
     # Cria e treina o classificador
     print(f"\nTreinando classificador KNN com k={k}...")
-    classificador = KNNClassificador(k=k)
-    classificador.treinar(dados_treino)
+    classificador = KNNClassificador(k=k, indice=indice, num_fragmentos=num_fragmentos,
+                                     tamanho_cache=tamanho_cache)
+    classificador.treinar_matriz(matriz_treino, rotulos_treino)
+    if metodo_reducao is not None:
+        # O conjunto de teste faz o papel de validação para medir o efeito da redução
+        relatorio = reduzir_prototipos(classificador, metodo_reducao, num_processos=num_processos,
+                                       dados_validacao=matriz_teste, rotulos_validacao=rotulos_teste)
+        print(f"Redução ({metodo_reducao}): {relatorio['amostras_antes']} → {relatorio['amostras_depois']} "
+              f"amostras ({relatorio['fator_reducao']:.2f}x menos); acurácia de validação "
+              f"{relatorio['acuracia_antes']:.2f}% → {relatorio['acuracia_depois']:.2f}%")
+    if indice == 'lsh':
+        recall = classificador.medir_recall(matriz_teste)
+        print(f"Recall do LSH em relação à busca exata: {recall * 100:.2f}%")
     
     # Avalia o modelo
     print(f"\nIniciando avaliação do modelo:")
-    acuracia, corretas, total = avaliar_modelo(classificador, dados_teste)
+    acuracia, corretas, total = avaliar_modelo(classificador, matriz_teste, num_processos, rotulos_teste)
     
     # Mostra resultados finais
     print("\n" + "=" * 60)
@@ -273,6 +2166,10 @@ def main():
     print(f"Predições corretas: {corretas}")
     print(f"Predições incorretas: {total - corretas}")
     print(f"Acurácia: {acuracia:.2f}%")
+    if classificador.cache is not None:
+        estatisticas = classificador.cache.estatisticas()
+        print(f"Cache de predições: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas, "
+              f"{estatisticas['remocoes']} remoções ({estatisticas['taxa_acerto']:.2f}% de acerto)")
     
     # Avalia diferentes valores de k
     print(f"\n" + "-" * 60)
@@ -283,19 +2180,12 @@ def main():
     melhor_k = k
     melhor_acuracia = acuracia
     
+    # Uma única busca de vizinhos responde todos os valores de k
+    acuracias = avaliar_multiplos_k(classificador, matriz_teste, valores_k, rotulos_teste)
+    
     for k_teste in valores_k:
-        if k_teste != k:  # Não testa o k já usado
-            classificador_teste = KNNClassificador(k=k_teste)
-            classificador_teste.treinar(dados_treino)
-            
-            # Avalia sem imprimir detalhes
-            corretas_teste = 0
-            for instancia_teste in dados_teste:
-                predicao = classificador_teste.predizer(instancia_teste)
-                if predicao == instancia_teste[-1]:
-                    corretas_teste += 1
-            
-            acuracia_teste = (corretas_teste / len(dados_teste)) * 100
+        if k_teste != k:  # Não repete o k já usado
+            acuracia_teste = acuracias[k_teste]
             print(f"k={k_teste}: {acuracia_teste:.2f}% de acurácia")
             
             if acuracia_teste > melhor_acuracia:
@@ -305,6 +2195,19 @@ def main():
             print(f"k={k}: {acuracia:.2f}% de acurácia (usado acima)")
     
     print(f"\nMelhor k encontrado: {melhor_k} com {melhor_acuracia:.2f}% de acurácia")
+    
+    # Validação cruzada: as distâncias entre todas as amostras são calculadas uma só vez
+    print(f"\n" + "-" * 60)
+    print(f"VALIDAÇÃO CRUZADA ESTRATIFICADA ({num_dobras} DOBRAS)")
+    print("-" * 60)
+    
+    acuracias_cv = validacao_cruzada(classificador, matriz, valores_k, 'estratificado', num_dobras,
+                                     rotulos=rotulos)
+    for k_teste in valores_k:
+        print(f"k={k_teste}: {acuracias_cv[k_teste]:.2f}% de acurácia média")
+    
+    # Encerra os processos dos fragmentos de treino, se houver
+    classificador.encerrar()
 
 
 # Execução principal
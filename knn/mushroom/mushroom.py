@@ -1,7 +1,692 @@
 
+import copy
 import csv
+import hashlib
+import heapq
+import json
 import math
+import os
 import random
+import struct
+from bisect import bisect_left
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# Número máximo de elementos (consultas x treino x características) processados
+# por bloco na busca de vizinhos em lote, limitando o uso de memória
+ELEMENTOS_POR_BLOCO = 2 ** 22
+
+# Número de amostras por bloco na leitura em fluxo dos arquivos CSV
+TAMANHO_BLOCO_LEITURA = 10000
+
+# Formato binário de cache dos datasets: assinatura, tamanho do cabeçalho JSON
+# (uint32 little-endian), cabeçalho JSON e arrays alinhados em 64 bytes
+ASSINATURA_CACHE = b'KNNCACHE'
+VERSAO_CACHE = 1
+ALINHAMENTO_CACHE = 64
+
+# Representações da matriz de treino usadas na busca em lote: 'one_hot'
+# (float64, distância euclidiana), 'bits' (one-hot empacotado em palavras
+# uint64, distância de Hamming por contagem de bits) ou 'categorica' (um
+# código uint8 por característica, distância pelo número de divergências)
+REPRESENTACOES = ('one_hot', 'bits', 'categorica')
+
+# Código dos valores ausentes do mapeamento na representação 'categorica':
+# diverge de todas as amostras de treino
+CODIGO_DESCONHECIDO = 255
+
+# Primeira amostra de uma classe sem amostras em um protótipo (ver PrototiposTreino)
+SEM_AMOSTRA = np.iinfo(np.intp).max
+
+# Valores distintos aceitos por característica nos códigos uint8: 0 a 254,
+# já que o 255 é reservado para CODIGO_DESCONHECIDO
+MAXIMO_VALORES_CATEGORICOS = CODIGO_DESCONHECIDO
+
+# Tratamento de valores ausentes do mapeamento ao codificar: 'ignorar' (bloco
+# one-hot zerado ou CODIGO_DESCONHECIDO) ou 'erro' (ValueError)
+POLITICAS_DESCONHECIDOS = ('ignorar', 'erro')
+
+# Identificação dos modelos salvos por salvar_modelo (no mesmo formato binário
+# dos caches de dataset)
+TIPO_MODELO = 'modelo_knn_cogumelos'
+VERSAO_MODELO = 1
+
+# Treino incremental: o índice de busca é reconstruído quando as amostras
+# adicionadas depois da sua construção (varridas linearmente) passam desta
+# fração das indexadas, e o armazenamento é compactado quando as amostras
+# marcadas como removidas passam desta fração do total
+FRACAO_RECONSTRUCAO_INDICE = 0.25
+FRACAO_COMPACTACAO = 0.5
+
+# Métodos de redução do conjunto de treino (ver reduzir_prototipos): edição de
+# Wilson, condensação de Hart ou as duas, nessa ordem
+METODOS_REDUCAO = ('edicao', 'condensacao', 'edicao_condensacao')
+
+# Número de bits ligados em cada byte, usado quando np.bitwise_count não existe
+_BITS_POR_BYTE = np.array([bin(valor).count('1') for valor in range(256)], dtype=np.uint8)
+
+
+def empacotar_bits(matriz):
+    """
+    Empacota uma matriz binária (one-hot) em palavras uint64, 64 colunas por palavra.
+    
+    Args:
+        matriz: np.ndarray (amostras x características) com valores 0 e 1
+        
+    Returns:
+        np.ndarray: Matriz uint64 (amostras x ceil(características / 64))
+    """
+    matriz = np.asarray(matriz)
+    empacotada = np.packbits(matriz != 0, axis=1, bitorder='little')
+    # Completa cada linha com bytes zerados até um múltiplo de 8 (uma palavra)
+    preenchimento = -empacotada.shape[1] % 8
+    if preenchimento:
+        empacotada = np.pad(empacotada, ((0, 0), (0, preenchimento)))
+    return np.ascontiguousarray(empacotada).view(np.uint64)
+
+
+def contar_bits(palavras):
+    """
+    Conta os bits ligados de cada palavra uint64 (popcount).
+    
+    Args:
+        palavras: np.ndarray uint64
+        
+    Returns:
+        np.ndarray: Contagens com a mesma forma de palavras
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(palavras)
+    # NumPy < 2.0: consulta a contagem byte a byte em uma tabela
+    palavras = np.ascontiguousarray(palavras)
+    por_byte = _BITS_POR_BYTE[palavras.view(np.uint8)]
+    return por_byte.reshape(palavras.shape + (8,)).sum(axis=-1)
+
+
+def realocar(array, usados, capacidade):
+    """
+    Copia as primeiras linhas de um array para um novo array com mais capacidade.
+    
+    Args:
+        array: np.ndarray de origem
+        usados (int): Número de linhas a copiar
+        capacidade (int): Número de linhas do novo array
+        
+    Returns:
+        np.ndarray: Novo array (capacidade x demais dimensões), do mesmo tipo
+    """
+    novo = np.empty((capacidade,) + array.shape[1:], dtype=array.dtype)
+    novo[:usados] = array[:usados]
+    return novo
+
+
+def selecionar_vizinhos_contagem(distancias, k, distancia_maxima):
+    """
+    Seleciona as k menores distâncias inteiras por contagem (baldes por distância).
+    
+    Cada amostra vai para o balde da sua distância, em O(n); os baldes são
+    percorridos da menor para a maior distância até reunir k amostras.
+    Critério de desempate: dentro de um balde vale a ordem das amostras, ou
+    seja, o menor índice primeiro (a mesma ordem de uma ordenação estável).
+    
+    Args:
+        distancias: Sequência de distâncias inteiras entre 0 e distancia_maxima
+        k (int): Número de vizinhos
+        distancia_maxima (int): Maior distância possível
+        
+    Returns:
+        list: Índices dos k vizinhos, do mais próximo ao mais distante
+    """
+    baldes = [[] for _ in range(distancia_maxima + 1)]
+    for indice, distancia in enumerate(distancias):
+        baldes[distancia].append(indice)
+    
+    selecionados = []
+    for balde in baldes:
+        selecionados.extend(balde[:k - len(selecionados)])
+        if len(selecionados) == k:
+            break
+    return selecionados
+
+
+def selecionar_vizinhos(distancias, k):
+    """
+    Seleciona, em cada linha, os índices das k menores distâncias, em ordem.
+    
+    O resultado é o mesmo de uma ordenação estável completa seguida de um
+    corte em k (empates resolvidos pelo menor índice), sem ordenar a linha
+    inteira. Para distâncias inteiras (limitadas, como as de Hamming e as
+    divergências categóricas) usa contagem: um histograma por linha dá a
+    k-ésima distância e, entre as amostras com exatamente essa distância,
+    entram as de menor índice. Para distâncias reais, np.partition dá a
+    k-ésima distância e apenas os candidatos até ela são ordenados.
+    
+    Args:
+        distancias: np.ndarray (consultas x amostras)
+        k (int): Número de vizinhos
+        
+    Returns:
+        np.ndarray: Índices dos vizinhos (consultas x k), do mais próximo ao mais distante
+    """
+    num_linhas, num_amostras = distancias.shape
+    k = min(k, num_amostras)
+    if k == 0 or num_linhas == 0:
+        return np.empty((num_linhas, k), dtype=np.intp)
+    if k == num_amostras:
+        return np.argsort(distancias, axis=1, kind='stable')
+    
+    if distancias.dtype.kind in 'iu':
+        # Histograma de cada linha em um único bincount (deslocado por linha)
+        num_valores = int(distancias.max()) + 1
+        deslocadas = distancias + np.arange(num_linhas)[:, np.newaxis] * num_valores
+        contagens = np.bincount(deslocadas.ravel(), minlength=num_linhas * num_valores)
+        acumuladas = np.cumsum(contagens.reshape(num_linhas, num_valores), axis=1)
+        limites = (acumuladas < k).sum(axis=1)  # k-ésima distância de cada linha
+        abaixo = np.where(limites > 0, acumuladas[np.arange(num_linhas), limites - 1], 0)
+        
+        # Todas as distâncias abaixo do limite e as primeiras iguais a ele
+        iguais = distancias == limites[:, np.newaxis]
+        mascara = (distancias < limites[:, np.newaxis]) | (
+            iguais & (np.cumsum(iguais, axis=1) <= (k - abaixo)[:, np.newaxis]))
+        candidatos = np.nonzero(mascara)[1].reshape(num_linhas, k)
+    else:
+        limites = np.partition(distancias, k - 1, axis=1)[:, k - 1]
+        candidatos = np.empty((num_linhas, k), dtype=np.intp)
+        for i, (linha, limite) in enumerate(zip(distancias, limites)):
+            indices = np.flatnonzero(linha <= limite)
+            candidatos[i] = indices[np.argsort(linha[indices], kind='stable')[:k]]
+        return candidatos
+    
+    # Os candidatos estão em ordem de índice; a ordenação estável mantém o desempate
+    ordem = np.argsort(np.take_along_axis(distancias, candidatos, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidatos, ordem, axis=1)
+
+
+class IndiceLSHHamming:
+    """
+    Índice aproximado por LSH de amostragem de bits, para vetores binários
+    (one-hot), em que a distância euclidiana é a raiz da distância de Hamming.
+    
+    Cada tabela usa como chave os valores de num_hashes posições sorteadas do
+    vetor: vetores que diferem em poucos bits tendem a ter a mesma chave. A
+    consulta calcula a distância exata apenas para os candidatos dos baldes
+    visitados. Com num_sondas > 0 (multi-probe), visita também, em cada
+    tabela, os baldes cuja chave difere da consulta em um único bit. Se houver
+    menos de k candidatos, a consulta recorre à varredura completa.
+    """
+    
+    def __init__(self, matriz, num_tabelas=8, num_hashes=12, num_sondas=0, semente=0):
+        """
+        Constrói as tabelas de hash sobre os pontos de treino.
+        
+        Args:
+            matriz: np.ndarray (amostras x características binárias)
+            num_tabelas (int): Número de tabelas de hash independentes
+            num_hashes (int): Bits amostrados por tabela (no máximo 62)
+            num_sondas (int): Baldes vizinhos extras visitados por tabela
+            semente (int): Semente do gerador aleatório, para reprodutibilidade
+        """
+        gerador = np.random.default_rng(semente)
+        num_hashes = min(num_hashes, matriz.shape[1], 62)
+        self.pontos = matriz
+        self.num_sondas = min(num_sondas, num_hashes)
+        self.posicoes = [gerador.choice(matriz.shape[1], num_hashes, replace=False)
+                         for _ in range(num_tabelas)]
+        # Pesos que transformam os bits amostrados em uma chave inteira
+        self.pesos = np.left_shift(1, np.arange(num_hashes, dtype=np.int64))
+        
+        self.tabelas = []
+        for posicoes in self.posicoes:
+            chaves = (matriz[:, posicoes] != 0).astype(np.int64) @ self.pesos
+            tabela = {}
+            for i, chave in enumerate(chaves.tolist()):
+                tabela.setdefault(chave, []).append(i)
+            self.tabelas.append(tabela)
+    
+    def buscar(self, consulta, k):
+        """
+        Busca aproximada dos k vizinhos mais próximos de uma consulta.
+        
+        Args:
+            consulta: np.ndarray com as características da consulta
+            k (int): Número de vizinhos
+            
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        candidatos = set()
+        for posicoes, tabela in zip(self.posicoes, self.tabelas):
+            chave = int((consulta[posicoes] != 0).astype(np.int64) @ self.pesos)
+            candidatos.update(tabela.get(chave, ()))
+            for bit in range(self.num_sondas):
+                candidatos.update(tabela.get(chave ^ (1 << bit), ()))
+        if len(candidatos) < k:
+            candidatos = range(len(self.pontos))
+        
+        # Índices em ordem crescente + ordenação estável = critério (distância, índice)
+        indices = np.fromiter(candidatos, dtype=np.intp, count=len(candidatos))
+        indices.sort()
+        distancias = np.sqrt(((self.pontos[indices] - consulta) ** 2).sum(axis=1))
+        ordem = np.argsort(distancias, kind='stable')[:k]
+        return list(zip(distancias[ordem].tolist(), indices[ordem].tolist()))
+
+
+class IndiceInvertido:
+    """
+    Índice invertido exato para dados categóricos (representação 'categorica').
+    
+    Para cada par (característica, valor) guarda a lista de amostras de treino
+    com esse valor. Uma consulta soma as coincidências percorrendo apenas as
+    listas dos seus próprios valores, da mais curta (mais seletiva) para a
+    mais longa, e para antes do fim quando as listas restantes não podem mais
+    mudar o conjunto dos k vizinhos (algoritmo de limiar): se c é a maior
+    contagem abaixo da k-ésima maior contagem atual e restam r listas, nenhuma
+    amostra com contagem atual menor que a k-ésima pode alcançá-la quando
+    c + r for menor que ela. Os candidatos restantes são reavaliados de forma
+    exata. As contagens ficam em um acumulador esparso: só as amostras das
+    listas percorridas são lidas, contadas e depois zeradas, então o custo de
+    uma consulta depende das listas percorridas, não do tamanho do treino.
+    A distância é o número de características divergentes.
+    """
+    
+    def __init__(self, matriz):
+        """
+        Constrói as listas de cada par (característica, valor).
+        
+        Args:
+            matriz: np.ndarray (amostras x características) com os códigos categóricos
+        """
+        self.codigos = matriz
+        self.listas = []  # Por característica: (amostras ordenadas por valor, início de cada valor)
+        for coluna in matriz.T:
+            amostras = np.argsort(coluna, kind='stable')
+            inicios = np.concatenate(([0], np.cumsum(np.bincount(coluna, minlength=1))))
+            self.listas.append((amostras, inicios))
+        # Contagens de coincidências, zeradas ao fim de cada consulta apenas
+        # nas amostras tocadas por ela
+        self.coincidencias = np.zeros(len(matriz), dtype=np.intp)
+        self.consultas = 0
+        self.entradas_percorridas = 0
+        self.amostras_tocadas = 0
+    
+    def _lista(self, caracteristica, valor):
+        """Amostras de treino com o valor na característica (em ordem crescente)."""
+        amostras, inicios = self.listas[caracteristica]
+        if valor + 1 >= len(inicios):
+            return amostras[:0]  # Valor ausente do treino
+        return amostras[inicios[valor]:inicios[valor + 1]]
+    
+    def buscar(self, consulta, k):
+        """
+        Busca exata dos k vizinhos mais próximos de uma consulta.
+        
+        Args:
+            consulta: np.ndarray com os códigos da consulta
+            k (int): Número de vizinhos
+            
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        num_amostras, num_caracteristicas = self.codigos.shape
+        self.consultas += 1
+        listas = sorted((self._lista(f, int(valor)) for f, valor in enumerate(consulta)), key=len)
+        
+        coincidencias = self.coincidencias
+        histograma = np.zeros(num_caracteristicas + 1, dtype=np.intp)  # amostras por contagem
+        histograma[0] = num_amostras
+        limite = 0
+        percorridas = []
+        try:
+            for lista in listas:
+                percorridas.append(lista)
+                self.entradas_percorridas += len(lista)
+                histograma[:-1] -= np.bincount(coincidencias[lista], minlength=num_caracteristicas)
+                coincidencias[lista] += 1
+                histograma[1:] += np.bincount(coincidencias[lista] - 1, minlength=num_caracteristicas)
+                
+                # k-ésima maior contagem atual e a maior contagem abaixo dela
+                acumulado = np.cumsum(histograma[::-1])
+                limite = num_caracteristicas - int(np.searchsorted(acumulado, min(k, num_amostras)))
+                abaixo = np.flatnonzero(histograma[:limite])
+                maior_abaixo = int(abaixo[-1]) if len(abaixo) else -1
+                if maior_abaixo + (num_caracteristicas - len(percorridas)) < limite:
+                    break
+            
+            # Amostras tocadas, em ordem crescente e sem repetição
+            tocadas = np.unique(np.concatenate(percorridas)) if percorridas else np.empty(0, dtype=np.intp)
+            self.amostras_tocadas += len(tocadas)
+            candidatos = tocadas[coincidencias[tocadas] >= limite]
+        finally:
+            for lista in percorridas:
+                coincidencias[lista] = 0
+        if limite == 0:
+            # Poucas coincidências: as amostras não tocadas (todas à distância
+            # máxima) completam os k vizinhos pelo menor índice
+            nao_tocadas = np.setdiff1d(np.arange(min(num_amostras, k + len(tocadas))), tocadas,
+                                       assume_unique=True)[:k]
+            candidatos = np.concatenate((candidatos, nao_tocadas))
+        divergencias = (self.codigos[candidatos] != consulta).sum(axis=1)
+        ordem = np.lexsort((candidatos, divergencias))[:k]
+        return list(zip(divergencias[ordem].tolist(), candidatos[ordem].tolist()))
+
+
+# Estruturas de busca disponíveis para o parâmetro 'indice' do classificador
+INDICES_VIZINHOS = {
+    'lsh': IndiceLSHHamming,
+    'invertido': IndiceInvertido,
+}
+
+
+class CachePredicoes:
+    """
+    Cache LRU (menos recentemente usado) de predições, com tamanho limitado.
+    
+    A chave é a representação binária do vetor de características, então
+    instâncias idênticas compartilham a mesma entrada. Cada entrada guarda
+    também a distância do k-ésimo vizinho da consulta (raio), que permite
+    descartar só as predições afetadas quando o treino muda. Conta acertos,
+    falhas e remoções para acompanhar a eficácia do cache.
+    """
+    
+    def __init__(self, tamanho_maximo):
+        """
+        Inicializa o cache vazio.
+        
+        Args:
+            tamanho_maximo (int): Número máximo de predições guardadas
+        """
+        self.tamanho_maximo = tamanho_maximo
+        self.entradas = OrderedDict()
+        self.raios = {}
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+    
+    def obter(self, chave):
+        """
+        Busca uma predição no cache, marcando-a como usada recentemente.
+        
+        Returns:
+            str: Predição guardada ou None se a chave não estiver no cache
+        """
+        predicao = self.entradas.get(chave)
+        if predicao is None:
+            self.falhas += 1
+            return None
+        self.entradas.move_to_end(chave)
+        self.acertos += 1
+        return predicao
+    
+    def guardar(self, chave, predicao, raio=math.inf):
+        """
+        Guarda uma predição, removendo a menos usada se o cache estiver cheio.
+        
+        Args:
+            chave (bytes): Representação binária da consulta
+            predicao (str): Classe predita
+            raio (float): Distância do k-ésimo vizinho da consulta (infinita
+                se houver menos de k amostras de treino)
+        """
+        self.entradas[chave] = predicao
+        self.raios[chave] = raio
+        self.entradas.move_to_end(chave)
+        if len(self.entradas) > self.tamanho_maximo:
+            antiga, _ = self.entradas.popitem(last=False)
+            del self.raios[antiga]
+            self.remocoes += 1
+    
+    def descartar(self, chaves):
+        """
+        Descarta as predições das chaves informadas (as ausentes são ignoradas).
+        """
+        for chave in chaves:
+            if self.entradas.pop(chave, None) is not None:
+                del self.raios[chave]
+    
+    def limpar(self):
+        """
+        Descarta todas as predições (os contadores são mantidos).
+        """
+        self.entradas.clear()
+        self.raios.clear()
+    
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Acertos, falhas, remoções, entradas atuais e taxa de acerto (%)
+        """
+        consultas = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'remocoes': self.remocoes,
+            'entradas': len(self.entradas),
+            'taxa_acerto': (self.acertos / consultas) * 100 if consultas else 0.0,
+        }
+
+
+class PrototiposTreino:
+    """
+    Conjunto de treino com as linhas repetidas colapsadas em protótipos únicos.
+    
+    Cada protótipo guarda, por classe, quantas amostras representa e a
+    primeira delas, além dos índices originais de todas as suas amostras.
+    As distâncias são calculadas uma única vez por protótipo, e a seleção
+    reproduz exatamente os k vizinhos do conjunto completo (desempate pelo
+    menor índice): protótipos abaixo da k-ésima distância entram inteiros e,
+    nessa distância, entram as amostras de menor índice que completam k.
+    Amostras são acrescentadas (adicionar) e descontadas (remover) sem
+    refazer os protótipos; um protótipo sem amostras fica na matriz, com
+    tamanho 0, até o conjunto ser colapsado de novo.
+    """
+    
+    def __init__(self, matriz, rotulos):
+        """
+        Colapsa as linhas idênticas da matriz de treino.
+        
+        Args:
+            matriz: np.ndarray (amostras x colunas) já na representação do classificador
+            rotulos: Sequência com o rótulo de cada amostra
+        """
+        num_amostras = len(matriz)
+        _, primeiras, inverso = np.unique(matriz, axis=0, return_index=True, return_inverse=True)
+        # Numera os protótipos pela ordem da primeira ocorrência no treino
+        ordem = np.argsort(primeiras)
+        numeracao = np.empty_like(ordem)
+        numeracao[ordem] = np.arange(len(ordem))
+        inverso = numeracao[inverso.ravel()]
+        num_prototipos = len(ordem)
+        
+        self.matriz = np.ascontiguousarray(matriz[primeiras[ordem]])
+        self.prototipo_da_amostra = inverso
+        self.tamanhos = np.bincount(inverso, minlength=num_prototipos)
+        # Índices originais de cada protótipo, em ordem crescente
+        membros = np.argsort(inverso, kind='stable')
+        self.membros = [grupo.tolist() for grupo in np.split(membros, np.cumsum(self.tamanhos)[:-1])]
+        
+        self.classes = list(dict.fromkeys(rotulos))
+        self.posicao_classe = {classe: c for c, classe in enumerate(self.classes)}
+        self.codigos_rotulos = np.array([self.posicao_classe[rotulo] for rotulo in rotulos], dtype=np.intp)
+        self.contagens = np.zeros((num_prototipos, len(self.classes)), dtype=np.intp)
+        np.add.at(self.contagens, (inverso, self.codigos_rotulos), 1)
+        self.primeiras_amostras = np.full((num_prototipos, len(self.classes)), SEM_AMOSTRA, dtype=np.intp)
+        np.minimum.at(self.primeiras_amostras, (inverso, self.codigos_rotulos), np.arange(num_amostras))
+        
+        # Protótipo de cada linha, montado na primeira inserção, e arrays com
+        # capacidade de sobra (ver _redimensionar)
+        self.chaves = None
+        self.buffers = {}
+        self.num_ativas = num_amostras
+        self.num_vazios = 0
+        self.taxa_compressao = num_amostras / num_prototipos if num_prototipos else 1.0
+    
+    def _redimensionar(self, num_amostras, num_prototipos):
+        """
+        Ajusta os arrays por amostra e por protótipo aos novos totais,
+        dobrando a capacidade quando ela se esgota (O(1) amortizado).
+        """
+        for nome, total in (('prototipo_da_amostra', num_amostras), ('codigos_rotulos', num_amostras),
+                            ('matriz', num_prototipos), ('tamanhos', num_prototipos),
+                            ('contagens', num_prototipos), ('primeiras_amostras', num_prototipos)):
+            array = getattr(self, nome)
+            buffer = self.buffers.get(nome)
+            if buffer is None or total > len(buffer):
+                buffer = realocar(array, len(array), max(total, 2 * len(array), 16))
+                self.buffers[nome] = buffer
+            setattr(self, nome, buffer[:total])
+    
+    def _nova_classe(self, classe):
+        """
+        Acrescenta uma coluna de classe às contagens e às primeiras amostras.
+        """
+        self.posicao_classe[classe] = len(self.classes)
+        self.classes.append(classe)
+        num_prototipos = len(self.contagens)
+        self.contagens = np.column_stack((self.contagens, np.zeros(num_prototipos, dtype=np.intp)))
+        self.primeiras_amostras = np.column_stack((self.primeiras_amostras,
+                                                   np.full(num_prototipos, SEM_AMOSTRA, dtype=np.intp)))
+        self.buffers.pop('contagens', None)
+        self.buffers.pop('primeiras_amostras', None)
+    
+    def adicionar(self, linhas, rotulos):
+        """
+        Acrescenta amostras depois das atuais, cada uma somada ao protótipo
+        da sua linha (encontrado por hash) ou em um protótipo novo.
+        
+        Args:
+            linhas: np.ndarray (amostras x colunas) na representação da matriz
+            rotulos: Sequência com o rótulo de cada amostra
+        """
+        if self.chaves is None:
+            self.chaves = {linha.tobytes(): p for p, linha in enumerate(self.matriz)}
+        linhas = np.ascontiguousarray(linhas, dtype=self.matriz.dtype)
+        inicio = len(self.prototipo_da_amostra)
+        num_prototipos = len(self.matriz)
+        
+        destinos = np.empty(len(linhas), dtype=np.intp)
+        novas = []
+        for i, linha in enumerate(linhas):
+            chave = linha.tobytes()
+            destino = self.chaves.get(chave)
+            if destino is None:
+                destino = self.chaves[chave] = num_prototipos + len(novas)
+                novas.append(i)
+            destinos[i] = destino
+        for rotulo in rotulos:
+            if rotulo not in self.posicao_classe:
+                self._nova_classe(rotulo)
+        codigos = np.array([self.posicao_classe[rotulo] for rotulo in rotulos], dtype=np.intp)
+        posicoes = np.arange(inicio, inicio + len(linhas))
+        
+        self._redimensionar(inicio + len(linhas), num_prototipos + len(novas))
+        self.matriz[num_prototipos:] = linhas[novas]
+        self.tamanhos[num_prototipos:] = 0
+        self.contagens[num_prototipos:] = 0
+        self.primeiras_amostras[num_prototipos:] = SEM_AMOSTRA
+        self.membros.extend([] for _ in novas)
+        
+        self.prototipo_da_amostra[inicio:] = destinos
+        self.codigos_rotulos[inicio:] = codigos
+        self.num_vazios -= int((self.tamanhos[np.unique(destinos)] == 0).sum()) - len(novas)
+        np.add.at(self.tamanhos, destinos, 1)
+        np.add.at(self.contagens, (destinos, codigos), 1)
+        # Posições novas são maiores que as existentes: só mudam as classes sem amostra
+        np.minimum.at(self.primeiras_amostras, (destinos, codigos), posicoes)
+        for destino, posicao in zip(destinos.tolist(), posicoes.tolist()):
+            self.membros[destino].append(posicao)
+        self.num_ativas += len(linhas)
+        self._atualizar_compressao()
+    
+    def remover(self, posicoes):
+        """
+        Desconta amostras dos seus protótipos (contagens, tamanhos, membros e
+        primeira amostra de cada classe); as posições das demais não mudam.
+        
+        Args:
+            posicoes: Índices originais de amostras ainda não removidas
+        """
+        for posicao in np.sort(posicoes).tolist():
+            prototipo = int(self.prototipo_da_amostra[posicao])
+            classe = int(self.codigos_rotulos[posicao])
+            membros = self.membros[prototipo]
+            indice = bisect_left(membros, posicao)
+            del membros[indice]
+            self.tamanhos[prototipo] -= 1
+            self.contagens[prototipo, classe] -= 1
+            if self.primeiras_amostras[prototipo, classe] == posicao:
+                seguintes = (j for j in membros[indice:] if self.codigos_rotulos[j] == classe)
+                self.primeiras_amostras[prototipo, classe] = next(seguintes, SEM_AMOSTRA)
+            if not membros:
+                self.num_vazios += 1
+        self.num_ativas -= len(posicoes)
+        self._atualizar_compressao()
+    
+    def _atualizar_compressao(self):
+        """
+        Amostras ativas por protótipo com amostras.
+        """
+        num_prototipos = len(self.matriz) - self.num_vazios
+        self.taxa_compressao = self.num_ativas / num_prototipos if num_prototipos else 1.0
+    
+    def selecionar(self, distancias, ordem, k):
+        """
+        Separa os protótipos e as amostras que formam os k vizinhos de uma consulta.
+        
+        Args:
+            distancias: np.ndarray com a distância da consulta a cada protótipo
+            ordem: Índices dos k primeiros protótipos por (distância, índice),
+                como os de selecionar_vizinhos
+            k (int): Número de vizinhos
+            
+        Returns:
+            tuple: (internos, limite, fronteira) - protótipos que entram inteiros,
+            a k-ésima distância e os índices originais das amostras nessa
+            distância que completam os k vizinhos, em ordem crescente
+        """
+        acumulado = np.cumsum(self.tamanhos[ordem])
+        posicao = min(int(np.searchsorted(acumulado, k)), len(ordem) - 1)
+        limite = distancias[ordem[posicao]]
+        internos = ordem[distancias[ordem] < limite]
+        faltam = k - int(self.tamanhos[internos].sum())
+        
+        # Protótipos na k-ésima distância fora de ordem também podem ter amostras de menor índice
+        candidatos = np.array([j for p in np.flatnonzero(distancias == limite).tolist()
+                               for j in self.membros[p][:faltam]], dtype=np.intp)
+        candidatos.sort()
+        return internos, limite, candidatos[:faltam]
+    
+    def obter_indices(self, distancias, ordem, k):
+        """
+        Devolve os índices originais dos k vizinhos, do mais próximo ao mais distante.
+        """
+        internos, limite, fronteira = self.selecionar(distancias, ordem, k)
+        indices = np.concatenate([np.array([j for p in internos.tolist() for j in self.membros[p]], dtype=np.intp),
+                                  fronteira])
+        distancias_amostras = np.concatenate([np.repeat(distancias[internos], self.tamanhos[internos]),
+                                              np.full(len(fronteira), limite)])
+        return indices[np.lexsort((indices, distancias_amostras))]
+    
+    def obter_votos(self, distancias, ordem, k):
+        """
+        Devolve os votos dos k vizinhos agrupados por protótipo e classe.
+        
+        Returns:
+            list: Tuplas (rotulo, peso) na ordem da primeira amostra de cada
+            grupo entre os vizinhos, como espera votar_ponderado
+        """
+        internos, limite, fronteira = self.selecionar(distancias, ordem, k)
+        grupos = []  # (distância, primeira amostra, classe, peso)
+        for p in internos.tolist():
+            for c in np.flatnonzero(self.contagens[p]).tolist():
+                grupos.append((distancias[p], self.primeiras_amostras[p, c], c, self.contagens[p, c]))
+        for j in fronteira.tolist():
+            grupos.append((limite, j, self.codigos_rotulos[j], 1))
+        grupos.sort()
+        return [(self.classes[c], peso) for _, _, c, peso in grupos]
 
 
 class KNNClassificadorCogumelos:
@@ -12,17 +697,75 @@ class KNNClassificadorCogumelos:
     Este classificador utiliza codificação one-hot para lidar com variáveis categóricas.
     """
     
-    def __init__(self, k=5):
+    def __init__(self, k=5, indice=None, parametros_indice=None, tamanho_cache=0,
+                 representacao='one_hot', colapsar_duplicatas=False,
+                 politica_desconhecidos='ignorar', parada_antecipada=False):
         """
         Inicializa o classificador KNN para cogumelos.
         
         Args:
             k (int): Número de vizinhos a considerar para classificação
+            indice (str): Estrutura de busca construída em treinar: None
+                (varredura linear exata), 'lsh' (aproximada) ou 'invertido'
+                (exata, por listas invertidas; requer representacao='categorica')
+            parametros_indice (dict): Parâmetros repassados à estrutura de
+                busca (ex.: num_tabelas e num_sondas do LSH)
+            tamanho_cache (int): Número máximo de predições guardadas no cache
+                LRU (0 desativa o cache)
+            representacao (str): Representação da matriz de treino na busca em
+                lote: 'one_hot' (float64), 'bits' (one-hot empacotado em
+                uint64, 64 vezes menor, com distância de Hamming por popcount)
+                ou 'categorica' (códigos uint8 das amostras não codificadas,
+                com o mapeamento de construir_mapeamento)
+            colapsar_duplicatas (bool): Se treinar deve colapsar as linhas
+                idênticas em protótipos com contagens por classe (ver PrototiposTreino)
+            politica_desconhecidos (str): O que fazer com valores ausentes do
+                mapeamento ao codificar: 'ignorar' ou 'erro'
+            parada_antecipada (bool): Se a varredura linear de obter_vizinhos
+                deve abandonar cada amostra assim que a distância parcial
+                alcança a do k-ésimo vizinho atual (ver obter_vizinhos_parada_antecipada)
         """
+        if indice is not None and indice not in INDICES_VIZINHOS:
+            raise ValueError(f"Índice desconhecido: {indice}")
+        if representacao not in REPRESENTACOES:
+            raise ValueError(f"Representação desconhecida: {representacao}")
+        if indice == 'lsh' and representacao != 'one_hot':
+            raise ValueError("O índice 'lsh' requer a representação 'one_hot'")
+        if indice == 'invertido' and representacao != 'categorica':
+            raise ValueError("O índice 'invertido' requer a representação 'categorica'")
+        if indice is not None and colapsar_duplicatas:
+            raise ValueError("O colapso de duplicatas requer a varredura linear (indice=None)")
+        if politica_desconhecidos not in POLITICAS_DESCONHECIDOS:
+            raise ValueError(f"Política para valores desconhecidos inválida: {politica_desconhecidos}")
         self.k = k
+        self.indice = indice
+        self.tamanho_cache = tamanho_cache
+        self.politica_desconhecidos = politica_desconhecidos
+        self.representacao = representacao
+        self.colapsar_duplicatas = colapsar_duplicatas
+        self.parada_antecipada = parada_antecipada
+        # Ordem de avaliação das características na parada antecipada
+        # (calculada na primeira busca) e contadores do trabalho realizado
+        self.ordem_caracteristicas = None
+        self.linhas_percorridas = 0
+        self.caracteristicas_percorridas = 0
+        self.prototipos = None
+        self.parametros_indice = parametros_indice or {}
+        self.estrutura = None
         self.dados_treino = []
+        self.matriz_treino = None
+        self.rotulos_treino = []
+        # Armazenamento incremental (ver adicionar_amostras e remover_amostras)
+        self.buffer_treino = None
+        self.ids_treino = None
+        self.removidas = None
+        self.num_removidas = 0
+        self.proximo_id = 0
+        self.tamanho_indexado = 0
+        self.removidas_indexadas = 0
         self.mapeamento_codificacao = {}
         self.cabecalho_processado = []
+        self.cache = CachePredicoes(tamanho_cache) if tamanho_cache > 0 else None
     
     def distancia_euclidiana(self, ponto1, ponto2):
         """
@@ -40,30 +783,202 @@ class KNNClassificadorCogumelos:
             distancia += (ponto1[i] - ponto2[i])**2
         return math.sqrt(distancia)
     
+    def distancia_categorica(self, ponto1, ponto2):
+        """
+        Calcula a distância entre dois pontos categóricos não codificados.
+        
+        É a distância euclidiana entre as codificações one-hot dos pontos:
+        cada característica divergente contribui com dois bits diferentes.
+        
+        Args:
+            ponto1: Lista com os valores categóricos do primeiro ponto
+            ponto2: Lista com os valores categóricos do segundo ponto
+            
+        Returns:
+            float: Raiz de duas vezes o número de características divergentes
+        """
+        return math.sqrt(2 * self.contar_divergencias(ponto1, ponto2))
+    
+    def contar_divergencias(self, ponto1, ponto2):
+        """
+        Conta as características com valores diferentes entre dois pontos.
+        
+        Args:
+            ponto1: Lista com os valores categóricos do primeiro ponto
+            ponto2: Lista com os valores categóricos do segundo ponto
+            
+        Returns:
+            int: Número de características divergentes
+        """
+        divergencias = 0
+        for i in range(len(ponto1)):
+            if ponto1[i] != ponto2[i]:
+                divergencias += 1
+        return divergencias
+    
+    def distancia_quadrada_limitada(self, ponto1, ponto2, limite):
+        """
+        Soma os quadrados das diferenças, abandonando a soma ao alcançar o limite.
+        
+        As características são percorridas na ordem de ordem_caracteristicas.
+        Como a soma só cresce, uma amostra que alcança o limite não pode
+        ficar à frente da que o definiu.
+        
+        Args:
+            ponto1: Lista com as características do primeiro ponto
+            ponto2: Lista com as características do segundo ponto
+            limite: Soma a partir da qual o cálculo é abandonado
+            
+        Returns:
+            float: Quadrado da distância euclidiana, ou None se alcançou o limite
+        """
+        soma = 0
+        for percorridas, i in enumerate(self.ordem_caracteristicas, 1):
+            diferenca = ponto1[i] - ponto2[i]
+            soma += diferenca * diferenca
+            if soma >= limite:
+                self.caracteristicas_percorridas += percorridas
+                return None
+        self.caracteristicas_percorridas += len(self.ordem_caracteristicas)
+        return soma
+    
+    def contar_divergencias_limitado(self, ponto1, ponto2, limite):
+        """
+        Conta as características divergentes, abandonando a contagem ao alcançar o limite.
+        
+        Args:
+            ponto1: Lista com os valores categóricos do primeiro ponto
+            ponto2: Lista com os valores categóricos do segundo ponto
+            limite: Contagem a partir da qual o cálculo é abandonado
+            
+        Returns:
+            int: Número de características divergentes, ou None se alcançou o limite
+        """
+        divergencias = 0
+        for percorridas, i in enumerate(self.ordem_caracteristicas, 1):
+            if ponto1[i] != ponto2[i]:
+                divergencias += 1
+                if divergencias >= limite:
+                    self.caracteristicas_percorridas += percorridas
+                    return None
+        self.caracteristicas_percorridas += len(self.ordem_caracteristicas)
+        # Sem divergências a contagem nunca foi comparada: um limite zero
+        # também descarta a amostra (empataria, com índice maior)
+        return divergencias if divergencias < limite else None
+    
+    def ordenar_caracteristicas(self):
+        """
+        Ordena as características pela contribuição esperada para a distância.
+        
+        A contribuição de uma característica é a probabilidade de ela divergir
+        entre duas amostras de treino sorteadas: 2p(1 - p) para uma coluna
+        one-hot com frequência p, e 1 - soma das frequências ao quadrado para
+        um valor categórico. As que mais separam as amostras vêm primeiro, o
+        que faz a soma parcial alcançar o limite mais cedo. A ordem só afeta
+        a velocidade, não os vizinhos encontrados, e não é refeita quando
+        amostras são adicionadas ou removidas.
+        
+        Returns:
+            list: Índices das características, da maior contribuição para a menor
+        """
+        vivas = [instancia[:-1] for instancia in self.dados_treino if instancia is not None]
+        if not vivas:
+            return []
+        if self.representacao == 'categorica':
+            contribuicoes = []
+            for valores in zip(*vivas):
+                frequencias = np.array(list(Counter(valores).values())) / len(vivas)
+                contribuicoes.append(1 - (frequencias ** 2).sum())
+            contribuicoes = np.array(contribuicoes)
+        else:
+            frequencias = np.array(vivas, dtype=np.float64).mean(axis=0)
+            contribuicoes = 2 * frequencias * (1 - frequencias)
+        # Ordenação estável: empates mantêm a ordem original das características
+        return np.argsort(-contribuicoes, kind='stable').tolist()
+    
+    def obter_vizinhos_parada_antecipada(self, instancia_teste):
+        """
+        Encontra os k vizinhos mais próximos abandonando as amostras distantes.
+        
+        Mantém um heap de máximo com os k melhores até o momento; a distância
+        do pior deles é o limite para as amostras seguintes, cujo cálculo é
+        interrompido assim que a soma parcial o alcança. Trabalha com o
+        quadrado da distância (a raiz não muda a ordem) e, na representação
+        'categorica', com o número de divergências. Como as amostras são
+        percorridas em ordem de índice, uma amostra que empata com o limite
+        perderia o desempate e também pode ser abandonada, e o resultado é o
+        mesmo de obter_vizinhos.
+        
+        Args:
+            instancia_teste: Lista com as características da instância a classificar
+            
+        Returns:
+            list: Lista com os k vizinhos mais próximos
+        """
+        if self.ordem_caracteristicas is None:
+            self.ordem_caracteristicas = self.ordenar_caracteristicas()
+        if self.representacao == 'categorica':
+            distancia_limitada = self.contar_divergencias_limitado
+        else:
+            distancia_limitada = self.distancia_quadrada_limitada
+        
+        consulta = instancia_teste[:-1]
+        melhores = []  # Heap de máximo com tuplas (-distância, -índice)
+        limite = math.inf
+        for indice, instancia_treino in enumerate(self.dados_treino):
+            if instancia_treino is None:
+                continue
+            self.linhas_percorridas += 1
+            distancia = distancia_limitada(consulta, instancia_treino, limite)
+            if distancia is None:
+                continue
+            if len(melhores) < self.k:
+                heapq.heappush(melhores, (-distancia, -indice))
+            else:
+                heapq.heapreplace(melhores, (-distancia, -indice))
+            if len(melhores) == self.k:
+                limite = -melhores[0][0]
+        return [self.dados_treino[j] for _, j in sorted((-d, -j) for d, j in melhores)]
+    
     def obter_vizinhos(self, instancia_teste):
         """
         Encontra os k vizinhos mais próximos de uma instância de teste.
         
+        Em caso de empate vence a amostra de treino de menor índice. Na
+        representação 'categorica' as distâncias são inteiras e limitadas, e
+        os vizinhos são selecionados por contagem; nas demais, por um heap
+        limitado a k elementos, sem ordenar todas as distâncias. Amostras
+        removidas (ver remover_amostras) são ignoradas. Com parada_antecipada,
+        a varredura é feita por obter_vizinhos_parada_antecipada.
+        
         Args:
             instancia_teste: Lista com as características da instância a classificar
             
         Returns:
             list: Lista com os k vizinhos mais próximos
         """
-        distancias = []
-        for instancia_treino in self.dados_treino:
-            # Calcula distância apenas com as características (exclui o rótulo)
-            dist = self.distancia_euclidiana(instancia_teste[:-1], instancia_treino[:-1])
-            distancias.append((instancia_treino, dist))
+        if self.estrutura is not None:
+            consulta = self.converter_consultas([instancia_teste])[0]
+            return [self.dados_treino[j] for _, j in self._buscar_estrutura(consulta, self.k)]
         
-        # Ordena por distância (menor para maior)
-        distancias.sort(key=lambda x: x[1])
+        if self.parada_antecipada:
+            return self.obter_vizinhos_parada_antecipada(instancia_teste)
         
-        # Retorna os k vizinhos mais próximos
-        vizinhos = []
-        for i in range(self.k):
-            vizinhos.append(distancias[i][0])
-        return vizinhos
+        if self.representacao == 'categorica':
+            vivas = [instancia_treino for instancia_treino in self.dados_treino if instancia_treino is not None]
+            # Divergências vão de 0 ao número de características (exclui o rótulo)
+            divergencias = [self.contar_divergencias(instancia_teste[:-1], instancia_treino[:-1])
+                            for instancia_treino in vivas]
+            indices = selecionar_vizinhos_contagem(divergencias, self.k, len(instancia_teste) - 1)
+            return [vivas[j] for j in indices]
+        
+        # Tuplas (distância, índice): o índice desempata no heap
+        distancias = (
+            (self.distancia_euclidiana(instancia_teste[:-1], instancia_treino[:-1]), indice)
+            for indice, instancia_treino in enumerate(self.dados_treino)
+            if instancia_treino is not None
+        )
+        return [self.dados_treino[j] for _, j in heapq.nsmallest(self.k, distancias)]
     
     def predizer_classificacao(self, vizinhos):
         """
@@ -75,13 +990,43 @@ class KNNClassificadorCogumelos:
         Returns:
             str: Classe predita (mais votada entre os vizinhos)
         """
+        # Último elemento de cada vizinho é o rótulo da classe
+        return self.votar(vizinho[-1] for vizinho in vizinhos)
+    
+    def votar(self, rotulos):
+        """
+        Escolhe a classe mais votada entre os rótulos dos vizinhos.
+        
+        Em caso de empate vence a classe que aparece primeiro na lista, ou
+        seja, a do vizinho mais próximo entre as empatadas.
+        
+        Args:
+            rotulos: Rótulos dos vizinhos, do mais próximo ao mais distante
+            
+        Returns:
+            str: Classe mais votada
+        """
+        return self.votar_ponderado((rotulo, 1) for rotulo in rotulos)
+    
+    def votar_ponderado(self, rotulos_pesos):
+        """
+        Escolhe a classe com a maior soma de pesos entre os vizinhos.
+        
+        Equivale a votar com cada rótulo repetido pelo seu peso: em caso de
+        empate vence a classe que aparece primeiro.
+        
+        Args:
+            rotulos_pesos: Tuplas (rotulo, peso), na ordem dos vizinhos
+            
+        Returns:
+            str: Classe mais votada
+        """
         votos_classe = {}
-        for vizinho in vizinhos:
-            rotulo = vizinho[-1]  # Último elemento é o rótulo da classe
+        for rotulo, peso in rotulos_pesos:
             if rotulo in votos_classe:
-                votos_classe[rotulo] += 1
+                votos_classe[rotulo] += peso
             else:
-                votos_classe[rotulo] = 1
+                votos_classe[rotulo] = peso
         
         # Ordena por número de votos (maior para menor)
         votos_ordenados = sorted(votos_classe.items(), key=lambda x: x[1], reverse=True)
@@ -91,6 +1036,10 @@ class KNNClassificadorCogumelos:
         """
         Aplica codificação one-hot para variáveis categóricas.
         
+        Ajusta o mapeamento ao dataset (construir_mapeamento) e o codifica
+        (transformar_one_hot). Para codificar dados novos com um mapeamento
+        já ajustado, use apenas transformar_one_hot.
+        
         Args:
             dataset: Dataset com variáveis categóricas
             cabecalho: Lista com nomes das colunas
@@ -98,7 +1047,43 @@ class KNNClassificadorCogumelos:
         Returns:
             list: Dataset codificado com one-hot encoding
         """
+        self.construir_mapeamento(dataset, cabecalho)
+        return self.transformar_one_hot(dataset)
+    
+    def transformar_one_hot(self, dataset):
+        """
+        Codifica um dataset com o mapeamento já ajustado, sem alterá-lo.
+        
+        Valores ausentes do mapeamento seguem politica_desconhecidos.
+        
+        Args:
+            dataset: Dataset com variáveis categóricas (rótulo na última posição)
+            
+        Returns:
+            list: Dataset codificado com one-hot encoding
+        """
+        if not self.mapeamento_codificacao:
+            raise ValueError("O mapeamento de codificação não foi ajustado (ver construir_mapeamento)")
+        
+        # Aplica a codificação one-hot (cada valor único vira uma coluna binária)
         dataset_codificado = []
+        for linha in dataset:
+            dataset_codificado.append(self.codificar_linha_one_hot(linha))
+        
+        return dataset_codificado
+    
+    def construir_mapeamento(self, dataset, cabecalho):
+        """
+        Constrói o mapeamento de cada valor categórico para um código inteiro.
+        
+        Os códigos seguem a ordem alfabética dos valores de cada característica.
+        É o passo de ajuste de codificar_one_hot e basta, sozinho, para a
+        representação 'categorica', que dispensa a codificação one-hot.
+        
+        Args:
+            dataset: Dataset com variáveis categóricas
+            cabecalho: Lista com nomes das colunas
+        """
         todos_valores = {}  # Armazena todos os valores únicos para cada característica
         
         # Coleta todos os valores únicos para cada característica (exceto a coluna alvo)
@@ -107,6 +1092,12 @@ class KNNClassificadorCogumelos:
             for linha in dataset:
                 todos_valores[nome_caracteristica].add(linha[i])
         
+        if self.representacao == 'categorica':
+            for nome_caracteristica, valores in todos_valores.items():
+                if len(valores) > MAXIMO_VALORES_CATEGORICOS:
+                    raise ValueError(f"'{nome_caracteristica}' tem {len(valores)} valores, mais do que "
+                                     f"os {MAXIMO_VALORES_CATEGORICOS} códigos da representação 'categorica'")
+        
         # Cria um mapeamento para cada valor único para um inteiro
         self.mapeamento_codificacao = {}
         for nome_caracteristica, valores in todos_valores.items():
@@ -114,115 +1105,1286 @@ class KNNClassificadorCogumelos:
                 valor: idx for idx, valor in enumerate(sorted(list(valores)))
             }
         
-        # Aplica a codificação one-hot (cada valor único vira uma coluna binária)
-        for linha in dataset:
-            linha_codificada = []
-            for i, nome_caracteristica in enumerate(cabecalho[:-1]):
-                # Codifica one-hot para cada característica categórica
-                vetor_one_hot = [0] * len(todos_valores[nome_caracteristica])
-                vetor_one_hot[self.mapeamento_codificacao[nome_caracteristica][linha[i]]] = 1
-                linha_codificada.extend(vetor_one_hot)
-            linha_codificada.append(linha[-1])  # Adiciona o rótulo alvo
-            dataset_codificado.append(linha_codificada)
+        self.cabecalho_processado = list(cabecalho)
+    
+    def codificar_linha_one_hot(self, linha):
+        """
+        Codifica uma linha com o mapeamento já construído por codificar_one_hot.
         
-        return dataset_codificado
+        Um valor ausente do mapeamento gera um bloco zerado para a sua
+        característica (a mesma distância para todas as amostras de treino)
+        ou, com politica_desconhecidos='erro', ValueError.
+        
+        Args:
+            linha: Lista com os valores categóricos e o rótulo na última posição
+            
+        Returns:
+            list: Linha codificada, com o rótulo na última posição
+        """
+        linha_codificada = []
+        for i, nome_caracteristica in enumerate(self.cabecalho_processado[:-1]):
+            # Codifica one-hot para cada característica categórica
+            mapeamento = self.mapeamento_codificacao[nome_caracteristica]
+            vetor_one_hot = [0] * len(mapeamento)
+            codigo = self._codigo_valor(nome_caracteristica, linha[i])
+            if codigo != CODIGO_DESCONHECIDO:
+                vetor_one_hot[codigo] = 1
+            linha_codificada.extend(vetor_one_hot)
+        linha_codificada.append(linha[-1])  # Adiciona o rótulo alvo
+        return linha_codificada
+    
+    def codificar_linha_categorica(self, linha):
+        """
+        Converte os valores de uma linha nos códigos do mapeamento já construído.
+        
+        Valores ausentes do mapeamento recebem CODIGO_DESCONHECIDO ou, com
+        politica_desconhecidos='erro', geram ValueError.
+        
+        Args:
+            linha: Lista com os valores categóricos (o rótulo na última posição é ignorado)
+            
+        Returns:
+            list: Código de cada característica
+        """
+        codigos = []
+        for i, nome_caracteristica in enumerate(self.cabecalho_processado[:-1]):
+            codigos.append(self._codigo_valor(nome_caracteristica, linha[i]))
+        return codigos
+    
+    def _codigo_valor(self, nome_caracteristica, valor):
+        """Código do valor no mapeamento, aplicando politica_desconhecidos."""
+        codigo = self.mapeamento_codificacao[nome_caracteristica].get(valor)
+        if codigo is not None:
+            return codigo
+        if self.politica_desconhecidos == 'erro':
+            raise ValueError(f"Valor desconhecido '{valor}' na característica '{nome_caracteristica}'")
+        return CODIGO_DESCONHECIDO
+    
+    def codificar_one_hot_blocos(self, blocos):
+        """
+        Aplica a codificação one-hot a um fluxo de blocos, um bloco por vez.
+        
+        Usa o mapeamento já construído por codificar_one_hot (ou
+        codificar_one_hot_codigos); valores fora dele seguem politica_desconhecidos.
+        
+        Args:
+            blocos: Iterável de blocos de amostras processadas
+            
+        Yields:
+            list: Blocos codificados
+        """
+        for bloco in blocos:
+            yield [self.codificar_linha_one_hot(linha) for linha in bloco]
+    
+    def codificar_one_hot_codigos(self, codigos, cabecalho, vocabularios):
+        """
+        Aplica a codificação one-hot a uma matriz de códigos categóricos.
+        
+        Equivale a codificar_one_hot quando os códigos seguem a ordem dos
+        vocabulários ordenados (como os do cache binário), mas é vetorizada
+        e produz uma matriz uint8 pronta para treinar_matriz.
+        
+        Args:
+            codigos: np.ndarray (amostras x características) com o código de cada valor
+            cabecalho: Lista com nomes das colunas (alvo na última posição)
+            vocabularios: Lista com os valores ordenados de cada característica
+            
+        Returns:
+            np.ndarray: Matriz one-hot (amostras x soma dos tamanhos dos vocabulários)
+        """
+        self.definir_mapeamento(cabecalho, vocabularios)
+        return self._one_hot_de_codigos(codigos)
+    
+    def definir_mapeamento(self, cabecalho, vocabularios):
+        """
+        Define o mapeamento de codificação a partir de vocabulários já conhecidos.
+        
+        Args:
+            cabecalho: Lista com nomes das colunas (alvo na última posição)
+            vocabularios: Lista com os valores de cada característica, na ordem dos códigos
+        """
+        self.mapeamento_codificacao = {
+            nome_caracteristica: {valor: idx for idx, valor in enumerate(valores)}
+            for nome_caracteristica, valores in zip(cabecalho[:-1], vocabularios)
+        }
+        self.cabecalho_processado = list(cabecalho)
+    
+    def _one_hot_de_codigos(self, codigos):
+        """Matriz one-hot uint8 de uma matriz de códigos, com o mapeamento atual."""
+        tamanhos = [len(mapeamento) for mapeamento in self.mapeamento_codificacao.values()]
+        inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1])).astype(np.intp)
+        matriz = np.zeros((len(codigos), sum(tamanhos)), dtype=np.uint8)
+        matriz[np.arange(len(codigos))[:, np.newaxis], codigos + inicios] = 1
+        return matriz
+    
+    def codificar_arquivo(self, nome_arquivo, nome_saida=None, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        """
+        Codifica um CSV de cogumelos em duas passagens, sem carregá-lo inteiro.
+        
+        A primeira passagem, em blocos, conta as amostras e reúne os
+        vocabulários e as classes, ajustando o mapeamento (como
+        construir_mapeamento). A segunda codifica cada bloco na representação
+        do classificador ('one_hot' em uint8, 'bits' empacotada ou
+        'categorica') e o grava diretamente em uma matriz pré-alocada: em
+        memória ou, com nome_saida, em um arquivo no formato binário de cache,
+        preenchido por mapeamento em memória. Fora a matriz de saída, a
+        memória usada depende apenas do tamanho do bloco e dos vocabulários.
+        
+        Args:
+            nome_arquivo (str): Caminho para o arquivo CSV
+            nome_saida (str): Arquivo onde gravar a matriz codificada (None = em memória)
+            tamanho_bloco (int): Número máximo de amostras por bloco
+            
+        Returns:
+            tuple: (matriz, rotulos, classes) prontos para treinar_matriz (com
+                rotulos como índices em classes) ou (None, None, None) em caso de erro
+        """
+        try:
+            # Primeira passagem: vocabulários, classes e número de amostras
+            blocos = ler_dataset_cogumelos_em_blocos(nome_arquivo, tamanho_bloco)
+            cabecalho = next(blocos, None)
+            if cabecalho is None:
+                print("Erro: Nenhum dado foi carregado do arquivo!")
+                return None, None, None
+            cabecalho_processado = _processar_cabecalho_cogumelos(cabecalho)
+            valores = [set() for _ in cabecalho_processado[:-1]]
+            classes = set()
+            num_amostras = 0
+            for bloco in processar_blocos_cogumelos(blocos, cabecalho):
+                for linha in bloco:
+                    for conjunto, valor in zip(valores, linha):
+                        conjunto.add(valor)
+                    classes.add(linha[-1])
+                num_amostras += len(bloco)
+        except FileNotFoundError:
+            print(f"Erro: Arquivo '{nome_arquivo}' não encontrado!")
+            return None, None, None
+        
+        vocabularios = [sorted(conjunto) for conjunto in valores]
+        for nome_caracteristica, vocabulario in zip(cabecalho_processado, vocabularios):
+            if len(vocabulario) > MAXIMO_VALORES_CATEGORICOS:
+                print(f"Erro: '{nome_caracteristica}' tem {len(vocabulario)} valores, mais do que cabe em "
+                      f"uint8 (o código {CODIGO_DESCONHECIDO} é reservado para valores desconhecidos)")
+                return None, None, None
+        classes = sorted(classes)
+        self.definir_mapeamento(cabecalho_processado, vocabularios)
+        
+        num_colunas = sum(len(vocabulario) for vocabulario in vocabularios)
+        if self.representacao == 'categorica':
+            forma, tipo = (num_amostras, len(vocabularios)), np.uint8
+        elif self.representacao == 'bits':
+            forma, tipo = (num_amostras, -(-num_colunas // 64)), np.uint64
+        else:
+            forma, tipo = (num_amostras, num_colunas), np.uint8
+        especificacoes = {'matriz': (tipo, forma), 'rotulos': (np.uint8, (num_amostras,))}
+        
+        temporario = None
+        if nome_saida is None:
+            arrays = {nome: np.empty(forma_array, dtype=tipo_array)
+                      for nome, (tipo_array, forma_array) in especificacoes.items()}
+        else:
+            metadados = {'cabecalho': cabecalho_processado, 'vocabularios': vocabularios,
+                         'classes': classes, 'representacao': self.representacao}
+            temporario, arrays = reservar_cache(nome_saida, nome_arquivo, metadados, especificacoes)
+        
+        # Segunda passagem: codifica cada bloco direto na sua faixa da matriz
+        codigo_classe = {classe: i for i, classe in enumerate(classes)}
+        mapeamentos = list(self.mapeamento_codificacao.values())
+        posicao = 0
+        blocos = ler_dataset_cogumelos_em_blocos(nome_arquivo, tamanho_bloco, avisos=False)
+        next(blocos, None)
+        for bloco in processar_blocos_cogumelos(blocos, cabecalho):
+            fim = posicao + len(bloco)
+            if fim > num_amostras:
+                break
+            codigos = np.array([[mapeamento.get(valor, CODIGO_DESCONHECIDO)
+                                 for mapeamento, valor in zip(mapeamentos, linha)] for linha in bloco],
+                               dtype=np.uint8).reshape(len(bloco), len(mapeamentos))
+            rotulos = [codigo_classe.get(linha[-1]) for linha in bloco]
+            if (codigos == CODIGO_DESCONHECIDO).any() or None in rotulos:
+                break
+            if self.representacao == 'categorica':
+                arrays['matriz'][posicao:fim] = codigos
+            elif self.representacao == 'bits':
+                arrays['matriz'][posicao:fim] = empacotar_bits(self._one_hot_de_codigos(codigos))
+            else:
+                arrays['matriz'][posicao:fim] = self._one_hot_de_codigos(codigos)
+            arrays['rotulos'][posicao:fim] = rotulos
+            posicao = fim
+        
+        if posicao != num_amostras:
+            print(f"Erro: o arquivo '{nome_arquivo}' mudou entre as duas passagens")
+            if temporario is not None:
+                del arrays
+                os.remove(temporario)
+            return None, None, None
+        
+        if temporario is not None:
+            concluir_cache(temporario, nome_saida, arrays)
+            _, arrays = ler_cache(nome_saida)
+            print(f"Matriz codificada gravada em '{nome_saida}'")
+        print(f"Codificadas {num_amostras} amostras em duas passagens")
+        return arrays['matriz'], arrays['rotulos'], classes
     
     def treinar(self, dados_treino):
         """
         Treina o classificador com os dados de treino.
         
-        Args:
-            dados_treino: Lista com os dados de treinamento codificados
-        """
-        self.dados_treino = dados_treino
+        Args:
+            dados_treino: Lista com os dados de treinamento codificados
+        """
+        # Guarda as características em um único array contíguo para a busca em lote
+        self.treinar_matriz(
+            self.converter_consultas(dados_treino),
+            [instancia[-1] for instancia in dados_treino],
+        )
+        # Cópia da lista: adicionar_amostras e remover_amostras a modificam
+        self.dados_treino = list(dados_treino)
+        self.ordem_caracteristicas = None
+    
+    def treinar_matriz(self, matriz, rotulos):
+        """
+        Treina o classificador diretamente com arrays de características e rótulos.
+        
+        A matriz (já codificada em one-hot) é usada como recebida, sem cópia;
+        na representação 'bits' ela é empacotada, a menos que já seja uint64.
+        Na representação 'categorica' a matriz contém os códigos de cada
+        característica (como a de carregar_dataset_cogumelos_binario). Com
+        colapsar_duplicatas, matriz_treino passa a conter só os protótipos
+        únicos, e rotulos_treino continua com o rótulo de cada amostra.
+        Como não há linhas originais, obter_vizinhos não está disponível nesse
+        modo e predizer usa a busca em lote.
+        
+        Args:
+            matriz: np.ndarray (amostras x características codificadas)
+            rotulos: Sequência com o rótulo de cada amostra
+        """
+        self.dados_treino = []
+        if self.representacao == 'bits' and matriz.dtype != np.uint64:
+            matriz = empacotar_bits(matriz)
+        if self.cache is not None:
+            # Predições anteriores podem não valer para o novo conjunto de treino
+            self.cache.limpar()
+        self.proximo_id = len(rotulos)
+        self._definir_treino(matriz, rotulos, np.arange(len(rotulos)))
+    
+    def _definir_treino(self, matriz, rotulos, ids):
+        """
+        Substitui o armazenamento de treino, refazendo protótipos e índice de busca.
+        """
+        self.prototipos = None
+        if self.colapsar_duplicatas:
+            self.prototipos = PrototiposTreino(matriz, rotulos)
+            matriz = self.prototipos.matriz
+        self.matriz_treino = matriz
+        self.buffer_treino = None  # A matriz recebida só é copiada na primeira inserção
+        self.rotulos_treino = rotulos
+        self.ids_treino = ids
+        self.removidas = np.zeros(len(ids), dtype=bool)
+        self.num_removidas = 0
+        self._construir_indice()
+    
+    def _construir_indice(self):
+        """
+        Constrói o índice de busca sobre todas as linhas atuais da matriz de treino.
+        """
+        self.estrutura = None
+        if self.indice is not None:
+            self.estrutura = INDICES_VIZINHOS[self.indice](self.matriz_treino, **self.parametros_indice)
+        self.tamanho_indexado = len(self.matriz_treino)
+        self.removidas_indexadas = self.num_removidas
+    
+    def num_amostras_treino(self):
+        """
+        Returns:
+            int: Número de amostras de treino, sem contar as removidas
+        """
+        return len(self.rotulos_treino) - self.num_removidas
+    
+    def adicionar_amostras(self, amostras, rotulos=None):
+        """
+        Adiciona amostras ao conjunto de treino sem treinar de novo.
+        
+        As linhas são acrescentadas ao fim do armazenamento de treino, cuja
+        capacidade dobra quando se esgota (O(1) amortizado por amostra); a
+        matriz recebida em treinar_matriz só é copiada na primeira inserção.
+        O índice de busca não é refeito a cada inserção: as amostras novas são
+        varridas linearmente junto com ele até passarem de
+        FRACAO_RECONSTRUCAO_INDICE das indexadas. Do cache saem só as
+        predições que as amostras novas podem mudar. Com colapsar_duplicatas,
+        cada amostra é somada ao protótipo da sua linha ou cria um novo (ver
+        PrototiposTreino.adicionar), sem refazer os demais. O mapeamento de
+        codificação não muda: valores novos seguem politica_desconhecidos.
+        
+        Args:
+            amostras: Lista de instâncias no formato de treinar (rótulo na
+                última posição) ou, com rotulos, matriz de características no
+                formato de treinar_matriz
+            rotulos: Sequência com o rótulo de cada linha da matriz
+            
+        Returns:
+            list: Identificadores das amostras, usados em remover_amostras
+        """
+        if self.matriz_treino is None:
+            if rotulos is None:
+                self.treinar(amostras)
+            else:
+                self.treinar_matriz(amostras, rotulos)
+            return self.ids_treino.tolist()
+        if len(amostras) == 0:
+            return []
+        
+        linhas = self.converter_consultas(amostras)
+        if rotulos is None:
+            rotulos = [instancia[-1] for instancia in amostras]
+            if len(self.dados_treino) == len(self.rotulos_treino):
+                self.dados_treino.extend(amostras)
+        else:
+            # Sem as linhas originais, o classificador passa ao modo de treinar_matriz
+            self.dados_treino = []
+        ids = np.arange(self.proximo_id, self.proximo_id + len(linhas))
+        self.proximo_id += len(linhas)
+        self._atualizar_cache(linhas, removidas=False)
+        
+        inicio = len(self.rotulos_treino)
+        fim = inicio + len(linhas)
+        self._reservar(fim)
+        self.ids_treino[inicio:fim] = ids
+        self.removidas[inicio:fim] = False
+        if self.prototipos is not None:
+            self.prototipos.adicionar(linhas, rotulos)
+            self.matriz_treino = self.prototipos.matriz
+        else:
+            self.buffer_treino[inicio:fim] = linhas
+            self.matriz_treino = self.buffer_treino[:fim]
+        if not isinstance(self.rotulos_treino, list):
+            self.rotulos_treino = list(self.rotulos_treino)
+        self.rotulos_treino.extend(rotulos)
+        
+        if (self.estrutura is not None
+                and fim - self.tamanho_indexado > FRACAO_RECONSTRUCAO_INDICE * self.tamanho_indexado):
+            self._construir_indice()
+        return ids.tolist()
+    
+    def _reservar(self, total):
+        """
+        Garante espaço para total amostras no armazenamento, dobrando a
+        capacidade. Com protótipos, a matriz cresce em PrototiposTreino.
+        """
+        if (self.buffer_treino is not None or self.prototipos is not None) and total <= len(self.ids_treino):
+            return
+        usados = len(self.rotulos_treino)
+        capacidade = max(total, 2 * usados, 16)
+        if self.prototipos is None:
+            self.buffer_treino = realocar(self.matriz_treino, usados, capacidade)
+            self.matriz_treino = self.buffer_treino[:usados]
+        self.ids_treino = realocar(self.ids_treino, usados, capacidade)
+        self.removidas = realocar(self.removidas, usados, capacidade)
+    
+    def remover_amostras(self, ids):
+        """
+        Remove amostras do conjunto de treino sem treinar de novo.
+        
+        As amostras são apenas marcadas como removidas (O(1) por amostra) e
+        passam a ser ignoradas pelas buscas; quando as marcadas passam de
+        FRACAO_COMPACTACAO do armazenamento, compactar as descarta de uma vez,
+        o que mantém o custo amortizado constante. Do cache saem só as
+        predições de que as amostras removidas podem ter participado. Com
+        colapsar_duplicatas, as amostras são descontadas dos seus protótipos
+        (ver PrototiposTreino.remover), que só são refeitos ao compactar.
+        
+        Args:
+            ids: Identificadores devolvidos por adicionar_amostras (as amostras
+                de treinar recebem 0, 1, 2, ... na ordem do treino)
+        """
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        total = len(self.rotulos_treino)
+        # Os identificadores crescem com a posição no armazenamento
+        posicoes = np.searchsorted(self.ids_treino[:total], ids)
+        encontradas = posicoes < total
+        encontradas[encontradas] = self.ids_treino[posicoes[encontradas]] == ids[encontradas]
+        encontradas[encontradas] = ~self.removidas[posicoes[encontradas]]
+        if not encontradas.all():
+            raise ValueError(f"Amostras inexistentes ou já removidas: {ids[~encontradas].tolist()}")
+        
+        self._atualizar_cache(self._linhas_treino(posicoes), removidas=True)
+        self.removidas[posicoes] = True
+        self.num_removidas += len(posicoes)
+        self.removidas_indexadas += int((posicoes < self.tamanho_indexado).sum())
+        if self.prototipos is not None:
+            self.prototipos.remover(posicoes)
+        if self.dados_treino:
+            for posicao in posicoes.tolist():
+                self.dados_treino[posicao] = None
+        if self.num_removidas > FRACAO_COMPACTACAO * total:
+            self.compactar()
+    
+    def compactar(self):
+        """
+        Descarta do armazenamento as amostras marcadas como removidas.
+        
+        A ordem das amostras restantes é preservada, então o desempate pelo
+        menor índice continua o mesmo de um treino só com elas; o índice de
+        busca é refeito já incluindo as amostras adicionadas.
+        """
+        total = len(self.rotulos_treino)
+        manter = ~self.removidas[:total]
+        self.dados_treino = [instancia for instancia in self.dados_treino if instancia is not None]
+        self._definir_treino(self._linhas_treino(np.flatnonzero(manter)),
+                             [rotulo for rotulo, mantido in zip(self.rotulos_treino, manter.tolist()) if mantido],
+                             self.ids_treino[:total][manter])
+    
+    def _linhas_treino(self, posicoes):
+        """
+        Linhas de treino das amostras nas posições informadas (expandindo os protótipos).
+        """
+        if self.prototipos is not None:
+            return self.prototipos.matriz[self.prototipos.prototipo_da_amostra[posicoes]]
+        return self.matriz_treino[posicoes]
+    
+    def _atualizar_cache(self, linhas, removidas):
+        """
+        Descarta do cache as predições que a inserção ou a remoção das linhas pode mudar.
+        
+        Uma amostra nova só muda a predição de uma consulta se ficar
+        estritamente mais perto que o k-ésimo vizinho guardado (no empate vence
+        a amostra mais antiga); uma removida, se estava a essa distância ou menos.
+        """
+        if self.cache is None or not self.cache.entradas or not len(linhas):
+            return
+        linhas = self.converter_consultas(linhas)
+        chaves = list(self.cache.entradas)
+        consultas = np.frombuffer(b''.join(chaves), dtype=linhas.dtype).reshape(len(chaves), -1)
+        raios = np.array([self.cache.raios[chave] for chave in chaves], dtype=np.float64)
+        
+        mais_proximas = np.empty(len(chaves), dtype=np.float64)
+        tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, linhas.size))
+        for inicio in range(0, len(chaves), tamanho_bloco):
+            distancias = self.calcular_distancias(consultas[inicio:inicio + tamanho_bloco], linhas)
+            mais_proximas[inicio:inicio + len(distancias)] = distancias.min(axis=1)
+        afetadas = mais_proximas <= raios if removidas else mais_proximas < raios
+        self.cache.descartar([chave for chave, afetada in zip(chaves, afetadas.tolist()) if afetada])
+    
+    def predizer(self, instancia_teste):
+        """
+        Faz a predição para uma instância de teste.
+        
+        Args:
+            instancia_teste: Instância a ser classificada
+            
+        Returns:
+            str: Classe predita
+        """
+        if self.cache is not None:
+            # A busca em lote fornece o raio que o cache guarda com a predição
+            return self._predizer_lote_com_cache(self.converter_consultas([instancia_teste]))[0]
+        
+        if not self.dados_treino or self.prototipos is not None:
+            # Treinado com treinar_matriz (não há linhas para devolver como
+            # vizinhos) ou com protótipos, cujas distâncias são calculadas uma vez
+            return self.predizer_lote([instancia_teste])[0]
+        vizinhos = self.obter_vizinhos(instancia_teste)
+        return self.predizer_classificacao(vizinhos)
+    
+    def converter_consultas(self, matriz):
+        """
+        Converte instâncias codificadas para a representação da matriz de treino.
+        
+        Args:
+            matriz: Lista de instâncias codificadas (rótulo na última posição,
+                ignorado) ou np.ndarray contendo apenas as características; na
+                representação 'bits', um np.ndarray uint64 é considerado já
+                empacotado, e na 'categorica' as instâncias não são codificadas
+                e o np.ndarray contém os códigos
+            
+        Returns:
+            np.ndarray: Matriz (consultas x características) em float64; na
+            representação 'bits', (consultas x palavras) em uint64; na
+            'categorica', (consultas x características) em uint8
+        """
+        if self.representacao == 'categorica':
+            if isinstance(matriz, np.ndarray):
+                return np.ascontiguousarray(matriz, dtype=np.uint8)
+            if not self.mapeamento_codificacao:
+                raise ValueError("A representação 'categorica' requer o mapeamento (ver construir_mapeamento)")
+            return np.array([self.codificar_linha_categorica(instancia) for instancia in matriz],
+                            dtype=np.uint8).reshape(len(matriz), len(self.cabecalho_processado) - 1)
+        if self.representacao == 'bits':
+            if isinstance(matriz, np.ndarray):
+                return matriz if matriz.dtype == np.uint64 else empacotar_bits(matriz)
+            return empacotar_bits(np.array([instancia[:-1] for instancia in matriz], dtype=np.uint8))
+        if isinstance(matriz, np.ndarray):
+            return np.ascontiguousarray(matriz, dtype=np.float64)
+        return np.array([instancia[:-1] for instancia in matriz], dtype=np.float64)
+    
+    def calcular_distancias(self, consultas, referencias):
+        """
+        Calcula as distâncias entre cada consulta e cada referência.
+        
+        Na representação 'bits' devolve a distância de Hamming (XOR seguido de
+        contagem de bits), que é o quadrado da distância euclidiana entre os
+        vetores one-hot; na 'categorica', o número de características
+        divergentes, que é metade desse quadrado. Nos dois casos a ordem dos
+        vizinhos, inclusive os empates, é a mesma da distância euclidiana.
+        
+        Args:
+            consultas: np.ndarray já convertido (ver converter_consultas)
+            referencias: np.ndarray na mesma representação
+            
+        Returns:
+            np.ndarray: Distâncias (consultas x referências)
+        """
+        if self.representacao == 'bits':
+            diferentes = consultas[:, np.newaxis, :] ^ referencias[np.newaxis, :, :]
+            return contar_bits(diferentes).sum(axis=2, dtype=np.intp)
+        if self.representacao == 'categorica':
+            return (consultas[:, np.newaxis, :] != referencias[np.newaxis, :, :]).sum(axis=2, dtype=np.intp)
+        diferencas = consultas[:, np.newaxis, :] - referencias[np.newaxis, :, :]
+        return np.sqrt((diferencas ** 2).sum(axis=2))
+    
+    def obter_indices_vizinhos_lote(self, matriz, k=None):
+        """
+        Encontra os índices dos k vizinhos mais próximos de várias consultas.
+        
+        Sem índice, as distâncias são calculadas em blocos de consultas, de forma
+        vetorizada. A ordenação é estável, então empates (muito comuns com
+        one-hot) são resolvidos pelo menor índice de treino, exatamente como em
+        obter_vizinhos. Com índice, cada consulta é respondida pela estrutura
+        de busca, que segue o mesmo critério entre os candidatos. Amostras
+        removidas (ver remover_amostras) nunca são devolvidas.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            k (int): Número de vizinhos (padrão: self.k)
+            
+        Returns:
+            np.ndarray: Índices dos vizinhos (consultas x k), do mais próximo ao mais distante
+        """
+        if k is None:
+            k = self.k
+        consultas = self.converter_consultas(matriz)
+        if self.estrutura is not None:
+            indices = np.empty((len(consultas), min(k, self.num_amostras_treino())), dtype=np.intp)
+            for i, consulta in enumerate(consultas):
+                indices[i] = [j for _, j in self._buscar_estrutura(consulta, k)]
+            return indices
+        if self.prototipos is not None:
+            k = min(k, self.num_amostras_treino())
+            indices = np.empty((len(consultas), k), dtype=np.intp)
+            for i, (distancias, ordem) in enumerate(self._percorrer_prototipos(consultas, k)):
+                indices[i] = self.prototipos.obter_indices(distancias, ordem, k)
+            return indices
+        
+        return self._buscar_linear(consultas, k)
+    
+    def _buscar_estrutura(self, consulta, k):
+        """
+        Consulta o índice de busca, varrendo também as amostras adicionadas
+        depois da sua construção e descartando as removidas.
+        
+        Returns:
+            list: Tuplas (distancia, indice_treino), da mais próxima à mais distante
+        """
+        # Vizinhos extras compensam as amostras removidas que o índice ainda contém
+        vizinhos = [(distancia, j) for distancia, j in self.estrutura.buscar(consulta, k + self.removidas_indexadas)
+                    if not self.removidas[j]]
+        inicio = self.tamanho_indexado
+        if len(self.matriz_treino) > inicio:
+            distancias = self.calcular_distancias(consulta[np.newaxis], self.matriz_treino[inicio:])[0]
+            vizinhos.extend((distancia, inicio + j) for j, distancia in enumerate(distancias.tolist())
+                            if not self.removidas[inicio + j])
+            vizinhos.sort()
+        return vizinhos[:k]
+    
+    def _buscar_linear(self, consultas, k):
+        """
+        Varredura linear exata e vetorizada, em blocos de consultas.
+        
+        Returns:
+            np.ndarray: Índices dos vizinhos (consultas x k)
+        """
+        num_treino, num_colunas = self.matriz_treino.shape
+        k = min(k, num_treino - self.num_removidas)
+        indices = np.empty((len(consultas), k), dtype=np.intp)
+        removidas = np.flatnonzero(self.removidas[:num_treino]) if self.num_removidas else None
+        
+        tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_treino * num_colunas))
+        for inicio in range(0, len(consultas), tamanho_bloco):
+            bloco = consultas[inicio:inicio + tamanho_bloco]
+            distancias = self.calcular_distancias(bloco, self.matriz_treino)
+            if removidas is not None:
+                # Amostras removidas ficam mais distantes que todas as outras
+                distancias[:, removidas] = np.inf if distancias.dtype.kind == 'f' else distancias.max() + 1
+            indices[inicio:inicio + len(bloco)] = selecionar_vizinhos(distancias, k)
+        return indices
+    
+    def _percorrer_prototipos(self, consultas, k):
+        """
+        Calcula, em blocos, as distâncias de cada consulta aos protótipos.
+        
+        Protótipos sem amostras (todas removidas) ficam mais distantes que
+        todos os outros.
+        
+        Yields:
+            tuple: (distancias, ordem) de cada consulta - distâncias a todos os
+            protótipos e os k primeiros protótipos por (distância, índice)
+        """
+        num_prototipos, num_colunas = self.matriz_treino.shape
+        vazios = np.flatnonzero(self.prototipos.tamanhos == 0)
+        tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_prototipos * num_colunas))
+        for inicio in range(0, len(consultas), tamanho_bloco):
+            distancias = self.calcular_distancias(consultas[inicio:inicio + tamanho_bloco], self.matriz_treino)
+            if len(vazios):
+                distancias[:, vazios] = np.inf if distancias.dtype.kind == 'f' else distancias.max() + 1
+            yield from zip(distancias, selecionar_vizinhos(distancias, k))
+    
+    def medir_recall(self, matriz, k=None):
+        """
+        Mede a fração dos k vizinhos exatos que a busca configurada encontra.
+        
+        Serve para avaliar o modo aproximado (indice='lsh') comparando-o com a
+        varredura linear exata; sem índice o resultado é 1.0.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            k (int): Número de vizinhos (padrão: self.k)
+            
+        Returns:
+            float: Recall médio, de 0.0 a 1.0
+        """
+        if k is None:
+            k = self.k
+        consultas = self.converter_consultas(matriz)
+        encontrados = self.obter_indices_vizinhos_lote(consultas, k)
+        exatos = self._buscar_linear(consultas, k)
+        acertos = sum(len(set(a) & set(e)) for a, e in zip(encontrados.tolist(), exatos.tolist()))
+        return acertos / exatos.size if exatos.size else 1.0
+    
+    def predizer_lote(self, matriz):
+        """
+        Faz a predição para várias instâncias de uma só vez.
+        
+        Args:
+            matriz: Consultas (ver converter_consultas)
+            
+        Returns:
+            list: Classes preditas, na mesma ordem das consultas
+        """
+        if self.cache is not None:
+            return self._predizer_lote_com_cache(self.converter_consultas(matriz))
+        if self.prototipos is not None:
+            # Votos ponderados pelas contagens, sem expandir os protótipos em amostras
+            k = min(self.k, self.num_amostras_treino())
+            return [self.votar_ponderado(self.prototipos.obter_votos(distancias, ordem, k))
+                    for distancias, ordem in self._percorrer_prototipos(self.converter_consultas(matriz), k)]
+        
+        predicoes = []
+        for linha in self.obter_indices_vizinhos_lote(matriz):
+            predicoes.append(self.votar(self.rotulos_treino[j] for j in linha))
+        return predicoes
+    
+    def _predizer_lote_com_cache(self, consultas):
+        """
+        Predição em lote consultando o cache: só as consultas ausentes dele
+        (e sem repetição dentro do lote) passam pela busca de vizinhos.
+        """
+        predicoes = [None] * len(consultas)
+        pendentes = {}  # chave -> posições das consultas com essa chave
+        for i, consulta in enumerate(consultas):
+            chave = consulta.tobytes()
+            if chave in pendentes:
+                pendentes[chave].append(i)
+                continue
+            predicoes[i] = self.cache.obter(chave)
+            if predicoes[i] is None:
+                pendentes[chave] = [i]
+        
+        if pendentes:
+            posicoes = [lista[0] for lista in pendentes.values()]
+            indices = self.obter_indices_vizinhos_lote(consultas[posicoes])
+            for (chave, lista), linha in zip(pendentes.items(), indices):
+                predicao = self.votar(self.rotulos_treino[j] for j in linha)
+                raio = math.inf
+                if len(linha) == self.k:
+                    consulta = consultas[lista[0]][np.newaxis]
+                    raio = float(self.calcular_distancias(consulta, self._linhas_treino(linha[-1:]))[0, 0])
+                self.cache.guardar(chave, predicao, raio)
+                for i in lista:
+                    predicoes[i] = predicao
+        return predicoes
+    
+    def predizer_blocos(self, blocos):
+        """
+        Faz a predição de um fluxo de blocos de instâncias, um bloco por vez.
+        
+        Combinada com a leitura em blocos, permite classificar arquivos maiores
+        que a memória disponível.
+        
+        Args:
+            blocos: Iterável de blocos de consultas (ver converter_consultas)
+            
+        Yields:
+            list: Classes preditas de cada bloco
+        """
+        for bloco in blocos:
+            yield self.predizer_lote(bloco)
+
+
+def ler_dataset_cogumelos_em_blocos(nome_arquivo, tamanho_bloco=TAMANHO_BLOCO_LEITURA, avisos=True):
+    """
+    Lê o dataset de cogumelos de um arquivo CSV em blocos, sem carregá-lo inteiro.
+    
+    Cada linha passa pelas mesmas validações (com os mesmos avisos) de
+    carregar_dataset_cogumelos, então a memória usada depende apenas do
+    tamanho do bloco.
+    
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV
+        tamanho_bloco (int): Número máximo de amostras por bloco
+        avisos (bool): Se deve exibir o cabeçalho e as linhas descartadas
+            (desligado em releituras do mesmo arquivo)
+        
+    Yields:
+        list: Primeiro o cabeçalho; depois, blocos de amostras
+    """
+    with open(nome_arquivo, 'r') as arquivo:
+        leitor_csv = csv.reader(arquivo)
+        cabecalho = next(leitor_csv, None)  # Lê o cabeçalho
+        if cabecalho is None:
+            return
+        if avisos:
+            print(f"Cabeçalho encontrado: {cabecalho}")
+        yield cabecalho
+        
+        bloco = []
+        linha_num = 1
+        for linha in leitor_csv:
+            linha_num += 1
+            # Pula linhas vazias
+            if not linha or len(linha) == 0:
+                continue
+            
+            # Verifica se a linha tem o número correto de colunas
+            if len(linha) != len(cabecalho):
+                if avisos:
+                    print(f"Aviso: Linha {linha_num} tem número incorreto de colunas: {linha}")
+                continue
+            
+            # Remove espaços em branco
+            bloco.append([item.strip() for item in linha])
+            if len(bloco) == tamanho_bloco:
+                yield bloco
+                bloco = []
+        
+        if bloco:
+            yield bloco
+
+
+def carregar_dataset_cogumelos(nome_arquivo, usar_cache=False):
+    """
+    Carrega o dataset de cogumelos de um arquivo CSV.
+    
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV
+        usar_cache (bool): Se deve ler do cache binário mapeado em memória
+            (ver carregar_dataset_cogumelos_binario), que só é recompilado
+            quando o CSV muda; as linhas vêm já com a coluna alvo no final.
+            Se o cache não puder ser usado, o CSV é lido
+        
+    Returns:
+        tuple: (dataset, cabecalho) ou (None, None) em caso de erro
+    """
+    if usar_cache:
+        matriz, rotulos, classes, cabecalho, vocabularios = carregar_dataset_cogumelos_binario(nome_arquivo)
+        if matriz is not None:
+            # Decodifica por coluna: cada código vira o valor do vocabulário
+            colunas = [np.array(valores, dtype=object)[coluna]
+                       for valores, coluna in zip(vocabularios, np.asarray(matriz).T)]
+            colunas.append(np.array(classes, dtype=object)[np.asarray(rotulos)])
+            return [list(linha) for linha in zip(*colunas)], cabecalho
+        print("Cache binário indisponível, lendo o CSV")
+    
+    dataset = []
+    cabecalho = None
+    try:
+        blocos = ler_dataset_cogumelos_em_blocos(nome_arquivo)
+        cabecalho = next(blocos, None)
+        for bloco in blocos:
+            dataset.extend(bloco)
+    except FileNotFoundError:
+        print(f"Erro: Arquivo '{nome_arquivo}' não encontrado!")
+        return None, None
+    except Exception as e:
+        print(f"Erro ao carregar dataset: {e}")
+        return None, None
+    
+    if len(dataset) == 0:
+        print("Erro: Nenhum dado foi carregado do arquivo!")
+        return None, None
+    
+    print(f"Carregadas {len(dataset)} amostras do dataset")
+    return dataset, cabecalho
+
+
+def _coluna_alvo_no_final(cabecalho):
+    """
+    Indica se a última coluna do cabeçalho é a coluna alvo ('poisonous' ou similar).
+    """
+    return 'poisonous' in cabecalho[-1].lower() or cabecalho[-1].lower() in ['class', 'target', 'label']
+
+
+def processar_dataset_cogumelos(dataset, cabecalho):
+    """
+    Processa o dataset verificando se a coluna alvo já está na posição correta.
+    
+    Args:
+        dataset: Dataset original
+        cabecalho: Cabeçalho original
+        
+    Returns:
+        tuple: (dataset_processado, cabecalho_processado)
+    """
+    # Verifica se a última coluna é 'poisonous' ou similar
+    if _coluna_alvo_no_final(cabecalho):
+        # A coluna alvo já está no final, não precisa mover
+        print("Coluna alvo já está na posição correta (final)")
+        return dataset, cabecalho
+    else:
+        # Assume que a primeira coluna é o alvo, move para o final
+        print("Movendo coluna alvo da primeira para a última posição")
+        dataset_processado = []
+        for linha in dataset:
+            dataset_processado.append(linha[1:] + [linha[0]])
+        
+        cabecalho_processado = cabecalho[1:] + [cabecalho[0]]
+        return dataset_processado, cabecalho_processado
+
+
+def _processar_cabecalho_cogumelos(cabecalho):
+    """Cabeçalho com a coluna alvo na última posição, como em processar_dataset_cogumelos."""
+    if _coluna_alvo_no_final(cabecalho):
+        return list(cabecalho)
+    return cabecalho[1:] + [cabecalho[0]]
+
+
+def processar_blocos_cogumelos(blocos, cabecalho):
+    """
+    Aplica a mesma reorganização de processar_dataset_cogumelos a um fluxo de blocos.
+    
+    Args:
+        blocos: Iterável de blocos de amostras originais
+        cabecalho: Cabeçalho original
+        
+    Yields:
+        list: Blocos com a coluna alvo na última posição
+    """
+    if _coluna_alvo_no_final(cabecalho):
+        yield from blocos
+    else:
+        for bloco in blocos:
+            yield [linha[1:] + [linha[0]] for linha in bloco]
+
+
+def caminho_cache(nome_arquivo):
+    """
+    Retorna o caminho padrão do cache binário de um CSV (extensão .knncache).
+    """
+    return os.path.splitext(nome_arquivo)[0] + '.knncache'
+
+
+def _hash_arquivo(nome_arquivo):
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo, lendo-o em blocos.
+    """
+    sha = hashlib.sha256()
+    with open(nome_arquivo, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def _alinhar(posicao):
+    """
+    Arredonda uma posição do arquivo para o próximo múltiplo do alinhamento.
+    """
+    return -(-posicao // ALINHAMENTO_CACHE) * ALINHAMENTO_CACHE
+
+
+def escrever_cache(nome_cache, nome_origem, metadados, arrays):
+    """
+    Grava arrays no formato binário de cache, precedidos por um cabeçalho JSON.
+    
+    O arquivo é escrito em um temporário e renomeado ao final, então um cache
+    incompleto nunca é lido.
+    
+    Args:
+        nome_cache (str): Caminho do arquivo de cache
+        nome_origem (str): CSV de origem, registrado para verificar a validade
+            (None para arquivos sem origem, como os modelos salvos)
+        metadados (dict): Informações adicionais guardadas no cabeçalho
+        arrays (dict): Nome -> np.ndarray a gravar
+    """
+    especificacoes = {nome: (array.dtype, array.shape) for nome, array in arrays.items()}
+    cabecalho, texto, inicio = _montar_cabecalho_cache(nome_origem, metadados, especificacoes)
+    temporario = nome_cache + '.tmp'
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(ASSINATURA_CACHE)
+        arquivo.write(struct.pack('<I', len(texto)))
+        arquivo.write(texto)
+        for nome, array in arrays.items():
+            arquivo.seek(inicio + cabecalho['arrays'][nome]['deslocamento'])
+            np.ascontiguousarray(array).tofile(arquivo)
+    os.replace(temporario, nome_cache)
+
+
+def _montar_cabecalho_cache(nome_origem, metadados, especificacoes):
+    """
+    Monta o cabeçalho JSON de um cache, com a posição de cada array.
+    
+    Args:
+        nome_origem (str): CSV de origem (ou None)
+        metadados (dict): Informações adicionais guardadas no cabeçalho
+        especificacoes (dict): Nome -> (tipo, forma) de cada array
+        
+    Returns:
+        tuple: (cabecalho, texto, inicio) - o cabeçalho, sua codificação JSON
+        e a posição da área de dados no arquivo
+    """
+    cabecalho = dict(metadados)
+    cabecalho['versao'] = VERSAO_CACHE
+    if nome_origem is not None:
+        estado = os.stat(nome_origem)
+        cabecalho['origem'] = {
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'sha256': _hash_arquivo(nome_origem),
+        }
+    cabecalho['arrays'] = {}
+    deslocamento = 0
+    for nome, (tipo, forma) in especificacoes.items():
+        tipo = np.dtype(tipo)
+        cabecalho['arrays'][nome] = {
+            'tipo': tipo.str,
+            'forma': list(forma),
+            'deslocamento': deslocamento,
+        }
+        deslocamento = _alinhar(deslocamento + tipo.itemsize * math.prod(forma))
+    
+    texto = json.dumps(cabecalho).encode('utf-8')
+    inicio = _alinhar(len(ASSINATURA_CACHE) + 4 + len(texto))
+    return cabecalho, texto, inicio
+
+
+def reservar_cache(nome_cache, nome_origem, metadados, especificacoes):
+    """
+    Cria um cache com os arrays ainda por preencher, para gravação em fluxo.
+    
+    O arquivo é criado como temporário, já com o tamanho final, e os arrays
+    são devolvidos mapeados em memória para escrita. Depois de preenchidos,
+    concluir_cache grava as alterações e renomeia o arquivo.
+    
+    Args:
+        nome_cache (str): Caminho final do arquivo de cache
+        nome_origem (str): CSV de origem (ou None)
+        metadados (dict): Informações adicionais guardadas no cabeçalho
+        especificacoes (dict): Nome -> (tipo, forma) de cada array
+        
+    Returns:
+        tuple: (temporario, arrays) - caminho do temporário e np.memmap graváveis
+    """
+    cabecalho, texto, inicio = _montar_cabecalho_cache(nome_origem, metadados, especificacoes)
+    temporario = nome_cache + '.tmp'
+    tamanho = inicio + max((info['deslocamento'] + np.dtype(info['tipo']).itemsize * math.prod(info['forma'])
+                            for info in cabecalho['arrays'].values()), default=0)
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(ASSINATURA_CACHE)
+        arquivo.write(struct.pack('<I', len(texto)))
+        arquivo.write(texto)
+        arquivo.truncate(tamanho)
+    
+    arrays = {}
+    for nome, info in cabecalho['arrays'].items():
+        forma = tuple(info['forma'])
+        if 0 in forma:
+            arrays[nome] = np.empty(forma, dtype=info['tipo'])
+        else:
+            arrays[nome] = np.memmap(temporario, dtype=info['tipo'], mode='r+',
+                                     offset=inicio + info['deslocamento'], shape=forma)
+    return temporario, arrays
+
+
+def concluir_cache(temporario, nome_cache, arrays):
+    """
+    Grava os arrays preenchidos de reservar_cache e publica o cache.
+    
+    Args:
+        temporario (str): Caminho devolvido por reservar_cache
+        nome_cache (str): Caminho final do arquivo de cache
+        arrays (dict): Arrays devolvidos por reservar_cache
+    """
+    for array in arrays.values():
+        if isinstance(array, np.memmap):
+            array.flush()
+    arrays.clear()
+    os.replace(temporario, nome_cache)
+
+
+def _ler_cabecalho_cache(nome_cache):
+    """
+    Lê o cabeçalho JSON de um cache binário.
+    
+    Returns:
+        tuple: (cabecalho, inicio), onde inicio é a posição da área de dados
+        
+    Raises:
+        ValueError: Se o arquivo não for um cache desta versão do formato
+    """
+    with open(nome_cache, 'rb') as arquivo:
+        if arquivo.read(len(ASSINATURA_CACHE)) != ASSINATURA_CACHE:
+            raise ValueError(f"'{nome_cache}' não está no formato binário de cache")
+        (tamanho,) = struct.unpack('<I', arquivo.read(4))
+        cabecalho = json.loads(arquivo.read(tamanho).decode('utf-8'))
+    if cabecalho.get('versao') != VERSAO_CACHE:
+        raise ValueError(f"Versão do cache '{nome_cache}' não suportada: {cabecalho.get('versao')}")
+    return cabecalho, _alinhar(len(ASSINATURA_CACHE) + 4 + tamanho)
+
+
+def ler_cache(nome_cache):
+    """
+    Abre um cache binário, mapeando seus arrays em memória sem cópias.
+    
+    Args:
+        nome_cache (str): Caminho do arquivo de cache
+        
+    Returns:
+        tuple: (cabecalho, arrays), com arrays np.memmap somente leitura
+    """
+    cabecalho, inicio = _ler_cabecalho_cache(nome_cache)
+    arrays = {}
+    for nome, info in cabecalho['arrays'].items():
+        forma = tuple(info['forma'])
+        if 0 in forma:
+            # Não é possível mapear uma região vazia
+            arrays[nome] = np.empty(forma, dtype=info['tipo'])
+        else:
+            arrays[nome] = np.memmap(nome_cache, dtype=info['tipo'], mode='r',
+                                     offset=inicio + info['deslocamento'], shape=forma)
+    return cabecalho, arrays
+
+
+def cache_atualizado(nome_arquivo, nome_cache, verificar_hash=False):
+    """
+    Verifica se o cache binário corresponde ao CSV de origem atual.
     
-    def predizer(self, instancia_teste):
-        """
-        Faz a predição para uma instância de teste.
+    Por padrão compara tamanho e data de modificação do CSV; com
+    verificar_hash, compara o SHA-256 do conteúdo, o que é mais lento mas
+    não se engana com cópias ou arquivos apenas tocados. Se o CSV não
+    existir mais, um cache existente é considerado válido.
+    
+    Args:
+        nome_arquivo (str): CSV de origem
+        nome_cache (str): Arquivo de cache
+        verificar_hash (bool): Se deve comparar o conteúdo em vez da data
         
-        Args:
-            instancia_teste: Instância a ser classificada
-            
-        Returns:
-            str: Classe predita
-        """
-        vizinhos = self.obter_vizinhos(instancia_teste)
-        return self.predizer_classificacao(vizinhos)
+    Returns:
+        bool: True se o cache pode ser usado
+    """
+    if not os.path.exists(nome_cache):
+        return False
+    try:
+        cabecalho, _ = _ler_cabecalho_cache(nome_cache)
+    except (OSError, ValueError):
+        return False
+    if 'origem' not in cabecalho:
+        return False  # Não é um cache de dataset (ex.: modelo salvo)
+    if not os.path.exists(nome_arquivo):
+        return True
+    
+    origem = cabecalho['origem']
+    if verificar_hash:
+        return origem['sha256'] == _hash_arquivo(nome_arquivo)
+    estado = os.stat(nome_arquivo)
+    return origem['tamanho'] == estado.st_size and origem['mtime_ns'] == estado.st_mtime_ns
 
 
-def carregar_dataset_cogumelos(nome_arquivo):
+def compilar_dataset_cogumelos(nome_arquivo, nome_cache=None):
     """
-    Carrega o dataset de cogumelos de um arquivo CSV.
+    Converte o CSV de cogumelos para o formato binário de cache.
+    
+    O dataset é processado (coluna alvo no final) e cada característica é
+    gravada como o código uint8 do seu valor na lista ordenada de valores da
+    coluna, a mesma numeração usada por codificar_one_hot. Cabeçalho,
+    vocabulários e classes vão no cabeçalho JSON.
     
     Args:
         nome_arquivo (str): Caminho para o arquivo CSV
+        nome_cache (str): Caminho do cache (padrão: caminho_cache(nome_arquivo))
         
     Returns:
-        tuple: (dataset, cabecalho) ou (None, None) em caso de erro
+        str: Caminho do cache gravado ou None em caso de erro
     """
-    dataset = []
+    if nome_cache is None:
+        nome_cache = caminho_cache(nome_arquivo)
+    dataset, cabecalho = carregar_dataset_cogumelos(nome_arquivo)
+    if dataset is None:
+        return None
+    dataset, cabecalho = processar_dataset_cogumelos(dataset, cabecalho)
+    
+    vocabularios = [sorted({linha[i] for linha in dataset}) for i in range(len(cabecalho) - 1)]
+    for nome_caracteristica, valores in zip(cabecalho, vocabularios):
+        if len(valores) > MAXIMO_VALORES_CATEGORICOS:
+            print(f"Erro: '{nome_caracteristica}' tem {len(valores)} valores, mais do que cabe em "
+                  f"uint8 (o código {CODIGO_DESCONHECIDO} é reservado para valores desconhecidos)")
+            return None
+    classes = sorted({linha[-1] for linha in dataset})
+    
+    codigos_valor = [{valor: i for i, valor in enumerate(valores)} for valores in vocabularios]
+    codigo_classe = {classe: i for i, classe in enumerate(classes)}
+    matriz = np.array(
+        [[codigos_valor[i][valor] for i, valor in enumerate(linha[:-1])] for linha in dataset],
+        dtype=np.uint8,
+    )
+    rotulos = np.array([codigo_classe[linha[-1]] for linha in dataset], dtype=np.uint8)
+    
+    metadados = {'cabecalho': cabecalho, 'vocabularios': vocabularios, 'classes': classes}
     try:
-        with open(nome_arquivo, 'r') as arquivo:
-            leitor_csv = csv.reader(arquivo)
-            cabecalho = next(leitor_csv)  # Lê o cabeçalho
-            print(f"Cabeçalho encontrado: {cabecalho}")
-            
-            linha_num = 1
-            for linha in leitor_csv:
-                linha_num += 1
-                # Pula linhas vazias
-                if not linha or len(linha) == 0:
-                    continue
-                
-                # Verifica se a linha tem o número correto de colunas
-                if len(linha) != len(cabecalho):
-                    print(f"Aviso: Linha {linha_num} tem número incorreto de colunas: {linha}")
-                    continue
-                
-                # Remove espaços em branco
-                linha_limpa = [item.strip() for item in linha]
-                dataset.append(linha_limpa)
-                
-    except FileNotFoundError:
-        print(f"Erro: Arquivo '{nome_arquivo}' não encontrado!")
-        return None, None
-    except Exception as e:
-        print(f"Erro ao carregar dataset: {e}")
-        return None, None
+        escrever_cache(nome_cache, nome_arquivo, metadados, {'matriz': matriz, 'rotulos': rotulos})
+    except OSError as e:
+        print(f"Erro ao gravar cache '{nome_cache}': {e}")
+        return None
+    print(f"Cache binário gravado em '{nome_cache}'")
+    return nome_cache
+
+
+def carregar_dataset_cogumelos_binario(nome_arquivo, nome_cache=None, verificar_hash=False):
+    """
+    Carrega o dataset de cogumelos do cache binário, mapeado em memória.
     
-    if len(dataset) == 0:
-        print("Erro: Nenhum dado foi carregado do arquivo!")
-        return None, None
+    O CSV só é lido (e o cache recompilado) quando o cache não existe ou está
+    desatualizado em relação a ele (ver cache_atualizado).
     
-    print(f"Carregadas {len(dataset)} amostras do dataset")
-    return dataset, cabecalho
+    Args:
+        nome_arquivo (str): Caminho para o arquivo CSV de origem
+        nome_cache (str): Caminho do cache (padrão: caminho_cache(nome_arquivo))
+        verificar_hash (bool): Se deve validar o cache pelo conteúdo do CSV
+        
+    Returns:
+        tuple: (matriz, rotulos, classes, cabecalho, vocabularios) ou uma tupla
+            de None em caso de erro; matriz contém os códigos das características
+            e rotulos o índice de cada classe em classes
+    """
+    if nome_cache is None:
+        nome_cache = caminho_cache(nome_arquivo)
+    if not cache_atualizado(nome_arquivo, nome_cache, verificar_hash):
+        print(f"Cache '{nome_cache}' ausente ou desatualizado, compilando a partir do CSV...")
+        if compilar_dataset_cogumelos(nome_arquivo, nome_cache) is None:
+            return None, None, None, None, None
+    
+    try:
+        metadados, arrays = ler_cache(nome_cache)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao carregar cache: {e}")
+        return None, None, None, None, None
+    
+    print(f"Carregadas {len(arrays['matriz'])} amostras do cache binário")
+    return (arrays['matriz'], arrays['rotulos'], metadados['classes'],
+            metadados['cabecalho'], metadados['vocabularios'])
 
 
-def processar_dataset_cogumelos(dataset, cabecalho):
+def salvar_modelo(classificador, nome_arquivo):
     """
-    Processa o dataset verificando se a coluna alvo já está na posição correta.
+    Salva um classificador treinado em um arquivo binário versionado.
+    
+    Grava os parâmetros, o cabeçalho e o mapeamento de codificação no
+    cabeçalho JSON, e a matriz de treino (na representação do classificador,
+    empacotada no modo 'bits') e os rótulos como arrays alinhados, no mesmo
+    formato dos caches de dataset. Com duplicatas colapsadas, a matriz é
+    gravada expandida, e os protótipos são refeitos ao carregar. Amostras
+    removidas ainda no armazenamento são descartadas antes (ver compactar).
     
     Args:
-        dataset: Dataset original
-        cabecalho: Cabeçalho original
+        classificador: KNNClassificadorCogumelos treinado
+        nome_arquivo (str): Caminho do arquivo do modelo
         
     Returns:
-        tuple: (dataset_processado, cabecalho_processado)
+        str: Caminho do modelo gravado ou None em caso de erro
     """
-    # Verifica se a última coluna é 'poisonous' ou similar
-    if 'poisonous' in cabecalho[-1].lower() or cabecalho[-1].lower() in ['class', 'target', 'label']:
-        # A coluna alvo já está no final, não precisa mover
-        print("Coluna alvo já está na posição correta (final)")
-        return dataset, cabecalho
-    else:
-        # Assume que a primeira coluna é o alvo, move para o final
-        print("Movendo coluna alvo da primeira para a última posição")
-        dataset_processado = []
-        for linha in dataset:
-            dataset_processado.append(linha[1:] + [linha[0]])
+    if classificador.matriz_treino is None:
+        raise ValueError("O classificador precisa ser treinado antes de ser salvo")
+    if classificador.num_removidas:
+        classificador.compactar()
+    matriz = classificador.matriz_treino
+    if classificador.prototipos is not None:
+        matriz = matriz[classificador.prototipos.prototipo_da_amostra]
+    
+    # Rótulos NumPy (como os índices de codificar_arquivo) viram escalares
+    # Python, que o cabeçalho JSON aceita
+    rotulos_treino = [rotulo.item() if isinstance(rotulo, np.generic) else rotulo
+                      for rotulo in classificador.rotulos_treino]
+    classes = list(dict.fromkeys(rotulos_treino))
+    codigo_classe = {classe: i for i, classe in enumerate(classes)}
+    rotulos = np.array([codigo_classe[rotulo] for rotulo in rotulos_treino],
+                       dtype=np.min_scalar_type(max(len(classes) - 1, 0)))
+    vocabularios = [sorted(mapeamento, key=mapeamento.get)
+                    for mapeamento in classificador.mapeamento_codificacao.values()]
+    metadados = {
+        'tipo': TIPO_MODELO,
+        'versao_modelo': VERSAO_MODELO,
+        'parametros': {
+            'k': classificador.k,
+            'indice': classificador.indice,
+            'parametros_indice': classificador.parametros_indice,
+            'tamanho_cache': classificador.tamanho_cache,
+            'representacao': classificador.representacao,
+            'colapsar_duplicatas': classificador.colapsar_duplicatas,
+            'politica_desconhecidos': classificador.politica_desconhecidos,
+            'parada_antecipada': classificador.parada_antecipada,
+        },
+        'cabecalho': classificador.cabecalho_processado,
+        'vocabularios': vocabularios,
+        'classes': classes,
+    }
+    try:
+        escrever_cache(nome_arquivo, None, metadados, {'matriz': matriz, 'rotulos': rotulos})
+    except OSError as e:
+        print(f"Erro ao gravar modelo '{nome_arquivo}': {e}")
+        return None
+    print(f"Modelo gravado em '{nome_arquivo}'")
+    return nome_arquivo
+
+
+def carregar_modelo(nome_arquivo):
+    """
+    Carrega um classificador salvo por salvar_modelo, sem ler o CSV.
+    
+    A matriz de treino é mapeada em memória e usada sem cópia (exceto ao
+    refazer protótipos de duplicatas colapsadas), então o custo de partida
+    não depende de codificar o dataset de novo.
+    
+    Args:
+        nome_arquivo (str): Caminho do arquivo do modelo
         
-        cabecalho_processado = cabecalho[1:] + [cabecalho[0]]
-        return dataset_processado, cabecalho_processado
+    Returns:
+        KNNClassificadorCogumelos: Classificador treinado ou None em caso de erro
+    """
+    try:
+        metadados, arrays = ler_cache(nome_arquivo)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao carregar modelo: {e}")
+        return None
+    if metadados.get('tipo') != TIPO_MODELO:
+        print(f"Erro: '{nome_arquivo}' não é um modelo salvo do classificador de cogumelos")
+        return None
+    if metadados.get('versao_modelo') != VERSAO_MODELO:
+        print(f"Erro: versão do modelo '{nome_arquivo}' não suportada: {metadados.get('versao_modelo')}")
+        return None
+    
+    classificador = KNNClassificadorCogumelos(**metadados['parametros'])
+    classificador.definir_mapeamento(metadados['cabecalho'], metadados['vocabularios'])
+    classes = metadados['classes']
+    classificador.treinar_matriz(arrays['matriz'], [classes[c] for c in arrays['rotulos'].tolist()])
+    print(f"Modelo carregado de '{nome_arquivo}': {len(arrays['matriz'])} amostras de treino")
+    return classificador
 
 
 def dividir_dataset(dataset, proporcao_treino=0.8, embaralhar=True):
@@ -249,27 +2411,415 @@ def dividir_dataset(dataset, proporcao_treino=0.8, embaralhar=True):
     return dados_treino, dados_teste
 
 
-def avaliar_modelo(classificador, dados_teste):
+def dividir_matriz(matriz, rotulos, proporcao_treino=0.8, embaralhar=True):
     """
-    Avalia o desempenho do modelo nos dados de teste.
+    Divide uma matriz de características e os seus rótulos em treino e teste.
+    
+    O embaralhamento consome a mesma sequência aleatória de dividir_dataset,
+    então as mesmas amostras vão para cada conjunto, na mesma ordem. Sem
+    embaralhar, os conjuntos são fatias da matriz (sem cópia, mesmo mapeada
+    em memória); embaralhados, as linhas de cada um são reunidas em um novo
+    array, sem passar por listas.
+    
+    Args:
+        matriz: np.ndarray (amostras x características)
+        rotulos: np.ndarray com o rótulo de cada amostra
+        proporcao_treino (float): Proporção dos dados para treino (0.0 a 1.0)
+        embaralhar (bool): Se deve embaralhar os dados antes de dividir
+        
+    Returns:
+        tuple: (matriz_treino, rotulos_treino, matriz_teste, rotulos_teste)
+    """
+    tamanho_treino = int(len(rotulos) * proporcao_treino)
+    if not embaralhar:
+        return matriz[:tamanho_treino], rotulos[:tamanho_treino], matriz[tamanho_treino:], rotulos[tamanho_treino:]
+    
+    posicoes = list(range(len(rotulos)))
+    random.shuffle(posicoes)
+    treino = np.array(posicoes[:tamanho_treino], dtype=np.intp)
+    teste = np.array(posicoes[tamanho_treino:], dtype=np.intp)
+    return matriz[treino], rotulos[treino], matriz[teste], rotulos[teste]
+
+
+def dividir_dataset_em_blocos(blocos, proporcao_treino=0.8, embaralhar=True):
+    """
+    Divide um fluxo de blocos em treino e teste, um bloco por vez.
+    
+    Cada bloco é dividido com dividir_dataset, então a proporção vale dentro
+    de cada bloco e o embaralhamento não mistura amostras de blocos diferentes.
+    
+    Args:
+        blocos: Iterável de blocos (listas de amostras)
+        proporcao_treino (float): Proporção dos dados para treino (0.0 a 1.0)
+        embaralhar (bool): Se deve embaralhar cada bloco antes de dividir
+        
+    Yields:
+        tuple: (dados_treino, dados_teste) de cada bloco
+    """
+    for bloco in blocos:
+        yield dividir_dataset(bloco, proporcao_treino, embaralhar)
+
+
+# Estado de cada processo trabalhador da avaliação paralela
+_trabalhador = {}
+
+
+def _inicializar_trabalhador(nome_memoria, forma, tipo, k, representacao, prototipos=None):
+    """
+    Prepara um processo trabalhador, mapeando a matriz de treino compartilhada.
+    
+    A matriz não é copiada: o classificador do trabalhador usa diretamente a
+    memória compartilhada criada pelo processo principal, somente para leitura.
+    Com duplicatas colapsadas, a matriz compartilhada é a dos protótipos e
+    prototipos traz as contagens e os índices das amostras de cada um.
+    """
+    memoria = shared_memory.SharedMemory(name=nome_memoria)
+    classificador = KNNClassificadorCogumelos(k=k, representacao=representacao)
+    classificador.matriz_treino = np.ndarray(forma, dtype=tipo, buffer=memoria.buf)
+    classificador.matriz_treino.flags.writeable = False
+    classificador.prototipos = prototipos
+    _trabalhador['memoria'] = memoria
+    _trabalhador['classificador'] = classificador
+
+
+def _buscar_vizinhos_fragmento(consultas):
+    """Busca os vizinhos de um fragmento das consultas em um processo trabalhador."""
+    return _trabalhador['classificador'].obter_indices_vizinhos_lote(consultas)
+
+
+def _votos_prototipos_fragmento(consultas):
+    """Votos por protótipo e classe (ver PrototiposTreino.obter_votos) de um fragmento das consultas."""
+    classificador = _trabalhador['classificador']
+    return [classificador.prototipos.obter_votos(distancias, ordem, classificador.k)
+            for distancias, ordem in classificador._percorrer_prototipos(consultas, classificador.k)]
+
+
+def _executar_em_paralelo(classificador, matriz, funcao, tarefas, num_processos, prototipos=None):
+    """
+    Executa uma função sobre cada tarefa em processos trabalhadores que
+    mapeiam a matriz em memória compartilhada (ver _inicializar_trabalhador).
+    
+    Args:
+        classificador: Classificador cujos parâmetros os trabalhadores copiam
+        matriz: np.ndarray colocado uma única vez em memória compartilhada
+        funcao: Função de módulo executada nos trabalhadores
+        tarefas: Lista com o argumento de cada chamada
+        num_processos (int): Número de processos trabalhadores
+        prototipos: PrototiposTreino enviado aos trabalhadores (sem a
+            matriz, que é a compartilhada)
+        
+    Returns:
+        list: Resultados, na mesma ordem das tarefas
+    """
+    memoria = shared_memory.SharedMemory(create=True, size=max(1, matriz.nbytes))
+    try:
+        compartilhada = np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=memoria.buf)
+        compartilhada[:] = matriz
+        
+        if prototipos is not None:
+            prototipos = copy.copy(prototipos)
+            prototipos.matriz = None
+            prototipos.chaves = None
+            prototipos.buffers = {}
+        argumentos = (memoria.name, matriz.shape, matriz.dtype.str, classificador.k,
+                      classificador.representacao, prototipos)
+        with ProcessPoolExecutor(max_workers=num_processos,
+                                 initializer=_inicializar_trabalhador,
+                                 initargs=argumentos) as executor:
+            # map preserva a ordem das tarefas, tornando a junção determinística
+            resultados = list(executor.map(funcao, tarefas))
+        del compartilhada
+    finally:
+        memoria.close()
+        memoria.unlink()
+    return resultados
+
+
+def predizer_paralelo(classificador, dados_teste, num_processos):
+    """
+    Faz a predição dos dados de teste distribuindo-os entre vários processos.
+    
+    A matriz de treino é colocada uma única vez em memória compartilhada e
+    mapeada por todos os trabalhadores. Cada trabalhador recebe um fragmento
+    contíguo das consultas e devolve os índices dos vizinhos; a votação é feita
+    no processo principal, na ordem original, então o resultado é idêntico ao
+    de predizer_lote. Os trabalhadores sempre usam a varredura linear, sobre
+    a matriz compactada (sem amostras removidas). Com duplicatas colapsadas,
+    a matriz compartilhada é a dos protótipos e os trabalhadores devolvem os
+    votos ponderados pelas contagens, como em predizer_lote.
     
     Args:
         classificador: Classificador KNN treinado
         dados_teste: Dados de teste
+        num_processos (int): Número de processos trabalhadores
+        
+    Returns:
+        list: Classes preditas, na mesma ordem dos dados de teste
+    """
+    if classificador.num_removidas:
+        classificador.compactar()
+    consultas = classificador.converter_consultas(dados_teste)
+    fragmentos = np.array_split(consultas, num_processos)
+    if classificador.prototipos is not None:
+        resultados = _executar_em_paralelo(classificador, classificador.matriz_treino, _votos_prototipos_fragmento,
+                                           fragmentos, num_processos, classificador.prototipos)
+        return [classificador.votar_ponderado(votos) for votos_fragmento in resultados for votos in votos_fragmento]
+    resultados = _executar_em_paralelo(classificador, classificador.matriz_treino,
+                                       _buscar_vizinhos_fragmento, fragmentos, num_processos)
+    
+    predicoes = []
+    for indices in resultados:
+        for linha in indices:
+            predicoes.append(classificador.votar(classificador.rotulos_treino[j] for j in linha))
+    return predicoes
+
+
+def _vizinhos_sem_a_propria(classificador, matriz, inicio, fim, k):
+    """
+    Encontra os k vizinhos de cada linha de matriz[inicio:fim] entre todas as
+    linhas da matriz, deixando a própria linha de fora.
+    
+    Returns:
+        np.ndarray: Índices dos vizinhos (linhas x k), do mais próximo ao mais distante
+    """
+    num_linhas, num_colunas = matriz.shape
+    k = min(k, num_linhas - 1)
+    indices = np.empty((fim - inicio, k), dtype=np.intp)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_linhas * num_colunas))
+    for bloco_inicio in range(inicio, fim, tamanho_bloco):
+        bloco_fim = min(bloco_inicio + tamanho_bloco, fim)
+        distancias = classificador.calcular_distancias(matriz[bloco_inicio:bloco_fim], matriz)
+        # A própria linha fica mais distante que todas as outras
+        linhas = np.arange(bloco_fim - bloco_inicio)
+        distancias[linhas, bloco_inicio + linhas] = np.inf if distancias.dtype.kind == 'f' else distancias.max() + 1
+        indices[bloco_inicio - inicio:bloco_fim - inicio] = selecionar_vizinhos(distancias, k)
+    return indices
+
+
+def _vizinhos_sem_a_propria_fragmento(tarefa):
+    """Vizinhos de um intervalo (inicio, fim, k) das linhas de treino em um processo trabalhador."""
+    inicio, fim, k = tarefa
+    classificador = _trabalhador['classificador']
+    return _vizinhos_sem_a_propria(classificador, classificador.matriz_treino, inicio, fim, k)
+
+
+def editar_amostras(classificador, matriz, rotulos, k, num_processos=1):
+    """
+    Edição de Wilson: marca as amostras que a votação dos seus k vizinhos
+    (deixando a própria de fora) classifica corretamente.
+    
+    Descarta o ruído e as amostras no meio da classe oposta, suavizando as
+    fronteiras. Os vizinhos de todas as amostras são calculados em blocos e,
+    com num_processos > 1, divididos entre processos que compartilham a matriz.
+    
+    Args:
+        classificador: Classificador KNN (usado para as distâncias e a votação)
+        matriz: np.ndarray com as amostras, na representação do classificador
+        rotulos: Sequência com o rótulo de cada amostra
+        k (int): Número de vizinhos da votação
+        num_processos (int): Número de processos (1 = sequencial)
+        
+    Returns:
+        np.ndarray: Máscara booleana das amostras mantidas
+    """
+    num_amostras = len(matriz)
+    if num_amostras < 2:
+        return np.ones(num_amostras, dtype=bool)
+    if num_processos > 1:
+        intervalos = [(int(parte[0]), int(parte[-1]) + 1, k)
+                      for parte in np.array_split(np.arange(num_amostras), num_processos) if len(parte)]
+        indices = np.concatenate(_executar_em_paralelo(classificador, matriz, _vizinhos_sem_a_propria_fragmento,
+                                                       intervalos, num_processos))
+    else:
+        indices = _vizinhos_sem_a_propria(classificador, matriz, 0, num_amostras, k)
+    return np.array([classificador.votar(rotulos[j] for j in linha) == rotulo
+                     for linha, rotulo in zip(indices.tolist(), rotulos)], dtype=bool)
+
+
+def _votar_codigos(codigos_vizinhos, num_classes):
+    """
+    Mesma votação de votar, vetorizada sobre linhas de códigos de classe.
+    
+    Args:
+        codigos_vizinhos: np.ndarray (linhas x k) com o código da classe de
+            cada vizinho, do mais próximo ao mais distante (-1 = sem vizinho)
+        num_classes (int): Número de classes
+        
+    Returns:
+        np.ndarray: Código da classe mais votada de cada linha (-1 sem vizinhos)
+    """
+    k = codigos_vizinhos.shape[1]
+    iguais = codigos_vizinhos[:, :, np.newaxis] == np.arange(num_classes)
+    votos = iguais.sum(axis=1)
+    primeiras = np.where(votos > 0, iguais.argmax(axis=1), k)
+    # Mais votos primeiro e, no empate, a classe que aparece antes na lista
+    vencedoras = (primeiras - votos * (k + 1)).argmin(axis=1)
+    return np.where(votos.max(axis=1) > 0, vencedoras, -1)
+
+
+def condensar_amostras(classificador, matriz, rotulos, k=1):
+    """
+    Condensação de Hart: marca um subconjunto com o qual o k-NN classifica
+    corretamente todas as amostras descartadas.
+    
+    Percorre as amostras em ordem e guarda cada uma que a votação dos k
+    vizinhos entre as já guardadas classifica errado, repetindo as passadas
+    até nenhuma ser guardada; sobram em geral as amostras próximas das
+    fronteiras. Com o mesmo k do classificador, o conjunto guardado é
+    consistente com a regra que ele aplica (a condensação clássica usa o
+    1-NN e pode deixar uma classe com menos de k protótipos, que nunca vence
+    a votação). Cada amostra guardada muda a classificação das seguintes,
+    então o algoritmo é sequencial, mas os k protótipos guardados mais
+    próximos de cada amostra são mantidos e atualizados de forma vetorizada a
+    cada nova amostra guardada.
+    
+    Args:
+        classificador: Classificador KNN (usado para as distâncias)
+        matriz: np.ndarray com as amostras, na representação do classificador
+        rotulos: Sequência com o rótulo de cada amostra
+        k (int): Número de vizinhos da votação
+        
+    Returns:
+        np.ndarray: Máscara booleana das amostras guardadas
+    """
+    num_amostras = len(matriz)
+    classes, codigos = np.unique(np.asarray(rotulos), return_inverse=True)
+    codigos = codigos.ravel()
+    # O índice num_amostras marca a falta de vizinho, sem classe
+    codigos_vizinhos = np.append(codigos, -1)
+    guardadas = np.zeros(num_amostras, dtype=bool)
+    # Os k protótipos guardados mais próximos de cada amostra, por (distância, índice)
+    distancias_proximas = np.full((num_amostras, k), np.inf)
+    indices_proximos = np.full((num_amostras, k), num_amostras)
+    classe_prevista = np.full(num_amostras, -1)
+    
+    posicao = 0
+    guardou_na_passada = False
+    while True:
+        erradas = np.flatnonzero((classe_prevista[posicao:] != codigos[posicao:]) & ~guardadas[posicao:])
+        if len(erradas) == 0:
+            if not guardou_na_passada:
+                break
+            # Nova passada: as amostras guardadas depois podem ter mudado as anteriores
+            posicao = 0
+            guardou_na_passada = False
+            continue
+        
+        i = posicao + int(erradas[0])
+        guardadas[i] = True
+        distancias = classificador.calcular_distancias(matriz[i:i + 1], matriz)[0]
+        # Só mudam as amostras em que a nova guardada entra entre os k mais próximos
+        afetadas = np.flatnonzero((distancias < distancias_proximas[:, -1])
+                                  | ((distancias == distancias_proximas[:, -1]) & (i < indices_proximos[:, -1])))
+        if len(afetadas):
+            candidatas = np.column_stack((distancias_proximas[afetadas], distancias[afetadas]))
+            indices = np.column_stack((indices_proximos[afetadas], np.full(len(afetadas), i)))
+            ordem = np.lexsort((indices, candidatas), axis=1)[:, :k]
+            distancias_proximas[afetadas] = np.take_along_axis(candidatas, ordem, axis=1)
+            indices_proximos[afetadas] = np.take_along_axis(indices, ordem, axis=1)
+            classe_prevista[afetadas] = _votar_codigos(codigos_vizinhos[indices_proximos[afetadas]], len(classes))
+        guardou_na_passada = True
+        posicao = i + 1
+    return guardadas
+
+
+def _acuracia(classificador, dados, rotulos=None):
+    """Acurácia (%) das predições em lote sobre dados rotulados (ou uma matriz e os seus rótulos)."""
+    predicoes = classificador.predizer_lote(dados)
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados]
+    return sum(predicao == rotulo for predicao, rotulo in zip(predicoes, rotulos)) / len(predicoes) * 100
+
+
+def reduzir_prototipos(classificador, metodo='edicao_condensacao', k=None, num_processos=1,
+                       dados_validacao=None, rotulos_validacao=None):
+    """
+    Reduz o conjunto de treino de um classificador treinado, preservando as
+    fronteiras de decisão.
+    
+    A edição de Wilson (editar_amostras) descarta o ruído, e a condensação de
+    Hart (condensar_amostras) descarta as amostras longe das fronteiras; as
+    duas juntas dão a maior redução. As amostras descartadas saem por
+    remover_amostras, então identificadores, índice de busca e cache
+    continuam válidos, e o armazenamento é compactado no final.
+    
+    Args:
+        classificador: Classificador KNN treinado (é modificado)
+        metodo (str): 'edicao', 'condensacao' ou 'edicao_condensacao'
+        k (int): Vizinhos da votação na edição e na condensação (padrão: classificador.k)
+        num_processos (int): Processos usados na edição (1 = sequencial)
+        dados_validacao: Dados fora do treino para medir a acurácia antes e depois
+        rotulos_validacao: Rótulo de cada linha de dados_validacao, quando
+            ele é uma matriz de características
+        
+    Returns:
+        dict: Amostras antes e depois, fator de redução, amostras descartadas
+        em cada etapa e, com dados_validacao, acurácia (%) antes e depois
+    """
+    if metodo not in METODOS_REDUCAO:
+        raise ValueError(f"Método de redução desconhecido: {metodo}")
+    if k is None:
+        k = classificador.k
+    relatorio = {'metodo': metodo}
+    if dados_validacao is not None:
+        relatorio['acuracia_antes'] = _acuracia(classificador, dados_validacao, rotulos_validacao)
+    
+    if classificador.num_removidas:
+        classificador.compactar()
+    total = classificador.num_amostras_treino()
+    matriz = classificador.converter_consultas(classificador._linhas_treino(np.arange(total)))
+    rotulos = list(classificador.rotulos_treino)
+    mantidas = np.ones(total, dtype=bool)
+    if metodo in ('edicao', 'edicao_condensacao'):
+        mantidas = editar_amostras(classificador, matriz, rotulos, k, num_processos)
+        relatorio['descartadas_edicao'] = int(total - mantidas.sum())
+    if metodo in ('condensacao', 'edicao_condensacao'):
+        restantes = np.flatnonzero(mantidas)
+        guardadas = condensar_amostras(classificador, matriz[restantes], [rotulos[j] for j in restantes], k)
+        mantidas[restantes[~guardadas]] = False
+        relatorio['descartadas_condensacao'] = int(len(restantes) - guardadas.sum())
+    
+    if not mantidas.any():
+        print("Aviso: a redução descartaria todas as amostras de treino; conjunto mantido")
+        mantidas[:] = True
+    if not mantidas.all():
+        classificador.remover_amostras(classificador.ids_treino[:total][~mantidas])
+        if classificador.num_removidas:
+            classificador.compactar()
+    
+    relatorio['amostras_antes'] = total
+    relatorio['amostras_depois'] = classificador.num_amostras_treino()
+    relatorio['fator_reducao'] = total / relatorio['amostras_depois']
+    if dados_validacao is not None:
+        relatorio['acuracia_depois'] = _acuracia(classificador, dados_validacao, rotulos_validacao)
+    return relatorio
+
+
+def avaliar_modelo(classificador, dados_teste, num_processos=1, rotulos=None):
+    """
+    Avalia o desempenho do modelo nos dados de teste.
+    
+    Args:
+        classificador: Classificador KNN treinado
+        dados_teste: Dados de teste ou, com rotulos, matriz de características
+        num_processos (int): Número de processos para a predição (1 = sequencial)
+        rotulos: Sequência com o rótulo de cada linha da matriz
         
     Returns:
         tuple: (acuracia, predicoes_corretas, total_testes)
     """
     predicoes_corretas = 0
-    predicoes = []
     
     print(f"Avaliando modelo com k={classificador.k}...")
     print("-" * 70)
     
-    for i, instancia_teste in enumerate(dados_teste):
-        predicao = classificador.predizer(instancia_teste)
-        rotulo_real = instancia_teste[-1]
-        predicoes.append(predicao)
+    if num_processos > 1:
+        predicoes = predizer_paralelo(classificador, dados_teste, num_processos)
+    else:
+        predicoes = classificador.predizer_lote(dados_teste)
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados_teste]
+    for i, (predicao, rotulo_real) in enumerate(zip(predicoes, rotulos)):
         
         # Traduz os rótulos para português
         rotulo_real_pt = "Venenoso" if rotulo_real == 'p' else "Comestível"
@@ -286,6 +2836,141 @@ def avaliar_modelo(classificador, dados_teste):
     acuracia = (predicoes_corretas / len(dados_teste)) * 100
     return acuracia, predicoes_corretas, len(dados_teste)
 
+
+def avaliar_multiplos_k(classificador, dados_teste, valores_k, rotulos=None):
+    """
+    Avalia a acurácia para vários valores de k com uma única busca de vizinhos.
+    
+    Os vizinhos de cada instância são ordenados uma só vez, até o maior k.
+    Como a ordenação é estável, os k primeiros dessa lista são exatamente os
+    vizinhos que um classificador com aquele k encontraria.
+    
+    Args:
+        classificador: Classificador KNN treinado (seu k é ignorado)
+        dados_teste: Dados de teste codificados ou, com rotulos, matriz de características
+        valores_k: Lista de valores de k a avaliar
+        rotulos: Sequência com o rótulo de cada linha da matriz
+        
+    Returns:
+        dict: Acurácia (%) para cada valor de k
+    """
+    indices = classificador.obter_indices_vizinhos_lote(dados_teste, max(valores_k))
+    corretas = {k_teste: 0 for k_teste in valores_k}
+    
+    if rotulos is None:
+        rotulos = [instancia[-1] for instancia in dados_teste]
+    for linha, rotulo_real in zip(indices, rotulos):
+        rotulos_vizinhos = [classificador.rotulos_treino[j] for j in linha]
+        for k_teste in valores_k:
+            if classificador.votar(rotulos_vizinhos[:k_teste]) == rotulo_real:
+                corretas[k_teste] += 1
+    
+    return {k_teste: (corretas[k_teste] / len(dados_teste)) * 100 for k_teste in valores_k}
+
+
+def atribuir_dobras(rotulos, estrategia='kfold', num_dobras=5, embaralhar=True):
+    """
+    Atribui cada amostra a uma dobra da validação cruzada.
+    
+    Args:
+        rotulos: Sequência com o rótulo de cada amostra
+        estrategia (str): 'kfold' (dobras contíguas), 'estratificado' (mesma
+            proporção de classes em cada dobra) ou 'loo' (leave-one-out)
+        num_dobras (int): Número de dobras (ignorado em 'loo')
+        embaralhar (bool): Se deve embaralhar as amostras antes de dividir
+        
+    Returns:
+        np.ndarray: Número da dobra de cada amostra
+    """
+    total = len(rotulos)
+    posicoes = list(range(total))
+    if embaralhar:
+        random.shuffle(posicoes)
+    dobras = np.empty(total, dtype=np.intp)
+    
+    if estrategia == 'loo':
+        dobras[:] = np.arange(total)
+    elif estrategia == 'kfold':
+        for dobra, parte in enumerate(np.array_split(np.array(posicoes, dtype=np.intp), num_dobras)):
+            dobras[parte] = dobra
+    elif estrategia == 'estratificado':
+        # Distribui as amostras de cada classe em rodízio entre as dobras
+        por_classe = {}
+        for posicao in posicoes:
+            por_classe.setdefault(rotulos[posicao], []).append(posicao)
+        proxima = 0
+        for posicoes_classe in por_classe.values():
+            for posicao in posicoes_classe:
+                dobras[posicao] = proxima % num_dobras
+                proxima += 1
+    else:
+        raise ValueError(f"Estratégia de validação cruzada desconhecida: {estrategia}")
+    return dobras
+
+
+def validacao_cruzada(classificador, dataset, valores_k, estrategia='kfold',
+                      num_dobras=5, embaralhar=True, rotulos=None):
+    """
+    Validação cruzada de vários valores de k reaproveitando as distâncias.
+    
+    A matriz de distâncias entre todas as amostras é calculada uma única vez,
+    em blocos de linhas para limitar a memória. Como cada amostra é teste em
+    exatamente uma dobra, cada linha responde à sua dobra mascarando as
+    amostras da mesma dobra; os vizinhos são ordenados uma vez até o maior k
+    e todos os valores de k são avaliados sobre essa ordenação. O conjunto
+    de treino de cada dobra mantém a ordem do dataset, então os empates são
+    resolvidos como em um classificador treinado com ele. Quando um k passa
+    do número de amostras fora da dobra, a votação usa só essas amostras,
+    como faria esse classificador; as mascaradas nunca votam.
+    
+    Args:
+        classificador: Classificador KNN (usado para converter e votar, sem treino)
+        dataset: Dataset completo ou, com rotulos, matriz de características
+        valores_k: Lista de valores de k a avaliar
+        estrategia (str): 'kfold', 'estratificado' ou 'loo' (ver atribuir_dobras)
+        num_dobras (int): Número de dobras (ignorado em 'loo')
+        embaralhar (bool): Se deve embaralhar as amostras antes de dividir
+        rotulos: Sequência com o rótulo de cada linha da matriz
+        
+    Returns:
+        dict: Acurácia média (%) entre as dobras para cada valor de k
+    """
+    matriz = classificador.converter_consultas(dataset)
+    if rotulos is None:
+        rotulos = [amostra[-1] for amostra in dataset]
+    dobras = atribuir_dobras(rotulos, estrategia, num_dobras, embaralhar)
+    total_dobras = int(dobras.max()) + 1
+    k_maximo = max(valores_k)
+    
+    corretas = {k_teste: np.zeros(total_dobras) for k_teste in valores_k}
+    tamanhos = np.bincount(dobras, minlength=total_dobras)
+    # Amostras de treino de cada dobra: as de todas as outras
+    tamanhos_treino = len(rotulos) - tamanhos
+    if (tamanhos_treino[dobras] == 0).any():
+        raise ValueError("A validação cruzada precisa de pelo menos duas dobras com amostras")
+    
+    num_amostras, num_colunas = matriz.shape
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // max(1, num_amostras * num_colunas))
+    for inicio in range(0, num_amostras, tamanho_bloco):
+        bloco = matriz[inicio:inicio + tamanho_bloco]
+        distancias = classificador.calcular_distancias(bloco, matriz)
+        # Amostras da mesma dobra não fazem parte do treino dessa linha: recebem
+        # uma distância maior que todas as outras
+        dobras_bloco = dobras[inicio:inicio + len(bloco)]
+        mesma_dobra = dobras_bloco[:, np.newaxis] == dobras[np.newaxis, :]
+        distancias[mesma_dobra] = np.inf if distancias.dtype.kind == 'f' else distancias.max() + 1
+        ordem = selecionar_vizinhos(distancias, k_maximo)
+        
+        for deslocamento, linha in enumerate(ordem):
+            i = inicio + deslocamento
+            vizinhos = [rotulos[j] for j in linha[:tamanhos_treino[dobras[i]]]]
+            for k_teste in valores_k:
+                if classificador.votar(vizinhos[:k_teste]) == rotulos[i]:
+                    corretas[k_teste][dobras[i]] += 1
+    
+    return {k_teste: float(np.mean(corretas[k_teste] / tamanhos)) * 100 for k_teste in valores_k}
+
+
 def main():
     """
     Função principal que executa o algoritmo KNN no dataset de cogumelos.
@@ -298,60 +2983,114 @@ def main():
     # Configurações
     nome_arquivo = 'mushrooms.csv'
     k = 5  # Número de vizinhos
+    indice = None  # Estrutura de busca: None (varredura linear exata), 'lsh' (aproximada) ou 'invertido' (requer 'categorica')
+    representacao = 'bits'  # Matriz de treino: 'one_hot' (densa), 'bits' (empacotada) ou 'categorica' (códigos)
+    colapsar_duplicatas = True  # Colapsa linhas de treino idênticas em protótipos com contagens
+    metodo_reducao = None  # Redução do treino: None, 'edicao', 'condensacao' ou 'edicao_condensacao'
+    nome_modelo = None  # Arquivo onde salvar o modelo treinado (None = não salva)
     proporcao_treino = 0.8  # 80% para treino, 20% para teste
+    num_dobras = 5  # Dobras da validação cruzada
+    tamanho_cache = 0  # Predições guardadas no cache LRU (0 = sem cache)
+    num_processos = 1  # Processos usados na avaliação (1 = sequencial)
+    usar_cache = True  # Lê o dataset do cache binário (.knncache), recompilado quando o CSV muda
     
-    # Carrega o dataset
+    # Carrega o dataset: do cache vêm os códigos mapeados em memória, que são
+    # codificados de forma vetorizada, sem passar por listas
     print(f"Carregando dataset do arquivo: {nome_arquivo}")
-    dataset, cabecalho = carregar_dataset_cogumelos(nome_arquivo)
-    
-    if dataset is None:
-        print("Não foi possível carregar o dataset. Encerrando programa.")
-        return
-    
-    print(f"Dataset carregado com sucesso! Total de amostras: {len(dataset)}")
+    codigos = None
+    if usar_cache:
+        codigos, codigos_rotulos, classes, cabecalho_processado, vocabularios = \
+            carregar_dataset_cogumelos_binario(nome_arquivo)
+        if codigos is None:
+            print("Cache binário indisponível, lendo o CSV")
+    if codigos is None:
+        dataset, cabecalho = carregar_dataset_cogumelos(nome_arquivo)
+        if dataset is None:
+            print("Não foi possível carregar o dataset. Encerrando programa.")
+            return
+        
+        # Processa o dataset (move coluna alvo para o final)
+        print("Processando dataset...")
+        dataset_processado, cabecalho_processado = processar_dataset_cogumelos(dataset, cabecalho)
+        posicao_classe = {}
+        codigos_rotulos = np.array([posicao_classe.setdefault(amostra[-1], len(posicao_classe))
+                                    for amostra in dataset_processado], dtype=np.intp)
+        classes = list(posicao_classe)
+    rotulos = np.array(classes, dtype=object)[codigos_rotulos]
     
-    # Processa o dataset (move coluna alvo para o final)
-    print("Processando dataset...")
-    dataset_processado, cabecalho_processado = processar_dataset_cogumelos(dataset, cabecalho)
+    print(f"Dataset carregado com sucesso! Total de amostras: {len(rotulos)}")
     
-    # Mostra algumas estatísticas do dataset
-    classes = {}
-    for amostra in dataset_processado:
-        classe = amostra[-1]
-        classes[classe] = classes.get(classe, 0) + 1
+    # Mostra algumas estatísticas do dataset, na ordem em que as classes aparecem
+    presentes, primeiras, quantidades = np.unique(codigos_rotulos, return_index=True, return_counts=True)
     
     print(f"Classes encontradas:")
-    for classe, quantidade in classes.items():
+    for posicao in np.argsort(primeiras):
+        classe = classes[presentes[posicao]]
         classe_nome = "Venenoso" if classe == 'p' else "Comestível"
-        print(f"  - {classe_nome} ({classe}): {quantidade} amostras")
+        print(f"  - {classe_nome} ({classe}): {quantidades[posicao]} amostras")
     
     # Cria e configura o classificador
     print(f"\nInicializando classificador KNN com k={k}...")
-    classificador = KNNClassificadorCogumelos(k=k)
+    classificador = KNNClassificadorCogumelos(k=k, indice=indice, tamanho_cache=tamanho_cache,
+                                              representacao=representacao,
+                                              colapsar_duplicatas=colapsar_duplicatas)
     
-    # Aplica codificação one-hot
-    print("Aplicando codificação one-hot para variáveis categóricas...")
-    dataset_codificado = classificador.codificar_one_hot(dataset_processado, cabecalho_processado)
-    
-    # Calcula dimensões após codificação
     dimensoes_originais = len(cabecalho_processado) - 1  # Excluindo coluna alvo
-    dimensoes_codificadas = len(dataset_codificado[0]) - 1  # Excluindo coluna alvo
-    print(f"Dimensões: {dimensoes_originais} características originais → {dimensoes_codificadas} após one-hot encoding")
+    if representacao == 'categorica':
+        # Os códigos são obtidos do mapeamento a cada conversão, sem one-hot
+        print("Construindo mapeamento dos valores categóricos (sem codificação one-hot)...")
+        if codigos is not None:
+            # Os códigos do cache seguem os vocabulários e vão para o treino como estão
+            classificador.definir_mapeamento(cabecalho_processado, vocabularios)
+            matriz = codigos
+        else:
+            classificador.construir_mapeamento(dataset_processado, cabecalho_processado)
+            matriz = classificador.converter_consultas(dataset_processado)
+        print(f"Dimensões: {dimensoes_originais} características categóricas (um código por característica)")
+    else:
+        # Aplica codificação one-hot
+        print("Aplicando codificação one-hot para variáveis categóricas...")
+        if codigos is not None:
+            matriz = classificador.codificar_one_hot_codigos(codigos, cabecalho_processado, vocabularios)
+        else:
+            dataset_codificado = classificador.codificar_one_hot(dataset_processado, cabecalho_processado)
+            matriz = np.array([linha[:-1] for linha in dataset_codificado], dtype=np.uint8)
+        
+        # Calcula dimensões após codificação
+        dimensoes_codificadas = sum(len(valores) for valores in classificador.mapeamento_codificacao.values())
+        print(f"Dimensões: {dimensoes_originais} características originais → {dimensoes_codificadas} após one-hot encoding")
     
     # Divide o dataset em treino e teste
     print(f"\nDividindo dataset: {proporcao_treino*100:.0f}% treino, {(1-proporcao_treino)*100:.0f}% teste")
-    dados_treino, dados_teste = dividir_dataset(dataset_codificado, proporcao_treino, embaralhar=True)
+    matriz_treino, rotulos_treino, matriz_teste, rotulos_teste = dividir_matriz(
+        matriz, rotulos, proporcao_treino, embaralhar=True)
     
-    print(f"Conjunto de treino: {len(dados_treino)} amostras")
-    print(f"Conjunto de teste: {len(dados_teste)} amostras")
+    print(f"Conjunto de treino: {len(rotulos_treino)} amostras")
+    print(f"Conjunto de teste: {len(rotulos_teste)} amostras")
     
     # Treina o classificador
     print(f"\nTreinando classificador...")
-    classificador.treinar(dados_treino)
+    classificador.treinar_matriz(matriz_treino, rotulos_treino)
+    print(f"Matriz de treino ({representacao}): {classificador.matriz_treino.nbytes / 1024:.1f} KiB")
+    if classificador.prototipos is not None:
+        print(f"Duplicatas colapsadas: {len(rotulos_treino)} amostras → {len(classificador.matriz_treino)} "
+              f"protótipos (compressão de {classificador.prototipos.taxa_compressao:.2f}x)")
+    if metodo_reducao is not None:
+        # O conjunto de teste faz o papel de validação para medir o efeito da redução
+        relatorio = reduzir_prototipos(classificador, metodo_reducao, num_processos=num_processos,
+                                       dados_validacao=matriz_teste, rotulos_validacao=rotulos_teste)
+        print(f"Redução ({metodo_reducao}): {relatorio['amostras_antes']} → {relatorio['amostras_depois']} "
+              f"amostras ({relatorio['fator_reducao']:.2f}x menos); acurácia de validação "
+              f"{relatorio['acuracia_antes']:.2f}% → {relatorio['acuracia_depois']:.2f}%")
+    if nome_modelo is not None:
+        salvar_modelo(classificador, nome_modelo)
+    if indice == 'lsh':
+        recall = classificador.medir_recall(matriz_teste)
+        print(f"Recall do LSH em relação à busca exata: {recall * 100:.2f}%")
     
     # Avalia o modelo
     print(f"\nIniciando avaliação do modelo:")
-    acuracia, corretas, total = avaliar_modelo(classificador, dados_teste)
+    acuracia, corretas, total = avaliar_modelo(classificador, matriz_teste, num_processos, rotulos_teste)
     
     # Mostra resultados finais
     print("\n" + "=" * 80)
@@ -361,6 +3100,16 @@ def main():
     print(f"Predições corretas: {corretas}")
     print(f"Predições incorretas: {total - corretas}")
     print(f"Acurácia: {acuracia:.2f}%")
+    if indice == 'invertido' and classificador.estrutura.consultas:
+        media = classificador.estrutura.entradas_percorridas / classificador.estrutura.consultas
+        tocadas = classificador.estrutura.amostras_tocadas / classificador.estrutura.consultas
+        linhas_indexadas = classificador.estrutura.codigos.shape[0]
+        print(f"Índice invertido: {media:.1f} de {classificador.estrutura.codigos.size} entradas percorridas "
+              f"e {tocadas:.1f} de {linhas_indexadas} linhas indexadas tocadas por consulta")
+    if classificador.cache is not None:
+        estatisticas = classificador.cache.estatisticas()
+        print(f"Cache de predições: {estatisticas['acertos']} acertos, {estatisticas['falhas']} falhas, "
+              f"{estatisticas['remocoes']} remoções ({estatisticas['taxa_acerto']:.2f}% de acerto)")
     
     # Interpretação dos resultados
     if acuracia >= 95:
@@ -381,19 +3130,12 @@ def main():
     melhor_k = k
     melhor_acuracia = acuracia
     
+    # Uma única busca de vizinhos responde todos os valores de k
+    acuracias = avaliar_multiplos_k(classificador, matriz_teste, valores_k, rotulos_teste)
+    
     for k_teste in valores_k:
-        if k_teste != k:  # Não testa o k já usado
-            classificador_teste = KNNClassificadorCogumelos(k=k_teste)
-            classificador_teste.treinar(dados_treino)
-            
-            # Avalia sem imprimir detalhes
-            corretas_teste = 0
-            for instancia_teste in dados_teste:
-                predicao = classificador_teste.predizer(instancia_teste)
-                if predicao == instancia_teste[-1]:
-                    corretas_teste += 1
-            
-            acuracia_teste = (corretas_teste / len(dados_teste)) * 100
+        if k_teste != k:  # Não repete o k já usado
+            acuracia_teste = acuracias[k_teste]
             print(f"k={k_teste:2d}: {acuracia_teste:6.2f}% de acurácia")
             
             if acuracia_teste > melhor_acuracia:
@@ -404,6 +3146,16 @@ def main():
     
     print(f"\nMelhor k encontrado: {melhor_k} com {melhor_acuracia:.2f}% de acurácia")
     
+    # Validação cruzada: as distâncias entre todas as amostras são calculadas uma só vez
+    print(f"\n" + "-" * 80)
+    print(f"VALIDAÇÃO CRUZADA ESTRATIFICADA ({num_dobras} DOBRAS)")
+    print("-" * 80)
+    
+    acuracias_cv = validacao_cruzada(classificador, matriz, valores_k, 'estratificado', num_dobras,
+                                     rotulos=rotulos)
+    for k_teste in valores_k:
+        print(f"k={k_teste:2d}: {acuracias_cv[k_teste]:6.2f}% de acurácia média")
+    
     # Informações sobre as características
     print(f"\n" + "-" * 80)
     print("INFORMAÇÕES SOBRE O DATASET")
@@ -413,8 +3165,11 @@ def main():
         print(f"  {i:2d}. {caracteristica}")
     
     print(f"\nTotal de {len(cabecalho_processado)-1} características categóricas")
-    print(f"Cada característica foi convertida em múltiplas variáveis binárias (one-hot encoding)")
-    print(f"Resultado: {dimensoes_codificadas} variáveis numéricas para o algoritmo KNN")
+    if representacao == 'categorica':
+        print(f"Cada característica foi mantida como um código inteiro (distância por divergências)")
+    else:
+        print(f"Cada característica foi convertida em múltiplas variáveis binárias (one-hot encoding)")
+        print(f"Resultado: {dimensoes_codificadas} variáveis numéricas para o algoritmo KNN")
 
 
 # Execução principal